@@ -0,0 +1,29 @@
+"""Spark-free DTCC MRO parsing core - shared by the Databricks notebook and the command line"""
+
+from .batches import parse_input_files, plan_batches
+from .checkpoint import CheckpointStore, CheckpointedCsvSink, LineSegments, parse_with_checkpoints
+from .compression import (
+    CompressedReader, CompressedWriter, compression_of, open_compressed, open_source, strip_compression_suffix,
+    validate_compression, with_compression_suffix
+)
+from .contracts import (
+    CONTRACT_OUTPUT_FORMATS, ContractGroupingSink, ContractIndex, encode_contracts, validate_contract_output
+)
+from .csv_writer import StreamingCsvSink, concatenate_csv_parts, pandas_timestamp_text
+from .distributed import parse_file_distributed
+from .layouts import (
+    CONTRA_ENRICH_FIELDS, RECORD_CONFIGS, CompiledLayout, RecordClassifier, RecordLayouts,
+    get_layouts, load_layout_config, validate_layout_config
+)
+from .ledger import ContentDigest, ProcessingLedger, file_sha256
+from .listener import (
+    FileArrival, FileListener, ListenerMetrics, LocalQueue, PollingSource, QueueMessage, QueueSource, parse_blob_event
+)
+from .metrics import StageMetrics
+from .parser import (
+    extract_file_drop_date, iter_compressed_lines, iter_file_lines, iter_local_lines, iter_mmap_lines, iter_mro_chunks,
+    iter_stream_lines, parse_line_to_record, parse_lines_parallel, parse_mro_lines
+)
+from .sinks import ColumnarRecordSink, RecordColumns, convert_typed_column, typed_arrow_column
+from .storage_io import LocalStorage, StorageIO, gather
+from .unknown import UnknownLayoutSummary
@@ -0,0 +1,39 @@
+"""Micro-batch planning - ADF hands one notebook run a group of files instead of starting a run per file"""
+
+import json
+
+BATCH_MAX_FILES = 10
+
+def parse_input_files(text):
+    """File names from a JSON array of names or of ADF childItems objects ({"name": ..., "type": "File"})"""
+    if not text or not text.strip():
+        return []
+    items = json.loads(text)
+    if not isinstance(items, list):
+        raise ValueError("input_files must be a JSON array of file names")
+    names = []
+    for item in items:
+        name = item.get("name") if isinstance(item, dict) else item
+        if not isinstance(name, str) or not name.strip():
+            raise ValueError(f"Invalid input_files entry: {item!r}")
+        names.append(name.strip())
+    return list(dict.fromkeys(names))  # A file listed twice is processed once
+
+def plan_batches(files, max_files=None, max_bytes=0):
+    """Group (name, size) pairs into batches of file names, keeping their order.
+
+    A batch closes before it would exceed max_files files or max_bytes bytes (0 = no limit); a single
+    file larger than max_bytes gets a batch of its own.
+    """
+    max_files = BATCH_MAX_FILES if max_files is None else max_files
+    batches = []
+    batch, batch_bytes = [], 0
+    for name, size in files:
+        if batch and ((max_files and len(batch) >= max_files) or (max_bytes and batch_bytes + size > max_bytes)):
+            batches.append(batch)
+            batch, batch_bytes = [], 0
+        batch.append(name)
+        batch_bytes += size
+    if batch:
+        batches.append(batch)
+    return batches
@@ -0,0 +1,186 @@
+"""Parser benchmark suite - per-stage throughput on a synthetic file, compared against a JSON baseline"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from .csv_writer import StreamingCsvSink
+from .layouts import get_layouts
+from .parser import iter_local_lines, iter_mmap_lines, parse_mro_lines
+from .sinks import ColumnarRecordSink
+from .synthetic import parse_record_mix, write_mro_file
+
+BASELINE_VERSION = 1
+DEFAULT_THRESHOLD = 0.15  # Flag a stage when it is more than 15% slower than the baseline
+
+def _best_time(run, repeat):
+    """Fastest of `repeat` runs - the least noisy estimate on a shared laptop"""
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = run()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def run_benchmarks(file_path, layouts=None, repeat=3, work_dir=None):
+    """Time read (block and mmap readers), classify, extract, parse, frame build, CSV write and streaming CSV; returns stage results"""
+    layouts = layouts or get_layouts()
+    file_bytes = os.path.getsize(file_path)
+    work_dir = work_dir or tempfile.mkdtemp(prefix="dtcc_bench_")
+    load_time = datetime.now()
+    stages = {}
+
+    def record(stage, seconds, line_count):
+        stages[stage] = {
+            "seconds": seconds,
+            "lines": line_count,
+            "lines_per_sec": line_count / seconds if seconds > 0 else 0,
+            "mb_per_sec": file_bytes / (1024 * 1024) / seconds if seconds > 0 else 0
+        }
+
+    # Later stages reuse the lines read here so each one is timed on its own
+    seconds, lines = _best_time(lambda: list(iter_local_lines(file_path)), repeat)
+    record("read", seconds, len(lines))
+
+    seconds, _ = _best_time(lambda: sum(1 for _ in iter_mmap_lines(file_path)), repeat)
+    record("read_mmap", seconds, len(lines))
+
+    classify = layouts.classifier.classify
+    seconds, record_types = _best_time(lambda: list(map(classify, lines)), repeat)
+    record("classify", seconds, len(lines))
+
+    compiled = layouts.compiled
+    classified = [(compiled[record_type].values, line) for record_type, line in zip(record_types, lines) if record_type]
+    seconds, _ = _best_time(lambda: [values(line) for values, line in classified], repeat)
+    record("extract", seconds, len(classified))
+
+    def parse():
+        sink = ColumnarRecordSink(os.path.basename(file_path), load_time, None, layouts)
+        parse_mro_lines(lines, sink)
+        return sink
+    seconds, _ = _best_time(parse, repeat)
+    record("parse", seconds, len(lines))
+
+    sink = parse()
+    seconds, frames = _best_time(lambda: {record_type: sink.to_pandas(record_type) for record_type in sink.record_columns}, repeat)
+    record("frame_build", seconds, len(lines))
+
+    frame_dir = os.path.join(work_dir, "frame")
+    os.makedirs(frame_dir, exist_ok=True)
+
+    def write_frames():
+        for record_type, pandas_df in frames.items():
+            with open(os.path.join(frame_dir, f"{record_type}.csv"), "w", newline="") as output:
+                output.write(pandas_df.to_csv(index=False))
+    seconds, _ = _best_time(write_frames, repeat)
+    record("write_csv", seconds, len(lines))
+
+    def stream():
+        sink = StreamingCsvSink(os.path.basename(file_path), load_time, None, os.path.join(work_dir, "streaming"), layouts=layouts)
+        parse_mro_lines(lines, sink)
+        with contextlib.redirect_stdout(io.StringIO()):
+            sink.finish()  # Per-file summary lines would swamp the report
+    seconds, _ = _best_time(stream, repeat)
+    record("streaming_csv", seconds, len(lines))
+
+    shutil.rmtree(work_dir, ignore_errors=True)
+    return stages
+
+def compare_to_baseline(stages, baseline, threshold=DEFAULT_THRESHOLD):
+    """Stages whose lines/sec fell more than threshold below the baseline: [(stage, baseline, current, change)]"""
+    regressions = []
+    for stage, result in stages.items():
+        previous = baseline.get("stages", {}).get(stage)
+        if not previous or not previous.get("lines_per_sec"):
+            continue
+        change = result["lines_per_sec"] / previous["lines_per_sec"] - 1
+        if change < -threshold:
+            regressions.append((stage, previous["lines_per_sec"], result["lines_per_sec"], change))
+    return regressions
+
+def build_report(stages, file_info):
+    return {
+        "version": BASELINE_VERSION,
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "file": file_info,
+        "stages": stages
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="dtcc_parser.benchmark", description="Benchmark the MRO parser stages offline")
+    parser.add_argument("--input", help="Benchmark an existing MRO file instead of generating one")
+    parser.add_argument("--size-mb", type=float, default=20, help="Synthetic file size")
+    parser.add_argument("--mix", help="Records per contract, e.g. contract_valuation=2,contract_agent_record=0.5")
+    parser.add_argument("--malformed-ratio", type=float, default=0.01)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--layout-config", help="Layout YAML (default: built-in layouts)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per stage; the fastest is kept")
+    parser.add_argument("--baseline", help="Baseline JSON - created when missing, otherwise compared against")
+    parser.add_argument("--update-baseline", action="store_true", help="Overwrite the baseline with this run")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="Allowed slowdown before flagging (0.15 = 15%%)")
+    parser.add_argument("--output", help="Also write this run's results as JSON")
+    args = parser.parse_args(argv)
+
+    layouts = get_layouts(args.layout_config)
+    temp_dir = tempfile.mkdtemp(prefix="dtcc_bench_")
+    try:
+        if args.input:
+            file_path = args.input
+            file_info = {"path": file_path}
+        else:
+            file_path = os.path.join(temp_dir, "SYNTHETIC.D250101.mro")
+            record_mix = parse_record_mix(args.mix) if args.mix else None
+            line_count, bytes_written = write_mro_file(
+                file_path, target_bytes=int(args.size_mb * 1024 * 1024), layouts=layouts,
+                record_mix=record_mix, malformed_ratio=args.malformed_ratio, seed=args.seed
+            )
+            file_info = {"size_mb": args.size_mb, "mix": record_mix, "malformed_ratio": args.malformed_ratio, "seed": args.seed}
+            print(f"  Generated {line_count:,} lines ({bytes_written / (1024 * 1024):.1f} MB)")
+        file_info["bytes"] = os.path.getsize(file_path)
+        stages = run_benchmarks(file_path, layouts, args.repeat, os.path.join(temp_dir, "out"))
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+    print(f"  {'stage':<14} {'seconds':>9} {'lines/sec':>13} {'MB/sec':>9}")
+    for stage, result in stages.items():
+        print(f"  {stage:<14} {result['seconds']:>9.3f} {result['lines_per_sec']:>13,.0f} {result['mb_per_sec']:>9.1f}")
+
+    report = build_report(stages, file_info)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if not args.baseline:
+        return 0
+    if args.update_baseline or not os.path.exists(args.baseline):
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"  Baseline written → {args.baseline}")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get("file", {}).get("bytes") != file_info["bytes"]:
+        print("  Warning: baseline was measured on a different input size - throughput may not be comparable")
+    regressions = compare_to_baseline(stages, baseline, args.threshold)
+    if not regressions:
+        print(f"  No regressions beyond {args.threshold:.0%} against {args.baseline}")
+        return 0
+    for stage, previous, current, change in regressions:
+        print(f"  REGRESSION {stage}: {current:,.0f} lines/sec vs {previous:,.0f} baseline ({change:+.0%})", file=sys.stderr)
+    return 1
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,302 @@
+"""Checkpointed parsing - large files resume from the last submitting header group boundary instead of line 1"""
+
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+from datetime import datetime
+
+from .compression import open_compressed
+from .csv_writer import StreamingCsvSink, _CsvOutput
+from .ledger import _read_local_text, _write_local_text
+from .metrics import StageMetrics
+from .parser import READ_BUFFER_SIZE, decode_lines, parse_mro_lines
+from .unknown import UnknownLayoutSummary
+
+CHECKPOINT_VERSION = 3
+CHECKPOINT_INTERVAL_BYTES = 256 * 1024 * 1024
+COPY_BUFFER_SIZE = 8 * 1024 * 1024
+HEADER_BOUNDARY = re.compile(rb"\n.10")  # Newline followed by a submitting header ('10' in columns 2-3)
+
+def open_local_input(path, offset=0):
+    """Binary read stream for a local path, positioned at offset"""
+    stream = open(path, "rb")
+    stream.seek(offset)
+    return stream
+
+def _remove_local(path):
+    shutil.rmtree(path, ignore_errors=True)
+
+class LineSegments:
+    """Lines of a binary stream positioned at start_offset, cut into checkpoint segments.
+
+    A segment ends right before the first submitting header line past segment_bytes, so every checkpoint
+    falls on a header group boundary. Iterating yields one line iterator per segment; lines are read and
+    decoded one buffer at a time, exactly like iter_local_lines, and once a segment's lines are exhausted
+    offset is the byte offset where it ended.
+    """
+
+    def __init__(self, stream, start_offset=0, segment_bytes=None, buffer_size=None):
+        self.stream = stream
+        self.segment_bytes = segment_bytes or CHECKPOINT_INTERVAL_BYTES
+        self.buffer_size = buffer_size or READ_BUFFER_SIZE
+        self.offset = start_offset  # Byte offset of pending[0]
+        self.pending = bytearray()  # Never more than a buffer plus the line it ends in
+        self.exhausted = False
+
+    def __iter__(self):
+        while True:
+            if not self.pending:
+                self._read()
+            if not self.pending:
+                return
+            yield self._segment()
+
+    def _read(self):
+        block = b"" if self.exhausted else self.stream.read(self.buffer_size)
+        self.exhausted = not block
+        self.pending += block
+
+    def _consume(self, size):
+        lines = decode_lines(self.pending[:size].split(b"\n"))
+        del self.pending[:size]
+        self.offset += size
+        return lines
+
+    def _segment(self):
+        boundary_from = self.offset + self.segment_bytes - 1  # Newline before a header starting past segment_bytes
+        while True:
+            boundary = HEADER_BOUNDARY.search(self.pending, max(boundary_from - self.offset, 0))
+            if boundary is not None:
+                yield from self._consume(boundary.start() + 1)
+                return
+            if self.exhausted:
+                yield from self._consume(len(self.pending))
+                return
+            # Emit the complete lines but keep their last newline, so a header right after it is still found
+            last_newline = self.pending.rfind(b"\n")
+            if last_newline > 0:
+                yield from self._consume(last_newline)
+            self._read()
+
+class CheckpointStore:
+    """Checkpoint document and output parts of one source file, all kept under one directory.
+
+    read_text/write_text/remove default to the local filesystem; the notebook passes storage-backed ones.
+    """
+
+    def __init__(self, directory, read_text=None, write_text=None, remove=None):
+        self.directory = directory.rstrip("/")
+        self.read_text = read_text or _read_local_text
+        self.write_text = write_text or _write_local_text
+        self.remove = remove or _remove_local
+
+    @property
+    def path(self):
+        return f"{self.directory}/checkpoint.json"
+
+    def load(self, source):
+        """Last checkpoint of this exact source (name, size, modification time), or None"""
+        text = self.read_text(self.path)
+        if not text:
+            return None
+        checkpoint = json.loads(text)
+        if checkpoint.get("version") != CHECKPOINT_VERSION or checkpoint.get("source") != source:
+            print(f"  Ignoring checkpoint for a different version of {source.get('file_name')}")
+            return None
+        return checkpoint
+
+    def save(self, checkpoint):
+        self.write_text(self.path, json.dumps({"version": CHECKPOINT_VERSION, **checkpoint}, default=str))
+
+    def clear(self):
+        self.remove(self.directory)
+
+class _PartedCsvOutput(_CsvOutput):
+    """CSV target written as one numbered part per checkpoint segment, concatenated into the final file on close"""
+
+    def __init__(self, path, part_prefix, buffer_bytes, open_stream, open_input, compression=None):
+        super().__init__(path, buffer_bytes, open_stream, compression)
+        self.part_prefix = part_prefix
+        self.open_input = open_input
+        self.parts = 0
+
+    def part_path(self, part):
+        return f"{self.part_prefix}.{part:05d}"
+
+    def _open(self):
+        # Compressed parts are complete gzip members / zstd frames, so their concatenation is one valid file
+        return open_compressed(self.open_stream(self.part_path(self.parts)), self.compression)
+
+    def close_part(self):
+        """Flush and close the current part so everything written so far survives a restart"""
+        self.flush()
+        if self.stream is not None:
+            self._close_stream()
+            self.parts += 1
+
+    def close(self):
+        self.close_part()
+        write_start, cpu_start = time.perf_counter(), time.thread_time()
+        output = self.open_stream(self.path)
+        try:
+            for part in range(self.parts):
+                source = self.open_input(self.part_path(part))
+                try:
+                    for block in iter(lambda: source.read(COPY_BUFFER_SIZE), b""):
+                        output.write(block)
+                finally:
+                    source.close()
+        finally:
+            output.close()
+        self.write_seconds += time.perf_counter() - write_start
+        self.write_cpu_seconds += time.thread_time() - cpu_start
+
+    def state(self):
+        return {
+            "count": self.count,
+            "bytes_written": self.bytes_written,
+            "compressed_bytes": self.compressed_bytes,
+            "codec_seconds": self.codec_seconds,
+            "parts": self.parts,
+            "columns": self.columns,
+            "write_seconds": self.write_seconds,
+            "write_cpu_seconds": self.write_cpu_seconds
+        }
+
+    def restore(self, state):
+        self.count = state["count"]
+        self.bytes_written = state["bytes_written"]
+        self.compressed_bytes = state["compressed_bytes"]
+        self.codec_seconds = state["codec_seconds"]
+        self.parts = state["parts"]
+        self.write_seconds = state["write_seconds"]
+        self.write_cpu_seconds = state["write_cpu_seconds"]
+        if state["columns"] is not None:
+            self.use_columns(state["columns"])
+
+class CheckpointedCsvSink(StreamingCsvSink):
+    """StreamingCsvSink that can persist its progress at a checkpoint and pick it up again in a new process.
+
+    Outputs go to parts under checkpoint_dir and are concatenated into base_path by finish(), so the
+    final CSVs match an uninterrupted StreamingCsvSink run byte for byte.
+    """
+
+    def __init__(self, file_name, load_time, file_drop_date, base_path, checkpoint_dir, buffer_bytes=None,
+                 layouts=None, open_stream=None, open_input=None, unknown_detail=False, compression=None, storage_io=None):
+        super().__init__(file_name, load_time, file_drop_date, base_path, buffer_bytes, layouts, open_stream, unknown_detail,
+                         compression, storage_io)
+        self.checkpoint_dir = checkpoint_dir.rstrip("/")
+        self.open_input = open_input or open_local_input
+        self.spool_parts = 0
+        self.spool_saved = 0
+
+    def _new_output(self, name):
+        file_name = self.output_file_name(name)
+        return _PartedCsvOutput(f"{self.base_path}/{file_name}", f"{self.checkpoint_dir}/{file_name}",
+                                self.buffer_bytes, self.open_stream, self.open_input, self.compression)
+
+    def _spool_part_path(self, part):
+        return f"{self.checkpoint_dir}/contract_record.spool.{part:05d}"
+
+    def checkpoint(self):
+        """Close every output part and persist undecided contract rows; returns the state for restore()"""
+        for output in self.outputs.values():
+            output.close_part()
+        if self.unknown_output is not None:
+            self.unknown_output.close_part()
+
+        if self.contra_spool is not None:
+            self.contra_spool.seek(self.spool_saved)
+            data = self.contra_spool.read()
+            if data:
+                stream = self.open_stream(self._spool_part_path(self.spool_parts))
+                stream.write(data)
+                stream.close()
+                self.spool_parts += 1
+                self.spool_saved += len(data)
+            self.contra_spool.seek(0, os.SEEK_END)
+
+        return {
+            "outputs": [[record_type, output.state()] for record_type, output in self.outputs.items()],
+            "unknown": self.unknown_output.state() if self.unknown_output is not None else None,
+            "unknown_summary": self.unknown.to_dict(),
+            "contra_decided": self.contra_decided,
+            "spool_parts": self.spool_parts
+        }
+
+    def restore(self, state):
+        for record_type, output_state in state["outputs"]:
+            output = self.outputs[record_type] = self._new_output(record_type)
+            output.restore(output_state)
+        if state["unknown"] is not None:
+            self.unknown_output = self._new_output("unknown_layouts")
+            self.unknown_output.restore(state["unknown"])
+        self.unknown = UnknownLayoutSummary.from_dict(state["unknown_summary"])
+
+        self.contra_decided = state["contra_decided"]
+        if self.contra_decided or not state["spool_parts"]:
+            return
+        self.contra_spool = tempfile.SpooledTemporaryFile(max_size=self.buffer_bytes)
+        for part in range(state["spool_parts"]):
+            source = self.open_input(self._spool_part_path(part))
+            try:
+                for block in iter(lambda: source.read(COPY_BUFFER_SIZE), b""):
+                    self.contra_spool.write(block)
+            finally:
+                source.close()
+        self.spool_parts = state["spool_parts"]
+        self.spool_saved = self.contra_spool.tell()
+
+def parse_with_checkpoints(source_path, source, store, make_sink, open_input=None, segment_bytes=None,
+                           buffer_size=None, metrics=None):
+    """Parse a file segment by segment, checkpointing after each, resuming from the store's last checkpoint.
+
+    source identifies the file version ({"file_name", "size", "modification_time"}); make_sink(load_time)
+    builds the CheckpointedCsvSink - a resumed run reuses the original load time so its output is identical.
+    Returns (sink, parse state); the caller finishes the sink and clears the store. For compressed sources
+    open_input should be dtcc_parser.compression.open_source, so offsets count decoded bytes.
+    """
+    open_input = open_input or open_local_input
+    metrics = metrics or StageMetrics(source.get("file_name"))
+    checkpoint = store.load(source)
+
+    if checkpoint is None:
+        store.clear()  # Parts left by an older version of the file
+        load_time = datetime.now()
+        sink = make_sink(load_time)
+        offset, segment, state = 0, 0, None
+    else:
+        load_time = datetime.fromisoformat(checkpoint["load_time"])
+        sink = make_sink(load_time)
+        sink.restore(checkpoint["sink"])
+        offset, segment, state = checkpoint["byte_offset"], checkpoint["segment"], checkpoint["state"]
+        print(f"  Resuming from checkpoint {segment}: byte {offset:,}, line {state['file_row_number']:,}, "
+              f"header group {state['header_group_number']:,}")
+        metrics.count("resumed_from_byte", offset)
+
+    stream = open_input(source_path, offset)
+    try:
+        segments = LineSegments(stream, offset, segment_bytes, buffer_size)
+        for lines in segments:
+            # Reads happen as the parser pulls lines, timed under its 'read' stage
+            state = parse_mro_lines(lines, sink, state, metrics)
+            offset = segments.offset
+            segment += 1
+            with metrics.stage("checkpoint"):
+                store.save({
+                    "source": source,
+                    "segment": segment,
+                    "byte_offset": offset,
+                    "load_time": load_time.isoformat(),
+                    "state": state,
+                    "sink": sink.checkpoint()
+                })
+    finally:
+        stream.close()
+        if hasattr(stream, "stats"):
+            metrics.add_compression("input", stream.stats())
+
+    return sink, state or parse_mro_lines([], sink)
@@ -0,0 +1,231 @@
+"""Command line parser - local MRO files to per-record-type CSVs without Spark"""
+
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+from functools import partial
+
+from .checkpoint import CheckpointStore, CheckpointedCsvSink, open_local_input, parse_with_checkpoints
+from .compression import open_compressed, open_source, strip_compression_suffix, with_compression_suffix
+from .contracts import CONTRACT_OUTPUT_FORMATS, ContractIndex, encode_contracts
+from .csv_writer import StreamingCsvSink
+from .layouts import get_layouts
+from .metrics import StageMetrics
+from .parser import extract_file_drop_date, iter_file_lines, parse_lines_parallel, parse_mro_lines
+from .sinks import ColumnarRecordSink
+from .storage_io import StorageIO, gather
+
+def write_frame(config_name, display_name, pandas_df, output_dir, compression=None):
+    """Write one DataFrame-built CSV; returns its saved-file entry"""
+    write_start, cpu_start = time.perf_counter(), time.thread_time()
+    csv_bytes = pandas_df.to_csv(index=False).encode("utf-8")
+    file_name = with_compression_suffix(f"{config_name}.csv", compression)
+    output = open_compressed(open(os.path.join(output_dir, file_name), "wb"), compression)
+    output.write(csv_bytes)
+    output.close()
+    print(f"{display_name}: {len(pandas_df):,} records → {file_name}")
+    saved_file = {
+        'config_name': config_name,
+        'display_name': display_name,
+        'count': len(pandas_df),
+        'file_name': file_name,
+        'bytes_written': len(csv_bytes),
+        'write_seconds': time.perf_counter() - write_start,
+        'write_cpu_seconds': time.thread_time() - cpu_start
+    }
+    if compression:
+        saved_file['compression'] = output.stats()
+        saved_file['bytes_written'] = saved_file['compression']['stored_bytes']
+    return saved_file
+
+def write_frames(sink, output_dir, compression=None, storage_io=None):
+    """Write a ColumnarRecordSink's record types as DataFrame-built CSVs; returns saved-file entries.
+
+    With a StorageIO pool the record types are written concurrently (entries keep the sink's order).
+    """
+    frames = list(sink.iter_frames())
+    sink.report_invalid_values()
+    unknown_df = sink.unknown_to_pandas()
+    if unknown_df is not None:
+        frames.append(("unknown_layouts", unknown_df))
+    outputs = [(config_name, "Unknown Layouts" if config_name == "unknown_layouts" else sink.layouts.display_name(config_name), pandas_df)
+               for config_name, pandas_df in frames]
+
+    if storage_io is None:
+        os.makedirs(output_dir, exist_ok=True)
+        return [write_frame(*output, output_dir, compression) for output in outputs]
+    folder = storage_io.mkdirs(output_dir)
+    return gather([storage_io.submit(f"write {config_name}", write_frame, config_name, display_name, pandas_df, output_dir,
+                                     compression, after=(folder,))
+                   for config_name, display_name, pandas_df in outputs])
+
+def write_contracts(contracts, output_dir, output_format):
+    """Write the nested contracts file; returns its saved-file entry"""
+    write_start, cpu_start = time.perf_counter(), time.thread_time()
+    table = contracts.to_arrow()
+    file_name = CONTRACT_OUTPUT_FORMATS[output_format]
+    os.makedirs(output_dir, exist_ok=True)
+    with open(os.path.join(output_dir, file_name), "wb") as f:
+        bytes_written = encode_contracts(table, output_format, f)
+    print(f"Contracts (nested): {table.num_rows:,} contracts → {file_name}")
+    return {
+        'config_name': 'contracts',
+        'display_name': 'Contracts (nested)',
+        'count': table.num_rows,
+        'file_name': file_name,
+        'bytes_written': bytes_written,
+        'write_seconds': time.perf_counter() - write_start,
+        'write_cpu_seconds': time.thread_time() - cpu_start
+    }
+
+def parse_file(file_path, output_dir, layouts=None, writer="streaming", typed=False, workers=1, buffer_size=None, metrics=None,
+               checkpoint_bytes=None, unknown_detail=False, compression=None, storage_io=None, contract_output=None):
+    """Parse one local MRO file into output_dir; returns the saved-file entries.
+
+    With checkpoint_bytes (streaming writer) progress is saved under output_dir/_checkpoint and an
+    interrupted run picks up from there when rerun with the same arguments. Unknown lines are
+    summarized in the metrics; unknown_detail also writes each one to unknown_layouts.csv.
+    .gz/.zst inputs are decompressed while reading; compression ('gzip'/'zstd') compresses the CSVs.
+    A StorageIO pool writes (frame) or closes (streaming) the per-record-type CSVs concurrently.
+    contract_output ('parquet'/'jsonl', single-process parse only) also writes one nested row per contract.
+    """
+    layouts = layouts or get_layouts()
+    metrics = metrics or StageMetrics(os.path.basename(file_path))
+    metrics.count("bytes_read", os.path.getsize(file_path))
+    file_name = os.path.basename(file_path)
+    file_drop_date = extract_file_drop_date(file_name)
+    load_time = datetime.now()
+
+    print(f"\n Parsing: {file_name}")
+    print(f"File drop date: {file_drop_date}")
+
+    checkpoint_store = None
+    if writer == "streaming" and checkpoint_bytes:
+        checkpoint_store = CheckpointStore(os.path.join(output_dir, "_checkpoint"))
+    elif writer == "streaming":
+        sink = StreamingCsvSink(file_name, load_time, file_drop_date, output_dir, buffer_size, layouts,
+                                unknown_detail=unknown_detail, compression=compression, storage_io=storage_io)
+    else:
+        sink = ColumnarRecordSink(file_name, load_time, file_drop_date, layouts, typed, unknown_detail)
+    contracts = None
+    if contract_output:
+        contracts = ContractIndex(file_name, load_time, file_drop_date, layouts, typed)
+        sink = contracts.wrap(sink)
+
+    parse_start = time.perf_counter()
+    # Checkpointed parses open the file themselves, at the resume offset
+    if checkpoint_store is not None:
+        source = {"file_name": file_name, "size": os.path.getsize(file_path), "modification_time": int(os.path.getmtime(file_path) * 1000)}
+        make_sink = lambda load_time: CheckpointedCsvSink(file_name, load_time, file_drop_date, output_dir,
+                                                          checkpoint_store.directory, buffer_size, layouts,
+                                                          unknown_detail=unknown_detail, compression=compression,
+                                                          storage_io=storage_io)
+        sink, state = parse_with_checkpoints(file_path, source, checkpoint_store, make_sink, partial(open_source, open_local_input),
+                                             segment_bytes=checkpoint_bytes, metrics=metrics)
+        line_count = state["file_row_number"]
+    elif workers > 1:
+        line_count, chunk_count = parse_lines_parallel(iter_file_lines(file_path, metrics=metrics), sink, workers, metrics=metrics)
+    else:
+        line_count = parse_mro_lines(iter_file_lines(file_path, metrics=metrics), sink, metrics=metrics)["file_row_number"]
+    parse_time = time.perf_counter() - parse_start
+    lines_per_second = line_count / parse_time if parse_time > 0 else 0
+    print(f"  Classified and parsed {line_count:,} lines in {parse_time:.2f}s ({lines_per_second:,.0f} lines/sec)")
+    if sink.unknown_count:
+        print(f"    Unknown layouts: {sink.unknown_count:,} lines")
+        for description in sink.unknown.describe():
+            print(f"      {description}")
+    metrics.unknown_layouts = sink.unknown.to_dict()
+
+    if writer == "streaming":
+        with metrics.stage("write_flush"):
+            saved_files = sink.finish()
+        if checkpoint_store is not None:
+            checkpoint_store.clear()
+    else:
+        with metrics.stage("frame_build_and_write"):
+            saved_files = write_frames(sink, output_dir, compression, storage_io)
+    if contracts is not None:
+        saved_files.append(write_contracts(contracts, output_dir, contract_output))
+
+    for file_info in saved_files:
+        metrics.add(f"write.{file_info['config_name']}", file_info['write_seconds'], file_info.get('write_cpu_seconds'))
+        metrics.rows[file_info['config_name']] = file_info['count']
+        metrics.count("bytes_written", file_info['bytes_written'])
+        if file_info.get('compression'):
+            metrics.add_compression("output", file_info['compression'])
+    return saved_files
+
+def build_argument_parser():
+    parser = argparse.ArgumentParser(prog="dtcc_parser", description="Parse DTCC MRO files into per-record-type CSVs")
+    parser.add_argument("files", nargs="+", help="Local MRO files")
+    parser.add_argument("-o", "--output-dir", required=True, help="Output directory (one subfolder per file when several are given)")
+    parser.add_argument("--layout-config", help="Layout YAML (default: built-in layouts)")
+    parser.add_argument("--writer", choices=("streaming", "frame"), default="streaming",
+                        help="streaming writes rows as they are parsed; frame builds pandas DataFrames first")
+    parser.add_argument("--typed", action="store_true", help="Convert typed layout fields (frame writer only)")
+    parser.add_argument("--workers", type=int, default=1, help="Parser processes (frame writer only)")
+    parser.add_argument("--record-types", help="Comma-separated record types to parse (default: all)")
+    parser.add_argument("--columns", action="append", default=[], metavar="TYPE=COL1,COL2",
+                        help="Only these columns of a record type; repeat per type")
+    parser.add_argument("--unknown-detail", action="store_true",
+                        help="Write every unmatched line to unknown_layouts.csv (default: counts and samples per record code only)")
+    parser.add_argument("--compress", choices=("gzip", "zstd"), help="Write gzip/zstd CSVs (.csv.gz/.csv.zst); .gz/.zst inputs are always read transparently")
+    parser.add_argument("--checkpoint-mb", type=float, help="Checkpoint every N MB of input so an interrupted run resumes (streaming writer only)")
+    parser.add_argument("--contracts", choices=tuple(CONTRACT_OUTPUT_FORMATS),
+                        help="Also write one nested row per contract (contracts.parquet/.jsonl) grouped during the parse")
+    parser.add_argument("--io-workers", type=int, default=1, help="Per-record-type CSVs written/closed concurrently (default: one at a time)")
+    parser.add_argument("--metrics", action="store_true", help="Write per-stage timings and counters to metrics.json in each output folder")
+    return parser
+
+def main(argv=None):
+    args = build_argument_parser().parse_args(argv)
+    if args.writer == "streaming" and (args.typed or args.workers > 1):
+        print("--typed and --workers need --writer frame", file=sys.stderr)
+        return 2
+    if args.checkpoint_mb and args.writer != "streaming":
+        print("--checkpoint-mb needs --writer streaming", file=sys.stderr)
+        return 2
+    if args.contracts and (args.checkpoint_mb or args.workers > 1):
+        print("--contracts cannot be combined with --checkpoint-mb or --workers", file=sys.stderr)
+        return 2
+    checkpoint_bytes = int(args.checkpoint_mb * 1024 * 1024) if args.checkpoint_mb else None
+
+    layouts = get_layouts(args.layout_config)
+    if args.layout_config and not os.path.exists(args.layout_config):
+        print(f"  Layout config {args.layout_config} not found - using built-in layouts")
+    try:
+        record_types = [name.strip() for name in args.record_types.split(",") if name.strip()] if args.record_types else None
+        columns = {}
+        for selection in args.columns:
+            record_type, _, names = selection.partition("=")
+            columns[record_type.strip()] = [name.strip() for name in names.split(",") if name.strip()]
+        layouts = layouts.select(record_types, columns)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+
+    storage_io = StorageIO(max_workers=args.io_workers) if args.io_workers > 1 else None
+    failed = []
+    for file_path in args.files:
+        output_dir = args.output_dir
+        if len(args.files) > 1:
+            output_dir = os.path.join(output_dir, os.path.splitext(strip_compression_suffix(os.path.basename(file_path)))[0])
+        try:
+            metrics = StageMetrics(os.path.basename(file_path))
+            saved_files = parse_file(file_path, output_dir, layouts, args.writer, args.typed, args.workers, metrics=metrics,
+                                     checkpoint_bytes=checkpoint_bytes, unknown_detail=args.unknown_detail,
+                                     compression=args.compress, storage_io=storage_io, contract_output=args.contracts)
+            if args.metrics:
+                with open(os.path.join(output_dir, "metrics.json"), "w") as f:
+                    f.write(metrics.to_json())
+            total_records = sum(saved_file['count'] for saved_file in saved_files if saved_file['config_name'] != 'contracts')
+            print(f"  {len(saved_files)} files, {total_records:,} records → {output_dir}")
+        except Exception as e:
+            print(f"Error processing {file_path}: {e}", file=sys.stderr)
+            failed.append(file_path)
+    if storage_io is not None:
+        storage_io.close()
+
+    return 1 if failed else 0
@@ -0,0 +1,180 @@
+"""Transparent gzip/zstd for source files, CSV outputs and archived copies - the codec follows the file suffix"""
+
+import gzip
+import time
+
+COMPRESSION_SUFFIXES = {"gzip": ".gz", "zstd": ".zst"}
+COMPRESSION_LEVELS = {"gzip": 6, "zstd": 3}
+STORAGE_BLOCK_SIZE = 8 * 1024 * 1024  # Compressed bytes moved per storage call - codecs work in much smaller pieces
+
+def compression_of(path):
+    """'gzip', 'zstd' or None, from the file suffix"""
+    lower_path = str(path).lower()
+    for compression, suffix in COMPRESSION_SUFFIXES.items():
+        if lower_path.endswith(suffix):
+            return compression
+    return None
+
+def strip_compression_suffix(name):
+    """DTCC_ABC.D250801.mro.gz -> DTCC_ABC.D250801.mro"""
+    compression = compression_of(name)
+    return name[:-len(COMPRESSION_SUFFIXES[compression])] if compression else name
+
+def with_compression_suffix(name, compression):
+    return f"{name}{COMPRESSION_SUFFIXES[compression]}" if compression else name
+
+def validate_compression(compression):
+    """Normalize a widget/CLI value - blank and 'none' mean uncompressed"""
+    compression = (compression or "").strip().lower()
+    if compression in ("", "none"):
+        return None
+    if compression not in COMPRESSION_SUFFIXES:
+        raise ValueError(f"Unknown compression: {compression} (use none, {', '.join(COMPRESSION_SUFFIXES)})")
+    return compression
+
+def _zstandard():
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError("zstd compression needs the zstandard package (pip install zstandard)") from None
+    return zstandard
+
+class _StoredStream:
+    """Compressed side of a codec - storage is read and written in large blocks, counted and timed,
+    while the codec's own small reads and writes are served from memory"""
+
+    def __init__(self, stream, block_size=None):
+        self.stream = stream
+        self.block_size = block_size or STORAGE_BLOCK_SIZE
+        self.pending = bytearray()
+        self.position = 0
+        self.bytes = 0
+        self.seconds = 0.0
+
+    def _read_block(self, size):
+        start = time.perf_counter()
+        block = self.stream.read(size)
+        self.seconds += time.perf_counter() - start
+        self.bytes += len(block)
+        return block
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            data = bytes(self.pending[self.position:])
+            self.pending, self.position = bytearray(), 0
+            for block in iter(lambda: self._read_block(self.block_size), b""):
+                data += block
+            return data
+        while len(self.pending) - self.position < size:
+            block = self._read_block(self.block_size)
+            if not block:
+                break
+            del self.pending[:self.position]
+            self.position = 0
+            self.pending += block
+        data = bytes(self.pending[self.position:self.position + size])
+        self.position += len(data)
+        return data
+
+    def write(self, data):
+        self.pending += data
+        if len(self.pending) >= self.block_size:
+            self.flush()
+        return len(data)
+
+    def flush(self):
+        if not self.pending:
+            return
+        start = time.perf_counter()
+        self.stream.write(bytes(self.pending))
+        self.seconds += time.perf_counter() - start
+        self.bytes += len(self.pending)
+        self.pending = bytearray()
+
+    def close(self):
+        self.stream.close()
+
+class _CodecStream:
+    """Shared accounting of CompressedReader/CompressedWriter - stored (compressed) vs raw bytes and codec time"""
+
+    def stats(self):
+        return {
+            "compression": self.compression,
+            "stored_bytes": self.stored.bytes,
+            "raw_bytes": self.raw_bytes,
+            "codec_seconds": max(self.seconds - self.stored.seconds, 0.0)
+        }
+
+class CompressedReader(_CodecStream):
+    """Binary read stream decoding a gzip/zstd stream on the fly; concatenated members/frames read as one"""
+
+    def __init__(self, stream, compression, block_size=None):
+        self.compression = compression
+        self.stored = _StoredStream(stream, block_size)
+        if compression == "gzip":
+            self.reader = gzip.GzipFile(fileobj=self.stored, mode="rb")
+        else:
+            self.reader = _zstandard().ZstdDecompressor().stream_reader(self.stored, read_across_frames=True, closefd=False)
+        self.raw_bytes = 0
+        self.seconds = 0.0
+
+    def read(self, size=-1):
+        start = time.perf_counter()
+        data = self.reader.read(size)
+        self.seconds += time.perf_counter() - start
+        self.raw_bytes += len(data)
+        return data
+
+    def skip(self, count, buffer_size=None):
+        """Decode and drop count bytes - compressed streams cannot seek"""
+        while count > 0:
+            block = self.read(min(count, buffer_size or STORAGE_BLOCK_SIZE))
+            if not block:
+                break
+            count -= len(block)
+
+    def close(self):
+        self.reader.close()
+        self.stored.close()
+
+class CompressedWriter(_CodecStream):
+    """Binary write stream compressing into gzip/zstd; output bytes are reproducible (no timestamp in the header)"""
+
+    def __init__(self, stream, compression, level=None, block_size=None):
+        self.compression = compression
+        self.stored = _StoredStream(stream, block_size)
+        level = COMPRESSION_LEVELS[compression] if level is None else level
+        if compression == "gzip":
+            self.writer = gzip.GzipFile(fileobj=self.stored, mode="wb", compresslevel=level, mtime=0)
+        else:
+            self.writer = _zstandard().ZstdCompressor(level=level).stream_writer(self.stored, closefd=False)
+        self.raw_bytes = 0
+        self.seconds = 0.0
+
+    def write(self, data):
+        start = time.perf_counter()
+        self.writer.write(data)
+        self.seconds += time.perf_counter() - start
+        self.raw_bytes += len(data)
+        return len(data)
+
+    def close(self):
+        start = time.perf_counter()
+        self.writer.close()
+        self.stored.flush()
+        self.seconds += time.perf_counter() - start
+        self.stored.close()
+
+def open_source(open_raw, path, offset=0, block_size=None):
+    """Read stream of a source file's content at offset; compressed files (by suffix) are decoded as they
+    are read, and their offsets count decoded bytes - the prefix is decoded and dropped on resume"""
+    compression = compression_of(path)
+    if compression is None:
+        return open_raw(path, offset)
+    reader = CompressedReader(open_raw(path, 0), compression, block_size)
+    reader.skip(offset)
+    return reader
+
+def open_compressed(stream, compression, level=None):
+    """Wrap a binary write stream in the codec, or return it unchanged when compression is None"""
+    return CompressedWriter(stream, compression, level) if compression else stream
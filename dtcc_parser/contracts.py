@@ -0,0 +1,176 @@
+"""Contract-centric nested output - 13xx records grouped per contract while the file is parsed.
+
+Every record carrying a CONTRACTNUMBER is looked up in a hash index on (header group, contract number) as it
+is added, so the grouping costs one dict probe per line and no sort or join afterwards. to_arrow() emits one
+row per contract with a list of structs per 13xx record type, each list in file order.
+"""
+
+import json
+from array import array
+
+from .layouts import CONTRA_ENRICH_FIELDS
+from .sinks import RecordColumns, typed_arrow_column
+
+CONTRACT_KEY = "CONTRACTNUMBER"
+CONTRACT_OUTPUT_FORMATS = {"parquet": "contracts.parquet", "jsonl": "contracts.jsonl"}
+CONTRACT_BATCH_ROWS = 10000  # Contracts encoded and written per step, so no whole-file copy is built
+
+def validate_contract_output(value):
+    """Normalize a contract output setting: None for off, else 'parquet' or 'jsonl'"""
+    output_format = (value or "none").strip().lower()
+    if output_format in ("", "none", "false"):
+        return None
+    if output_format not in CONTRACT_OUTPUT_FORMATS:
+        raise ValueError(f"Unknown contract output: {value} (use 'none', 'parquet' or 'jsonl')")
+    return output_format
+
+class ContractGroupingSink:
+    """Sink wrapper adding every record to a ContractIndex as well as to the wrapped sink"""
+
+    def __init__(self, sink, contracts):
+        self.sink = sink
+        self.contracts = contracts
+        self.layouts = sink.layouts
+
+    def add(self, record_type, values, file_row_number, header_group_number, participant, contra_values=None):
+        self.sink.add(record_type, values, file_row_number, header_group_number, participant, contra_values)
+        self.contracts.add(record_type, values, file_row_number, header_group_number, participant, contra_values)
+
+    def __getattr__(self, name):
+        return getattr(self.sink, name)
+
+class ContractIndex:
+    """13xx records of one file grouped by (header group, CONTRACTNUMBER), in first-appearance order.
+
+    Record types without a CONTRACTNUMBER column (submitting header, contra, or a projection that drops it)
+    are not indexed. A contract number repeated under another submitting header is a separate contract.
+    """
+
+    def __init__(self, file_name, load_time, file_drop_date, layouts, typed=False):
+        self.file_name = file_name
+        self.load_time = load_time
+        self.file_drop_date = file_drop_date
+        self.layouts = layouts
+        self.typed = typed
+        self.key_positions = {record_type: compiled.columns.index(CONTRACT_KEY)
+                              for record_type, compiled in layouts.compiled.items() if CONTRACT_KEY in compiled.columns}
+        self.index = {}          # (header group, contract number) -> contract id
+        self.keys = []           # contract id -> (header group, contract number, participant)
+        self.records = {}        # record type -> RecordColumns
+        self.contract_ids = {}   # record type -> contract id per row of records[record_type]
+
+    def __len__(self):
+        return len(self.keys)
+
+    def wrap(self, sink):
+        """Sink that feeds this index while parsing into sink"""
+        return ContractGroupingSink(sink, self)
+
+    def add(self, record_type, values, file_row_number, header_group_number, participant, contra_values=None):
+        position = self.key_positions.get(record_type)
+        if position is None:
+            return
+        key = (header_group_number, values[position])
+        contract_id = self.index.get(key)
+        if contract_id is None:
+            contract_id = self.index[key] = len(self.keys)
+            self.keys.append((header_group_number, values[position], participant))
+        columns = self.records.get(record_type)
+        if columns is None:
+            columns = self.records[record_type] = RecordColumns(self.layouts.compiled[record_type].columns)
+            self.contract_ids[record_type] = array("q")
+        columns.add(values, file_row_number, header_group_number, participant, contra_values)
+        self.contract_ids[record_type].append(contract_id)
+
+    def _struct_array(self, record_type):
+        """All rows of a record type as one struct array: layout fields (duplicates keep the last value) and FILEROWNUMBER"""
+        import numpy as np
+        import pyarrow as pa
+
+        compiled = self.layouts.compiled[record_type]
+        columns = self.records.get(record_type) or RecordColumns(compiled.columns)
+        data = dict(zip(columns.columns, columns.buffers))
+        if record_type == "contract_record":
+            # Always present, so the schema does not depend on whether this file had contra records
+            contra_buffers = columns.contra_buffers or [[None] * len(columns) for _ in CONTRA_ENRICH_FIELDS]
+            data.update((f"CONTRA_{field}", buffer) for field, buffer in zip(CONTRA_ENRICH_FIELDS, contra_buffers))
+            field_types = {**compiled.field_types, **self.layouts.contra_field_types}
+        else:
+            field_types = compiled.field_types
+
+        arrays = {}
+        for name, values in data.items():
+            if self.typed and name in field_types:
+                arrays[name], _ = typed_arrow_column(values, field_types[name])
+            else:
+                arrays[name] = pa.array(values, pa.string())
+        arrays["FILEROWNUMBER"] = pa.array(np.frombuffer(columns.row_numbers, dtype=np.int64))
+        return pa.StructArray.from_arrays(list(arrays.values()), list(arrays))
+
+    def to_arrow(self):
+        """One row per contract as a pyarrow Table, releasing the indexed records as each type is nested"""
+        import numpy as np
+        import pyarrow as pa
+
+        contract_count = len(self.keys)
+        groups, contract_numbers, participants = zip(*self.keys) if self.keys else ((), (), ())
+        columns = {
+            CONTRACT_KEY: pa.array(contract_numbers, pa.string()),
+            "FILEHEADERGROUPNUMBER": pa.array(groups, pa.int64()),
+            "SUBMITTINGPARTICIPANTNUMBER": pa.array(participants, pa.string())
+        }
+
+        # Every keyed type gets its column, present in this file or not, so files share one schema
+        for record_type in sorted(self.key_positions, key=lambda record_type: record_type != "contract_record"):
+            records = self._struct_array(record_type)
+            contract_ids = np.frombuffer(self.contract_ids.get(record_type, array("q")), dtype=np.int64)
+            self.records.pop(record_type, None)
+            self.contract_ids.pop(record_type, None)
+
+            # A contract's records are normally contiguous, so ids only need sorting when a contract recurs later;
+            # the stable sort keeps each contract's records in file order
+            if len(contract_ids) > 1 and (contract_ids[1:] < contract_ids[:-1]).any():
+                records = records.take(pa.array(np.argsort(contract_ids, kind="stable")))
+            offsets = np.zeros(contract_count + 1, dtype=np.int32)
+            np.cumsum(np.bincount(contract_ids, minlength=contract_count), out=offsets[1:])
+            columns[record_type] = pa.ListArray.from_arrays(pa.array(offsets), records)
+
+        columns["SOURCEFILENAME"] = pa.repeat(pa.scalar(self.file_name, pa.string()), contract_count)
+        columns["LOADDATE"] = pa.repeat(pa.scalar(self.load_time, pa.timestamp("us")), contract_count)
+        columns["MODIFIEDDATE"] = columns["LOADDATE"]
+        columns["FILEDROPDAY"] = pa.repeat(pa.scalar(self.file_drop_date, pa.date32()), contract_count)
+        return pa.table(columns)
+
+class _CountingOutput:
+    """File object over a write-only stream (local file or ADLS output stream), counting the bytes written"""
+    closed = False
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.bytes_written = 0
+
+    def write(self, data):
+        self.stream.write(data)
+        self.bytes_written += len(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+def encode_contracts(table, output_format, stream, compression="snappy"):
+    """Write a contracts table to a binary stream batch by batch - Parquet with the given codec (one row group
+    per batch), or one JSON object per line; returns the bytes written. The caller closes the stream.
+    """
+    output = _CountingOutput(stream)
+    batches = table.to_batches(max_chunksize=CONTRACT_BATCH_ROWS)
+
+    if output_format == "parquet":
+        import pyarrow.parquet as pq
+        with pq.ParquetWriter(output, table.schema, compression=compression) as writer:
+            for batch in batches:
+                writer.write_batch(batch)
+        return output.bytes_written
+
+    for batch in batches:
+        output.write("".join(json.dumps(row, default=str) + "\n" for row in batch.to_pylist()).encode("utf-8"))
+    return output.bytes_written
@@ -0,0 +1,305 @@
+"""Streaming CSV writer - rows go from the parser to per-type CSV outputs in buffered chunks"""
+
+import csv
+import io
+import os
+import pickle
+import tempfile
+import time
+from operator import itemgetter
+
+from .compression import open_compressed, with_compression_suffix
+from .layouts import CONTRA_ENRICH_FIELDS, get_layouts
+from .parser import iter_stream_lines
+from .storage_io import gather
+from .unknown import UnknownLayoutSummary, unknown_line_code, unknown_line_detail
+
+CSV_LINE_TERMINATOR = os.linesep  # Matches pandas to_csv default
+CSV_BUFFER_SIZE = 4 * 1024 * 1024
+UNKNOWN_LAYOUT_COLUMNS = ["FILENAME", "FILEROWNUMBER", "RECORDTYPE", "DETAIL", "LOADDATE"]
+
+def pandas_timestamp_text(value):
+    """Render a timestamp exactly as pandas to_csv renders a constant datetime64 column"""
+    if value.hour == value.minute == value.second == value.microsecond == 0:
+        return value.strftime("%Y-%m-%d")
+    text = value.strftime("%Y-%m-%d %H:%M:%S")
+    if value.microsecond % 1000:
+        return f"{text}.{value.microsecond:06d}"
+    if value.microsecond:
+        return f"{text}.{value.microsecond // 1000:03d}"
+    return text
+
+def open_local_stream(path):
+    """Binary write stream for a local path, creating its directory"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    return open(path, "wb")
+
+def _csv_header(source, buffer_size):
+    """(column names, bytes read past the header line) of a binary CSV stream"""
+    pending = b""
+    while b"\n" not in pending:
+        block = source.read(buffer_size)
+        if not block:
+            break
+        pending += block
+    header, _, rest = pending.partition(b"\n")
+    return next(csv.reader([header.rstrip(b"\r").decode("utf-8")]), []), rest
+
+def concatenate_csv_parts(part_paths, output, open_input, buffer_size=None):
+    """Stream part CSVs into one binary output under a single header - every part's columns in first-seen order,
+    as unionByName(allowMissingColumns=True) orders them. Parts with exactly those columns are copied block by
+    block; the others are rewritten row by row with blanks for the columns they lack. Returns the columns.
+    """
+    buffer_size = buffer_size or CSV_BUFFER_SIZE
+    part_columns = []
+    for path in part_paths:
+        source = open_input(path)
+        try:
+            part_columns.append(_csv_header(source, buffer_size)[0])
+        finally:
+            source.close()
+    columns = list(dict.fromkeys(column for names in part_columns for column in names))
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator=CSV_LINE_TERMINATOR)
+
+    def flush():
+        output.write(buffer.getvalue().encode("utf-8"))
+        buffer.seek(0)
+        buffer.truncate()
+
+    writer.writerow(columns)
+    flush()
+    for path, names in zip(part_paths, part_columns):
+        if not names:
+            continue  # Empty part - no header, no rows
+        source = open_input(path)
+        try:
+            if names == columns:
+                _, block = _csv_header(source, buffer_size)
+                last = b"\n"
+                while block:
+                    output.write(block)
+                    last = block[-1:]
+                    block = source.read(buffer_size)
+                if last != b"\n":
+                    output.write(CSV_LINE_TERMINATOR.encode("utf-8"))
+                continue
+
+            # Duplicate names keep their last value, as in _CsvOutput.use_columns
+            position = {name: index for index, name in enumerate(names)}
+            picks = [position.get(column) for column in columns]
+            rows = csv.reader(iter_stream_lines(source, buffer_size))
+            next(rows, None)
+            for row in rows:
+                writer.writerow(["" if index is None or index >= len(row) else row[index] for index in picks])
+                if buffer.tell() >= buffer_size:
+                    flush()
+            flush()
+        finally:
+            source.close()
+    return columns
+
+class _CsvOutput:
+    """One CSV target - rows are formatted into a bounded buffer and flushed as parts of a single stream"""
+
+    def __init__(self, path, buffer_bytes, open_stream, compression=None):
+        self.path = path
+        self.buffer_bytes = buffer_bytes
+        self.open_stream = open_stream
+        self.compression = compression
+        self.buffer = io.StringIO()
+        self.writer = csv.writer(self.buffer, lineterminator=CSV_LINE_TERMINATOR)
+        self.stream = None
+        self.columns = None
+        self.picker = None
+        self.count = 0
+        self.bytes_written = 0      # CSV bytes before compression
+        self.compressed_bytes = 0
+        self.codec_seconds = 0.0
+        self.write_seconds = 0.0
+        self.write_cpu_seconds = 0.0
+
+    def use_columns(self, columns):
+        """Duplicate names keep their first position and last value, like a dict-built DataFrame"""
+        self.columns = list(columns)
+        last_index = {name: index for index, name in enumerate(columns)}
+        if len(last_index) != len(columns):
+            self.picker = itemgetter(*last_index.values())
+        return list(last_index)
+
+    def write_header(self, columns):
+        self.writer.writerow(self.use_columns(columns))
+
+    def write_row(self, row):
+        self.writer.writerow(self.picker(row) if self.picker else row)
+        self.count += 1
+        if self.buffer.tell() >= self.buffer_bytes:
+            self.flush()
+
+    def flush(self):
+        data = self.buffer.getvalue().encode("utf-8")
+        if not data:
+            return
+        write_start, cpu_start = time.perf_counter(), time.thread_time()
+        if self.stream is None:
+            self.stream = self._open()
+        self.stream.write(data)
+        self.write_seconds += time.perf_counter() - write_start
+        self.write_cpu_seconds += time.thread_time() - cpu_start
+        self.bytes_written += len(data)
+        self.buffer.seek(0)
+        self.buffer.truncate()
+
+    def _open(self):
+        return open_compressed(self.open_stream(self.path), self.compression)
+
+    def _close_stream(self):
+        self.stream.close()
+        if self.compression:
+            stats = self.stream.stats()
+            self.compressed_bytes += stats["stored_bytes"]
+            self.codec_seconds += stats["codec_seconds"]
+        self.stream = None
+
+    def close(self):
+        self.flush()
+        if self.stream is not None:
+            self._close_stream()
+
+    def saved_entry(self, config_name, display_name):
+        """saved_files entry - bytes_written is what reached storage, compressed or not"""
+        entry = {
+            'config_name': config_name,
+            'display_name': display_name,
+            'count': self.count,
+            'file_name': os.path.basename(self.path),
+            'bytes_written': self.compressed_bytes if self.compression else self.bytes_written,
+            'write_seconds': self.write_seconds,
+            'write_cpu_seconds': self.write_cpu_seconds
+        }
+        if self.compression:
+            # Same shape as CompressedWriter.stats(), so it folds straight into StageMetrics.add_compression
+            entry['compression'] = {'compression': self.compression, 'stored_bytes': self.compressed_bytes,
+                                    'raw_bytes': self.bytes_written, 'codec_seconds': self.codec_seconds}
+        return entry
+
+class StreamingCsvSink:
+    """Parser sink writing byte-identical CSVs (vs the DataFrame path) with memory bounded by the buffer size"""
+
+    def __init__(self, file_name, load_time, file_drop_date, base_path, buffer_bytes=None, layouts=None, open_stream=None,
+                 unknown_detail=False, compression=None, storage_io=None):
+        self.file_name = file_name
+        self.base_path = base_path.rstrip("/")
+        self.buffer_bytes = buffer_bytes or CSV_BUFFER_SIZE
+        self.layouts = layouts or get_layouts()
+        self.open_stream = open_stream or open_local_stream
+        self.compression = compression  # gzip/zstd CSVs are named <record type>.csv.gz / .csv.zst
+        self.storage_io = storage_io    # StorageIO pool closing the outputs concurrently in finish()
+        load_text = pandas_timestamp_text(load_time)
+        self.metadata_suffix = [file_name, load_text, load_text, "" if file_drop_date is None else str(file_drop_date)]
+        self.load_text = load_text
+        self.outputs = {}  # Insertion order = first appearance in the file
+        self.unknown = UnknownLayoutSummary()
+        self.unknown_detail = unknown_detail  # unknown_layouts.csv gets one row per unknown line only on request
+        self.unknown_output = None
+
+        # contract_record only gains CONTRA_ columns once a row is enriched, so rows seen
+        # before that are spooled (memory, then disk) until the header can be decided
+        self.contra_decided = False
+        self.contra_spool = None
+
+    def output_file_name(self, name):
+        return with_compression_suffix(f"{name}.csv", self.compression)
+
+    def _new_output(self, name):
+        return _CsvOutput(f"{self.base_path}/{self.output_file_name(name)}", self.buffer_bytes, self.open_stream, self.compression)
+
+    def _output(self, record_type):
+        output = self.outputs.get(record_type)
+        if output is None:
+            output = self.outputs[record_type] = self._new_output(record_type)
+            if record_type != "contract_record":
+                output.write_header(self._header(record_type))
+        return output
+
+    def _header(self, record_type, with_contra=False):
+        header = list(self.layouts.compiled[record_type].columns) + [
+            "FILEROWNUMBER", "FILEHEADERGROUPNUMBER", "SUBMITTINGPARTICIPANTNUMBER",
+            "SOURCEFILENAME", "LOADDATE", "MODIFIEDDATE", "FILEDROPDAY"
+        ]
+        if with_contra:
+            header += [f"CONTRA_{field}" for field in CONTRA_ENRICH_FIELDS]
+        return header
+
+    def add(self, record_type, values, file_row_number, header_group_number, participant, contra_values=None):
+        output = self._output(record_type)
+        row = values + [file_row_number, header_group_number, participant] + self.metadata_suffix
+
+        if record_type != "contract_record":
+            output.write_row(row)
+        elif self.contra_decided:
+            output.write_row(row + (contra_values or [None] * len(CONTRA_ENRICH_FIELDS)))
+        elif contra_values is None:
+            if self.contra_spool is None:
+                self.contra_spool = tempfile.SpooledTemporaryFile(max_size=self.buffer_bytes)
+            pickle.dump(row, self.contra_spool)
+            output.count += 1
+        else:
+            self._decide_contra(output, with_contra=True)
+            output.write_row(row + contra_values)
+
+    def _decide_contra(self, output, with_contra):
+        """Write the contract_record header, then replay rows spooled before the decision"""
+        self.contra_decided = True
+        output.write_header(self._header("contract_record", with_contra))
+        if self.contra_spool is None:
+            return
+        padding = [None] * len(CONTRA_ENRICH_FIELDS) if with_contra else []
+        spooled_count = output.count
+        output.count = 0
+        self.contra_spool.seek(0)
+        for _ in range(spooled_count):
+            output.write_row(pickle.load(self.contra_spool) + padding)
+        self.contra_spool.close()
+        self.contra_spool = None
+
+    def add_unknown(self, file_row_number, line):
+        self.unknown.add(file_row_number, line)
+        if not self.unknown_detail:
+            return
+        if self.unknown_output is None:
+            self.unknown_output = self._new_output("unknown_layouts")
+            self.unknown_output.write_header(UNKNOWN_LAYOUT_COLUMNS)
+        self.unknown_output.write_row([
+            self.file_name, file_row_number, unknown_line_code(line), unknown_line_detail(line), self.load_text
+        ])
+
+    def counts(self):
+        return {record_type: output.count for record_type, output in self.outputs.items()}
+
+    @property
+    def unknown_count(self):
+        return self.unknown.total
+
+    def finish(self):
+        """Flush and close every output; returns saved-file entries like save_to_csv_enhanced"""
+        if "contract_record" in self.outputs and not self.contra_decided:
+            self._decide_contra(self.outputs["contract_record"], with_contra=False)
+
+        saved_files = []
+        outputs = [(record_type, self.layouts.display_name(record_type), output) for record_type, output in self.outputs.items()]
+        if self.unknown_output is not None:
+            outputs.append(("unknown_layouts", "Unknown Layouts", self.unknown_output))
+
+        if self.storage_io is None:
+            for _, _, output in outputs:
+                output.close()
+        else:
+            # Each close is a last flush plus a storage commit round trip; a half-written close is not retried
+            gather([self.storage_io.submit(f"close {output.path}", output.close, retries=0) for _, _, output in outputs])
+
+        for config_name, display_name, output in outputs:
+            saved_files.append(output.saved_entry(config_name, display_name))
+            print(f"{display_name}: {output.count:,} records → {saved_files[-1]['file_name']}")
+        return saved_files
@@ -0,0 +1,235 @@
+"""Spark-native parsing - classification, extraction and enrichment as column expressions on the executors.
+
+Lines are numbered with zipWithIndex and never collected to the driver; only a small per-record-type summary is.
+pyspark is imported inside the functions, so the rest of the package runs without it.
+"""
+
+from datetime import datetime
+
+from .layouts import CONTRA_ENRICH_FIELDS
+from .metrics import StageMetrics
+from .parser import extract_file_drop_date
+from .sinks import report_invalid_values
+from .unknown import UnknownLayoutSummary
+
+BUCKET_ROWS = 1000000  # Rows per window bucket when carrying header/contra state forward
+
+def _strip_column(column):
+    """Spark equivalent of str.strip() for fixed-width fields"""
+    from pyspark.sql import functions as F
+    return F.regexp_replace(column, r"^\s+|\s+$", "")
+
+def _substring_column(start, end):
+    """Spark equivalent of line[start:end]"""
+    from pyspark.sql import functions as F
+    return F.substring("value", start + 1, end - start)
+
+def _classification_column(classifier):
+    """Chain of key comparisons mirroring the classifier's lookup order"""
+    from pyspark.sql import functions as F
+    if classifier.custom_matchers:
+        raise ValueError("The spark engine requires every layout matcher to expose a record_key")
+
+    record_type = None
+    branches = [(_substring_column(1, 5) == key, value) for key, value in classifier.full_keys.items()]
+    branches += [(_substring_column(1, 3) == key, value) for key, value in classifier.header_keys.items()]
+    for condition, value in branches:
+        record_type = F.when(condition, value) if record_type is None else record_type.when(condition, value)
+    return record_type
+
+def _typed_column(column, field_type):
+    """Spark equivalent of convert_typed_column - invalid values become null"""
+    from pyspark.sql import functions as F
+    from pyspark.sql.types import DecimalType, LongType
+    kind, scale, width = field_type
+    if kind == "date":
+        # to_date raises on impossible dates such as '20240230' under spark.sql.ansi.enabled; try_ nulls them
+        return F.when(column.rlike(r"^[0-9]{8}$") & ~column.rlike(r"^0*$"),
+                      F.try_to_timestamp(column, F.lit("yyyyMMdd")).cast("date"))
+    numeric = F.when(column.rlike(r"^[+-]?[0-9]+$"), column.cast(DecimalType(width, 0)))
+    if kind == "int":
+        return numeric.cast(LongType())
+    return (numeric / F.lit(10 ** scale)).cast(DecimalType(width, scale))
+
+def _invalid_column(column, field_type):
+    """True where a value is present but does not convert - blanks (and all-zero dates) are not counted"""
+    present = ~column.rlike(r"^0*$") if field_type[0] == "date" else column != ""
+    return present & _typed_column(column, field_type).isNull()
+
+def _invalid_counts(layouts):
+    """{"record_type.COLUMN": count aggregate} for every typed column, as ColumnarRecordSink.invalid_values keys them"""
+    from pyspark.sql import functions as F
+    counts = {}
+    for record_type, compiled in layouts.compiled.items():
+        is_type = F.col("RECORD_TYPE") == record_type
+        fields = [(col, _strip_column(_substring_column(start, end))) for col, start, end, *_ in compiled.layout]
+        field_types = compiled.field_types
+        if record_type == "contract_record":
+            fields += [(f"CONTRA_{field}", F.col(f"_current_contra.{field}")) for field in CONTRA_ENRICH_FIELDS]
+            field_types = {**field_types, **layouts.contra_field_types}
+        for col, column in fields:
+            if col in field_types:
+                counts[f"{record_type}.{col}"] = F.count(F.when(is_type & _invalid_column(column, field_types[col]), True))
+    return counts
+
+def _layout_columns(compiled, typed=False):
+    """Stripped (and optionally typed) field columns of one compiled layout"""
+    columns = []
+    for col, start, end, *_ in compiled.layout:
+        column = _strip_column(_substring_column(start, end))
+        if typed and col in compiled.field_types:
+            column = _typed_column(column, compiled.field_types[col])
+        columns.append(column.alias(col))
+    return columns
+
+def parse_file_distributed(spark, file_path, file_name, layouts, typed=False, unknown_detail=False, load_time=None,
+                           metrics=None, on_release=None, bucket_rows=None):
+    """Parse a file with Spark column expressions; returns ({record_type: DataFrame}, unknown DataFrame or None,
+    UnknownLayoutSummary, {"record_type.COLUMN": invalid typed values}). Frames have the driver engine's columns,
+    sorted by FILEROWNUMBER.
+
+    The frames read from a persisted frame of classified lines. on_release(release) receives the call that
+    unpersists it, to run once the outputs are written; without on_release it is never released.
+    """
+    from pyspark import StorageLevel
+    from pyspark.sql import Window, functions as F
+    from pyspark.sql.types import LongType, StringType, StructField, StructType
+    metrics = metrics or StageMetrics(file_name)
+    bucket_rows = bucket_rows or BUCKET_ROWS
+    file_drop_date = extract_file_drop_date(file_name)
+    load_time = load_time or datetime.now()
+
+    # Number non-empty lines in file order; zipWithIndex only ships partition sizes to the driver.
+    # .gz/.zst sources are decoded by Spark's Hadoop codecs (one partition per file - they cannot be split)
+    text_df = spark.read.text(file_path)
+    non_empty = text_df.where(F.col("value").isNotNull() & F.col("value").rlike(r"\S"))
+    numbered_rdd = non_empty.rdd.zipWithIndex().map(lambda pair: (pair[0].value, pair[1] + 1))
+    lines = spark.createDataFrame(numbered_rdd, StructType([
+        StructField("value", StringType(), True),
+        StructField("FILEROWNUMBER", LongType(), False)
+    ]))
+
+    # Classify and capture the state-carrying fields of header and contra lines
+    is_header = (_substring_column(1, 3) == "10").cast("int")
+    header_participant = F.when(F.length("value") > 6, _strip_column(_substring_column(3, 7))).otherwise(F.lit(""))
+    unknown = UnknownLayoutSummary()
+
+    lines = (lines
+        .withColumn("RECORD_TYPE", _classification_column(layouts.classifier))
+        .withColumn("_unknown_code", F.when(F.col("RECORD_TYPE").isNull(),
+            F.when(F.length("value") > 2, _substring_column(1, 3)).otherwise(F.lit(""))))
+        .withColumn("_bucket", F.floor((F.col("FILEROWNUMBER") - 1) / bucket_rows))
+        .withColumn("_is_header", is_header)
+        .withColumn("_header_participant", F.when(F.col("_is_header") == 1, header_participant))
+        # Kept as strings - CONTRA_ columns are typed where contracts select them, so their invalid values are counted there
+        .withColumn("_contra", F.when(F.col("RECORD_TYPE") == "contra_record", F.struct(*_layout_columns(layouts.contra)))))
+
+    # Carry state forward inside each bucket (buckets are sorted independently on the executors)
+    in_bucket = Window.partitionBy("_bucket").orderBy("FILEROWNUMBER").rowsBetween(Window.unboundedPreceding, Window.currentRow)
+    # Unknown lines are numbered per record code, as UnknownLayoutSummary keeps the first lines of each code
+    code_in_bucket = Window.partitionBy("_bucket", "_unknown_code").orderBy("FILEROWNUMBER")
+    lines = (lines
+        .withColumn("_headers_in_bucket", F.sum("_is_header").over(in_bucket))
+        .withColumn("_participant_in_bucket", F.last("_header_participant", ignorenulls=True).over(in_bucket))
+        .withColumn("_contra_in_bucket", F.last("_contra", ignorenulls=True).over(in_bucket))
+        .withColumn("_unknowns_in_bucket", F.when(F.col("RECORD_TYPE").isNull(), F.row_number().over(code_in_bucket))))
+
+    # Carry state across buckets through a one-row-per-bucket frame, broadcast back to the lines
+    bucket_state = lines.groupBy("_bucket").agg(
+        F.sum("_is_header").alias("_bucket_headers"),
+        F.max(F.when(F.col("_header_participant").isNotNull(), F.struct("FILEROWNUMBER", "_header_participant"))).alias("_last_header"),
+        F.max(F.when(F.col("_contra").isNotNull(), F.struct("FILEROWNUMBER", "_contra"))).alias("_last_contra"))
+    before_bucket = Window.orderBy("_bucket").rowsBetween(Window.unboundedPreceding, -1)
+    bucket_state = bucket_state.select(
+        "_bucket",
+        F.coalesce(F.sum("_bucket_headers").over(before_bucket), F.lit(0)).alias("_headers_before"),
+        F.last(F.col("_last_header._header_participant"), ignorenulls=True).over(before_bucket).alias("_participant_before"),
+        F.last(F.col("_last_contra._contra"), ignorenulls=True).over(before_bucket).alias("_contra_before"))
+
+    lines = (lines.join(F.broadcast(bucket_state), "_bucket")
+        .withColumn("FILEHEADERGROUPNUMBER", F.col("_headers_before") + F.col("_headers_in_bucket"))
+        .withColumn("SUBMITTINGPARTICIPANTNUMBER", F.coalesce("_participant_in_bucket", "_participant_before", F.lit("")))
+        .withColumn("_current_contra", F.coalesce("_contra_in_bucket", "_contra_before"))
+        # Sample candidates are the first unknown lines of each code in each bucket, so the samples stay bounded however many lines fail
+        .withColumn("_unknown_sample", F.when(F.col("RECORD_TYPE").isNull() & (F.col("_unknowns_in_bucket") <= unknown.sample_size),
+            F.struct("FILEROWNUMBER", _substring_column(0, 80).alias("DETAIL"))))
+        .select("value", "FILEROWNUMBER", "RECORD_TYPE", "FILEHEADERGROUPNUMBER",
+                "SUBMITTINGPARTICIPANTNUMBER", "_current_contra", "_unknown_code", "_unknown_sample")
+        .persist(StorageLevel.MEMORY_AND_DISK))
+    if on_release is not None:
+        on_release(lines.unpersist)
+
+    invalid_counts = _invalid_counts(layouts) if typed else {}
+    try:
+        # One small aggregate tells us which record types (and unknown record codes, with their first few
+        # lines) exist, in first-seen order, and how many values fail typed conversion. This is the first Spark
+        # action, so it carries the read and classification; extraction runs lazily in the writes
+        with metrics.stage("classify"):
+            type_summary = (lines.groupBy("RECORD_TYPE", "_unknown_code")
+                .agg(F.count(F.lit(1)).alias("count"),
+                     F.min("FILEROWNUMBER").alias("first_row"),
+                     F.count(F.when(F.col("RECORD_TYPE") == "contract_record", F.col("_current_contra"))).alias("enriched"),
+                     F.slice(F.array_sort(F.collect_list("_unknown_sample")), 1, unknown.sample_size).alias("samples"),
+                     *[count.alias(f"_invalid_{index}") for index, count in enumerate(invalid_counts.values())])
+                .orderBy("first_row")
+                .collect())
+    except Exception:
+        if on_release is None:
+            lines.unpersist()
+        raise
+
+    metadata_columns = [
+        F.col("FILEROWNUMBER"),
+        F.col("FILEHEADERGROUPNUMBER"),
+        F.col("SUBMITTINGPARTICIPANTNUMBER"),
+        F.lit(file_name).alias("SOURCEFILENAME"),
+        F.lit(load_time).alias("LOADDATE"),
+        F.lit(load_time).alias("MODIFIEDDATE"),
+        F.lit(file_drop_date).cast("date").alias("FILEDROPDAY")
+    ]
+
+    spark_dataframes = {}
+    unknown_df = None
+    for row in type_summary:
+        record_type = row["RECORD_TYPE"]
+
+        # Record types outside the selection are classified but never extracted
+        if record_type is not None and record_type not in layouts.compiled:
+            continue
+
+        if record_type is None:
+            unknown.add_aggregate(row["_unknown_code"], row["count"],
+                                  [[sample["FILEROWNUMBER"], sample["DETAIL"]] for sample in row["samples"]])
+            if unknown_detail and unknown_df is None:
+                unknown_df = (lines.where(F.col("RECORD_TYPE").isNull())
+                    .orderBy("FILEROWNUMBER")
+                    .select(
+                        F.lit(file_name).alias("FILENAME"),
+                        F.col("FILEROWNUMBER"),
+                        F.col("_unknown_code").alias("RECORDTYPE"),
+                        _substring_column(0, 80).alias("DETAIL"),
+                        F.lit(load_time).alias("LOADDATE")))
+            continue
+
+        columns = _layout_columns(layouts.compiled[record_type], typed) + metadata_columns
+
+        # Contra enrichment columns only appear once a contra record precedes a contract
+        if record_type == "contract_record" and row["enriched"] > 0:
+            for field in CONTRA_ENRICH_FIELDS:
+                column = F.col(f"_current_contra.{field}")
+                if typed and f"CONTRA_{field}" in layouts.contra_field_types:
+                    column = _typed_column(column, layouts.contra_field_types[f"CONTRA_{field}"])
+                columns.append(column.alias(f"CONTRA_{field}"))
+
+        spark_dataframes[record_type] = (lines.where(F.col("RECORD_TYPE") == record_type)
+            .orderBy("FILEROWNUMBER")
+            .select(*columns))
+        print(f"{layouts.display_name(record_type)}: {row['count']:,} records")
+
+    invalid_values = {}
+    for index, name in enumerate(invalid_counts):
+        total = sum(row[f"_invalid_{index}"] for row in type_summary)
+        if total:
+            invalid_values[name] = total
+    report_invalid_values(invalid_values)
+    return spark_dataframes, unknown_df, unknown, invalid_values
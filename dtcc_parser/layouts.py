@@ -0,0 +1,621 @@
+"""Record layouts: built-in RECORD_CONFIGS, the YAML layout loader and the compiled extractors"""
+
+import hashlib
+import json
+import os
+import re
+import tempfile
+from operator import itemgetter
+
+# Record key matchers - callable like the original lambdas, but expose the
+# (record code, sequence) key so the classifier can dispatch on it
+def record_key_matcher(record_code, sequence=None):
+    """Build a matcher for line[1:3] == record_code (and line[3:5] == sequence)"""
+    if sequence is None:
+        matcher = lambda line: len(line) > 2 and line[1:3] == record_code
+    else:
+        matcher = lambda line: len(line) > 4 and line[1:3] == record_code and line[3:5] == sequence
+    matcher.record_key = (record_code, sequence)
+    return matcher
+
+# Optional 4th layout element: field type, converted column-at-a-time when 'typed_output' is on.
+# Untyped fields stay stripped strings. Implied decimals carry their scale (digits after the implied point).
+def implied_decimal(scale):
+    return ("decimal", scale)
+
+AMOUNT = implied_decimal(2)   # 9(n)V99 money amounts
+RATE = implied_decimal(7)     # 9(3)V9(7) percentages and rates
+UNITS = implied_decimal(6)    # 9(12)V9(6) fund units
+INTEGER = ("int", None)       # Counts
+DATE = ("date", None)         # YYYYMMDD; blank or all-zero means no date
+
+# Built-in layouts - configs/config.yaml mirrors these and replaces them when it is loaded
+RECORD_CONFIGS = {
+    "contract_valuation": {
+        "layout": [
+            ("SUBMITTERCODE", 0, 1), ("RECORDTYPE", 1, 3), ("SEQUENCENUMBER", 3, 5), ("CONTRACTNUMBER", 5, 35),
+            ("CONTRACTVALUEAMOUNT1", 35, 51, AMOUNT), ("CONTRACTVALUEQUALIFIER1", 51, 54),
+            ("CONTRACTVALUEAMOUNT2", 55, 71, AMOUNT), ("CONTRACTVALUEQUALIFIER2", 71, 74),
+            ("CONTRACTVALUEAMOUNT3", 75, 91, AMOUNT), ("CONTRACTVALUEQUALIFIER3", 91, 94),
+            ("CONTRACTVALUEAMOUNT4", 95, 111, AMOUNT), ("CONTRACTVALUEQUALIFIER4", 111, 114),
+            ("CONTRACTVALUEAMOUNT5", 115, 131, AMOUNT), ("CONTRACTVALUEQUALIFIER5", 131, 134),
+            ("CONTRACTPERCENTAGEAMOUNT1", 135, 145, RATE), ("CONTRACTPERCENTAGEAMOUNTQUALIFIER1", 145, 148),
+            ("CONTRACTPERCENTAGEAMOUNT2", 149, 159, RATE), ("CONTRACTPERCENTAGEAMOUNTQUALIFIER2", 159, 162),
+            ("CONTRACTPERCENTAGEAMOUNT3", 163, 173, RATE), ("CONTRACTPERCENTAGEAMOUNTQUALIFIER3", 173, 176),
+            ("REJECTCODELIST", 288, 300)
+        ],
+        "matcher": record_key_matcher("13", "02"),
+        "display_name": "Contract Valuation"
+    },
+    
+    "submitting_header": {
+        "layout": [
+            ("SUBMITTERCODE", 0, 1), ("RECORDTYPE", 1, 3), ("SUBMITTINGPARTICIPANTNUMBER", 3, 7),
+            ("IPSBUSINESSCODE", 7, 10), ("TRANSMISSIONUNIQUEID", 10, 40), ("TOTALCOUNT", 40, 52, INTEGER),
+            ("VALUATIONDATE", 52, 60, DATE), ("TESTINDICATOR", 60, 61), ("ASSOCIATEDCARRIERCOMPANYID", 61, 71),
+            ("REJECTCODE", 288, 300)
+        ],
+        "matcher": record_key_matcher("10"),
+        "display_name": "Submitting Header"
+    },
+    
+    "contra_record": {
+        "layout": [
+            ("SUBMITTERCODE", 0, 1), ("RECORDTYPE", 1, 3), ("CONTRAPARTICIPANTNUMBER", 3, 7),
+            ("ASSOCIATEDFIRMID", 7, 11), ("ASSOCIATEDFIRMSUBMITTEDCONTRACTCOUNT", 11, 21, INTEGER),
+            ("ASSOCIATEDFIRMDELIVEREDCONTRACTCOUNT", 21, 31, INTEGER), ("IPSEVENTCODE", 31, 34),
+            ("IPSSTAGECODE", 34, 37), ("REJECTCODE", 288, 300)
+        ],
+        "matcher": record_key_matcher("12"),
+        "display_name": "Contra Record"
+    },
+    
+    "contract_underlying_asset": {
+        "layout": [
+            ("SUBMITTERSCODE", 0, 1), ("RECORDTYPE", 1, 3), ("SEQUENCENUMBER", 3, 5), ("CONTRACTNUMBER", 5, 35),
+            ("CUSIPFUNDID", 35, 54), ("FUNDVALUE", 54, 70, AMOUNT), ("FUNDPERCENTAGE", 70, 80, RATE), ("FUNDUNITS", 80, 98, UNITS),
+            ("GUARANTEEDINTERESTRATE", 98, 108, RATE), ("FUNDSECURITYNAME", 108, 148), ("FUNDSECURITYTYPE", 148, 151),
+            ("MUTUALFUNDCUSIP", 151, 160), ("RESTRICTIONINDICATOR", 160, 161), ("RESTRICTIONREASON", 161, 162),
+            ("STANDINGALLOCINDICATOR", 162, 163), ("STANDINGALLOCATIONPCT", 163, 173, RATE), ("MATURITYELECTIONINSTRUCTIONS", 173, 175),
+            ("RATEFUNDRISKTHRESHOLDPCT", 175, 185, RATE), ("TOTALNETFUNDFEEPCT", 185, 195, RATE), ("MVAINDICATOR", 195, 196),
+            ("THIRDPARTYPLATFORMID", 196, 226), ("THIRDPARTYPLATFORMSOURCE", 226, 228), ("COREFUNDINDICATOR", 228, 229),
+            ("LOCKFEATUREINDICATOR", 229, 230), ("CARRIERFUNDLEVELFEE", 230, 240), ("INDEXSTRATEGYTERM", 240, 243),
+            ("INDEXSTRATEGYTERMQUALIFIER", 243, 244), ("NUMBEROFINDEXPERIODS", 244, 247), ("DURATIONOFINDEXPERIODS", 247, 250),
+            ("REJECTCODE", 288, 300)
+        ],
+        "matcher": record_key_matcher("13", "03"),
+        "display_name": "Contract Underlying Asset"
+    },
+    
+    "contract_record": {
+        "layout": [
+            ("SUBMITTERCODE", 0, 1), ("RECORDTYPE", 1, 3), ("SEQUENCENUMBER", 3, 5), ("CONTRACTNUMBER", 5, 35),
+            ("CUSIPNUMBER", 35, 44), ("CONTRACTSTATUS", 44, 46), ("ENDRECEIVINGCOMPANYID", 46, 66),
+            ("ENDRECEIVINGCOMPANYIDQUALIFIER", 66, 68), ("GROUPNUMBER", 68, 98), ("ORIGINALCONTRACTNUMBER", 98, 128),
+            ("DISTRIBUTORSACCOUNTID", 128, 158), ("IRSQUALIFICATIONCODE", 158, 162), ("PRODUCTTYPECODE", 162, 165),
+            ("COMMISSIONOPTION", 165, 169), ("FEEBASEDADVISORYINDICATOR", 169, 170), ("INHERITEDPAYOUTTIMINGCHOICE", 170, 171),
+            ("INVESTMENTONLYINDICATOR", 171, 172), ("COMMISSIONEXTENSION", 175, 185), ("ERISAINDICATOR", 185, 186),
+            ("CONTRACTSTATE", 186, 188), ("FUNDTRANSFERSRESTRICTIONINDICATOR", 188, 189), ("FUNDTRANSFERSRESTRICTIONREASON", 189, 191),
+            ("NONASSIGNABILITYINDICATOR", 191, 192), ("LIFETERMDURATION", 192, 194), ("DIVIDENDOPTION", 194, 196),
+            ("QLACINDICATOR", 196, 197), ("MVAINDICATOR", 197, 198), ("PRODUCTSHARECLASS", 198, 200),
+            ("COMMISSIONSCHEDULEIDENTIFIER", 200, 220), ("CONTRACTFEESINCLUDED", 220, 221), ("PRIORCARRIERPROCESSINGLOCATION", 221, 231),
+            ("REJECTCODE", 288, 300)
+        ],
+        "matcher": record_key_matcher("13", "01"),
+        "display_name": "Contract Record"
+    },
+    
+    "contract_index_loop": {
+        "layout": [
+            ("SUBMITTERCODE", 0, 1), ("RECORDTYPE", 1, 3), ("SEQUENCENUMBER", 3, 5), ("CONTRACTNUMBER", 5, 35),
+            ("CUSIPFUNDID", 35, 54), ("INDEXDURATIONVALUE", 54, 70, AMOUNT), ("INDEXDURATIONSTARTDATE", 70, 78, DATE),
+            ("INDEXDURATIONENDDATE", 78, 86, DATE), ("INDEXTERMMATURITYDATE", 86, 94, DATE), ("INDEXCREDITINGMETHOD", 94, 95),
+            ("INDEXCREDITINGMODE", 95, 98), ("INDEXCREDITINGMODEQUALIFIER", 98, 99), ("INDEXOPTIONPERIOD", 99, 102),
+            ("INDEXTYPE", 102, 103), ("INDEXDURATIONRATE1", 103, 113, RATE), ("INDEXDURATIONRATETYPE1", 113, 115),
+            ("INDEXDURATIONRATE2", 115, 125, RATE), ("INDEXDURATIONRATETYPE2", 125, 127),
+            ("INDEXDURATIONRATE3", 127, 137, RATE), ("INDEXDURATIONRATETYPE3", 137, 139),
+            ("INDEXDURATIONRATE4", 139, 149, RATE), ("INDEXDURATIONRATETYPE4", 149, 151),
+            ("INDEXDURATIONRATE5", 151, 161, RATE), ("INDEXDURATIONRATETYPE5", 161, 163),
+            ("INDEXDURATIONRATE6", 163, 173, RATE), ("INDEXDURATIONRATETYPE6", 173, 175),
+            ("INDEXOPTIONEFFECTIVEDATE", 175, 183, DATE), ("INDEXOPTIONBASEVALUE", 183, 199, AMOUNT),
+            ("DAILYTRACKINGVALUE", 199, 215, AMOUNT), ("LOCKEXECUTIONDATE", 215, 223, DATE),
+            ("LOCKEXECUTIONINDICATOR", 223, 224), ("TRANSFERWINDOWSTARTDATE", 224, 232, DATE),
+            ("TRANSFERWINDOWENDDATE", 232, 240, DATE), ("GROUPINGID", 240, 244), ("CARRIERFUNDLEVELFEE", 244, 249),
+            ("CARRIERFUNDLEVELFEEQUALIFIER", 249, 251), ("REJECTCODE", 288, 300)
+        ],
+        "matcher": record_key_matcher("13", "14"),
+        "display_name": "Contract Index Loop"
+    },
+    
+    "contract_band_guaranteed_loop": {
+        "layout": [
+            ("SUBMITTERCODE", 0, 1), ("RECORDTYPE", 1, 3), ("SEQUENCENUMBER", 3, 5), ("CONTRACTNUMBER", 5, 35),
+            ("CUSIPFUNDID", 35, 54), ("DEPOSITGUARANTEEDSTARTDATE", 54, 62, DATE), ("DEPOSITGUARANTEEDENDDATE", 62, 70, DATE),
+            ("DEPOSITGUARANTEEDMATURITYDATE", 70, 78, DATE), ("DEPOSITGUARANTEEDRATE1", 78, 88, RATE),
+            ("DEPOSITGUARANTEEDRATETYPE1", 88, 90), ("DEPOSITGUARANTEEDUNITS", 90, 108, UNITS),
+            ("DEPOSITGUARANTEEDPERIODFREQUENCYCODE", 108, 110), ("DEPOSITGUARANTEEDPERIODNUMBER", 110, 120, INTEGER),
+            ("DEPOSITGUARANTEEDVALUE", 120, 136, AMOUNT), ("DEPOSITGUARANTEEDRATE2", 136, 146, RATE),
+            ("DEPOSITGUARANTEEDRATETYPE2", 146, 148), ("DEPOSITGUARANTEEDRATE3", 148, 158, RATE),
+            ("DEPOSITGUARANTEEDRATETYPE3", 158, 160), ("DEPOSITGUARANTEEDRATE4", 160, 170, RATE),
+            ("DEPOSITGUARANTEEDRATETYPE4", 170, 172), ("DEPOSITGUARANTEEDRATE5", 172, 182, RATE),
+            ("DEPOSITGUARANTEEDRATETYPE5", 182, 184), ("DEPOSITGUARANTEEDRATE6", 184, 194, RATE),
+            ("DEPOSITGUARANTEEDRATETYPE6", 194, 196), ("GROUPINGID", 236, 240), ("REJECTCODE", 288, 300)
+        ],
+        "matcher": record_key_matcher("13", "04"),
+        "display_name": "Contract Band Guaranteed Loop"
+    },
+    
+    "contract_agent_record": {
+        "layout": [
+            ("SUBMITTERCODE", 0, 1), ("RECORDTYPE", 1, 3), ("SEQUENCENUMBER", 3, 5), ("CONTRACTNUMBER", 5, 35),
+            ("AGENTIDENTIFIER", 35, 55), ("AGENTIDENTIFIERQUALIFIER", 55, 57), ("AGENTROLE", 57, 59),
+            ("AGENTNONNATURALNAME", 59, 164), ("AGENTLASTNAME", 59, 94), ("AGENTFIRSTNAME", 94, 119),
+            ("AGENTMIDDLENAME", 119, 144), ("AGENTPREFIX", 144, 154), ("AGENTSUFFIX", 154, 164),
+            ("DISTRIBUTORASSIGNEDAGENTID", 164, 184), ("AGENTNATURALNONNATURALNAMEINDICATOR", 184, 185),
+            ("NATIONALPRODUCERNUMBER", 185, 195), ("FUNDTRANSFERAGENTAUTHINDICATOR", 195, 196),
+            ("CRDNUMBER", 196, 206), ("CARRIERASSIGNEDAGENTID", 206, 226), ("REJECTCODE", 288, 300)
+        ],
+        "matcher": record_key_matcher("13", "05"),
+        "display_name": "Contract Agent Record"
+    },
+    
+    "contract_dates_record": {
+        "layout": [
+            ("SUBMITTERCODE", 0, 1), ("RECORDTYPE", 1, 3), ("SEQUENCENUMBER", 3, 5), ("CONTRACTNUMBER", 5, 35),
+            ("CONTRACTDATE1", 35, 43, DATE), ("CONTRACTDATEQUALIFIER1", 43, 46),
+            ("CONTRACTDATE2", 47, 55, DATE), ("CONTRACTDATEQUALIFIER2", 55, 58),
+            ("CONTRACTDATE3", 59, 67, DATE), ("CONTRACTDATEQUALIFIER3", 67, 70),
+            ("CONTRACTDATE4", 71, 79, DATE), ("CONTRACTDATEQUALIFIER4", 79, 82),
+            ("CONTRACTDATE5", 83, 91, DATE), ("CONTRACTDATEQUALIFIER5", 91, 94),
+            ("CONTRACTDATE6", 95, 103, DATE), ("CONTRACTDATEQUALIFIER6", 103, 106),
+            ("CONTRACTDATE7", 107, 115, DATE), ("CONTRACTDATEQUALIFIER7", 115, 118),
+            ("CONTRACTDATE8", 119, 127, DATE), ("CONTRACTDATEQUALIFIER8", 127, 130),
+            ("CONTRACTDATE9", 131, 139, DATE), ("CONTRACTDATEQUALIFIER9", 139, 142),
+            ("CONTRACTDATE10", 143, 151, DATE), ("CONTRACTDATEQUALIFIER10", 151, 154),
+            ("CONTRACTDATE11", 155, 163, DATE), ("CONTRACTDATEQUALIFIER11", 163, 166),
+            ("CONTRACTDATE12", 167, 175, DATE), ("CONTRACTDATEQUALIFIER12", 175, 178),
+            ("CONTRACTDATE13", 179, 187, DATE), ("CONTRACTDATEQUALIFIER13", 187, 190),
+            ("CONTRACTDATE14", 191, 199, DATE), ("CONTRACTDATEQUALIFIER14", 199, 202),
+            ("CONTRACTDATE15", 203, 211, DATE), ("CONTRACTDATEQUALIFIER15", 211, 214),
+            ("CONTRACTDATE16", 215, 223, DATE), ("CONTRACTDATEQUALIFIER16", 223, 226),
+            ("CONTRACTDATE17", 227, 235, DATE), ("CONTRACTDATEQUALIFIER17", 235, 238),
+            ("CONTRACTDATE18", 239, 247, DATE), ("CONTRACTDATEQUALIFIER18", 247, 250),
+            ("CONTRACTDATE19", 251, 259, DATE), ("CONTRACTDATEQUALIFIER19", 259, 262),
+            ("CONTRACTDATE20", 263, 271, DATE), ("CONTRACTDATEQUALIFIER20", 271, 274),
+            ("REJECTCODE", 288, 300)
+        ],
+        "matcher": record_key_matcher("13", "06"),
+        "display_name": "Contract Dates Record"
+    },
+    
+    "contract_events_record": {
+        "layout": [
+            ("SUBMITTERCODE", 0, 1), ("RECORDTYPE", 1, 3), ("SEQUENCENUMBER", 3, 5), ("CONTRACTNUMBER", 5, 35),
+            ("EVENTPERIODTYPE1", 35, 38), ("EVENTTOTALAMOUNT1", 38, 54, AMOUNT), ("EVENTTYPECODE1", 54, 57), ("GROSSNETINDICATOR1", 57, 58),
+            ("EVENTPERIODTYPE2", 59, 62), ("EVENTTOTALAMOUNT2", 62, 78, AMOUNT), ("EVENTTYPECODE2", 78, 81), ("GROSSNETINDICATOR2", 81, 82),
+            ("EVENTPERIODTYPE3", 83, 86), ("EVENTTOTALAMOUNT3", 86, 102, AMOUNT), ("EVENTTYPECODE3", 102, 105), ("GROSSNETINDICATOR3", 105, 106),
+            ("EVENTPERIODTYPE4", 107, 110), ("EVENTTOTALAMOUNT4", 110, 126, AMOUNT), ("EVENTTYPECODE4", 126, 129), ("GROSSNETINDICATOR4", 129, 130),
+            ("EVENTPERIODTYPE5", 131, 134), ("EVENTTOTALAMOUNT5", 134, 150, AMOUNT), ("EVENTTYPECODE5", 150, 153), ("GROSSNETINDICATOR5", 153, 154),
+            ("NEXTEVENTDATE1", 154, 162, DATE), ("NEXTEVENTDATE2", 162, 170, DATE), ("NEXTEVENTDATE3", 170, 178, DATE),
+            ("NEXTEVENTDATE4", 178, 186, DATE), ("NEXTEVENTDATE5", 186, 194, DATE), ("REJECTCODE", 288, 300)
+        ],
+        "matcher": record_key_matcher("13", "07"),
+        "display_name": "Contract Events Record"
+    },
+    
+    "contract_party_record": {
+        "layout": [
+            ("SUBMITTERCODE", 0, 1), ("RECORDTYPE", 1, 3), ("SEQUENCENUMBER", 3, 5), ("CONTRACTNUMBER", 5, 35),
+            ("PARTYNONNATURALNAME", 35, 140), ("PARTYLASTNAME", 36, 70), ("PARTYMIDDLENAME", 96, 120), ("PARTYFIRSTNAME", 71, 95),
+            ("PARTYROLE", 140, 142), ("PARTYID", 142, 162), ("PARTYIDQUALIFIER", 162, 164),
+            ("PARTYDATEOFBIRTH", 164, 172, DATE), ("PARTYNONNATURALDATE", 164, 172, DATE), ("PARTYNONNATURALDATEQUALIFIER", 172, 175),
+            ("PARTYNATURALINDICATOR", 175, 176), ("CONTRACTPARTYROLEQUALIFIER", 176, 177), ("IMPAIREDRISK", 177, 178),
+            ("TRUSTREVOCABILITYINDICATOR", 178, 179), ("PARTYGENDER", 179, 180), ("BENEFICIARYAMOUNTQUANTITY", 180, 196),
+            ("BENEFICIARYQUANTITYQUALIFIER", 196, 198), ("BENEFICIARYQUANTITYPERCENT", 198, 208, RATE),
+            ("BENEFICIARYDISTRIBUTIONOPTION", 208, 209), ("UNDERWRITINGRISKCLASS", 209, 239),
+            ("REJECTCODE", 288, 300)
+        ],
+        "matcher": record_key_matcher("13", "09"),
+        "display_name": "Contract Party Record"
+    },
+    
+    "contract_party_address_record": {
+        "layout": [
+            ("SUBMITTERCODE", 0, 1), ("RECORDTYPE", 1, 3), ("SEQUENCENUMBER", 3, 5), ("CONTRACTNUMBER", 5, 35),
+            ("PARTYROLE", 35, 37), ("PARTYADDRESSLINE1", 37, 72), ("PARTYADDRESSLINE2", 72, 107),
+            ("PARTYCITY", 107, 137), ("PARTYSTATE", 137, 139), ("PARTYPOSTALCODE", 139, 154),
+            ("PARTYCOUNTRYCODE", 154, 157), ("PARTYADDRESSLINE3", 157, 192), ("PARTYADDRESSLINE4", 192, 227),
+            ("PARTYADDRESSLINE5", 227, 262), ("FOREIGNADDRESSINDICATOR", 262, 263),
+            ("REJECTCODE", 288, 300)
+        ],
+        "matcher": record_key_matcher("13", "10"),
+        "display_name": "Contract Party Address Record"
+    },
+    
+    "Contract_annuitization_payout_record": {
+        "layout": [
+            ("SUBMITTERCODE", 0, 1), ("RECORDTYPE", 1, 3), ("SEQUENCENUMBER", 3, 5), ("CONTRACTNUMBER", 5, 35),
+            ("ANNUITYPAYOUTAMOUNT", 35, 51, AMOUNT), ("ANNUITYPAYMENTAMOUNTQUALIFIER", 51, 54), ("ANNUITYFREQUENCYCODE", 54, 57),
+            ("PAYOUTOPTION", 57, 59), ("LIVESTYPE", 59, 60), ("PAYOUTTYPE", 60, 61), ("CERTAINPERIOD", 61, 65),
+            ("INCREASEPERCENTAGE", 65, 75, RATE), ("ASSUMEDINTERESTRATE", 75, 85, RATE), ("LEVELIZATIONINDICATOR", 85, 86),
+            ("PRIMARYSURVIVORADJUSTMENTTYPE", 86, 87), ("PRIMARYSURVIVORADJUSTMENTPERCENTAGE", 87, 97, RATE),
+            ("JOINTSURVIVORADJUSTMENTTYPE", 97, 98), ("JOINTSURVIVORADJUSTMENTPERCENTAGE", 98, 108, RATE),
+            ("EXCLUSIONVALUE", 108, 124, AMOUNT), ("EXCLUSIONINDICATOR", 124, 126), ("CERTAINPERIODQUALIFIER", 126, 129),
+            ("LIQUIDITYOPTION", 129, 131), ("LIQUIDITYWAITINGPERIOD", 131, 133), ("LIQUIDITYTRIGGEREVENT", 133, 135),
+            ("LIQUIDITYPARTIAL", 135, 136), ("PAYMENTSTARTDATE", 136, 144, DATE), ("PAYMENTENDDATE", 144, 152, DATE),
+            ("RETURNOFPREMIUMPERCENTAGE", 152, 162, RATE), ("PAYOUTCHANGEDATE", 162, 170, DATE), ("PAYOUTCHANGEAMOUNT", 170, 186, AMOUNT),
+            ("PAYOUTCHANGEQUALIFIER", 186, 188), ("PAYOUTCHANGEDIRECTIONINDICATOR", 188, 189), ("PAYOUTCHANGEFREQUENCY", 189, 191),
+            ("REJECTCODE", 288, 300)
+        ],
+        "matcher": record_key_matcher("13", "11"),
+        "display_name": "Contract Annuitization Payout Record"
+    },
+    
+    "contract_party_communication_record": {
+        "layout": [
+            ("SYSTEMCODE", 0, 1), ("RECORDTYPE", 1, 3), ("SEQUENCENUMBER", 3, 5), ("CONTRACTNUMBER", 5, 35),
+            ("CONTRACTENTITYTELEPHONETYPE1", 35, 37), ("CONTRACTENTITYTELEPHONENUMBER1", 37, 49), ("CONTRACTENTITYTELEPHONEEXTENSION1", 49, 55),
+            ("CONTRACTENTITYTELEPHONETYPE2", 55, 57), ("CONTRACTENTITYTELEPHONENUMBER2", 57, 69), ("CONTRACTENTITYTELEPHONEEXTENSION2", 69, 75),
+            ("CONTRACTENTITYTELEPHONETYPE3", 75, 77), ("CONTRACTENTITYTELEPHONENUMBER3", 77, 89), ("CONTRACTENTITYTELEPHONEEXTENSION3", 89, 95),
+            ("CONTRACTENTITYEMAILADDRESS1", 95, 175), ("CONTRACTENTITYEMAILQUALIFIER1", 175, 177),
+            ("CONTRACTENTITYEMAILADDRESS2", 177, 257), ("CONTRACTENTITYEMAILQUALIFIER2", 257, 259),
+            ("ELECTRONICDELIVERYINDICATOR", 259, 260), ("REJECTCODE", 288, 300)
+        ],
+        "matcher": record_key_matcher("13", "12"),
+        "display_name": "Contract Party Communication Record"
+    },
+    
+    "contract_service_feature_record": {
+        "layout": [
+            ("SUBMITTERSCODE", 0, 1), ("RECORDTYPE", 1, 3), ("SEQUENCENUMBER", 3, 5), ("CONTRACTNUMBER", 5, 35),
+            ("BENEFITACTIVATIONINDICATOR", 35, 36), ("BENEFITACTIVATIONDATE", 36, 44, DATE), ("CREDITINGPERIODEXPIRATIONDATE", 44, 52, DATE),
+            ("MARKETROLLUPDATE", 52, 60, DATE), ("MARKETROLLUPFREQUENCY", 60, 61), ("SERVICEFEATUREVALUE", 74, 88),
+            ("SERVICEFEATUREVALUEQUALIFIER", 88, 90), ("SERVICEFEATUREFREQUENCY", 90, 91), ("SERVICEFEATURESTARTDATE", 92, 100, DATE),
+            ("SERVICEFEATURESTOPDATE", 100, 108, DATE), ("EXPENSETYPE1", 108, 110), ("EXPENSEVALUE1", 110, 116), ("EXPENSEQUALIFIER1", 116, 118),
+            ("EXPENSETYPE2", 118, 120), ("EXPENSEVALUE2", 120, 126), ("EXPENSEQUALIFIER2", 126, 128),
+            ("LIVESTYPE", 128, 129), ("BENEFITREDUCTIONMETHOD", 129, 130), ("SERVICEFEATURENAME", 134, 169),
+            ("SERVICEFEATUREPRODUCTCODE", 169, 189), ("SERVICEFEATUREPROGRAMTYPE", 189, 190),
+            ("TYPECODE1", 190, 194), ("SUBTYPECODE1", 194, 198), ("TYPECODE2", 198, 202), ("SUBTYPECODE2", 202, 206),
+            ("TYPECODE3", 206, 210), ("SUBTYPECODE3", 210, 214), ("SURRENDERCHARGESCHEDULE", 238, 288),
+            ("REJECTCODE", 288, 300)
+        ],
+        "matcher": record_key_matcher("13", "15"),
+        "display_name": "Contract Service Feature Record"
+    }
+}
+
+# Contra fields copied onto each contract_record as CONTRA_<field>
+CONTRA_ENRICH_FIELDS = [
+    "CONTRAPARTICIPANTNUMBER", "ASSOCIATEDFIRMID",
+    "ASSOCIATEDFIRMSUBMITTEDCONTRACTCOUNT",
+    "ASSOCIATEDFIRMDELIVEREDCONTRACTCOUNT",
+    "IPSEVENTCODE", "IPSSTAGECODE"
+]
+
+# YAML layout loader - parsing and validation run once per config content hash
+MRO_RECORD_LENGTH = 300
+LAYOUT_FIELD_TYPES = ("string", "int", "date", "decimal")
+# Per-user cache of validated layouts as plain JSON - never unpickled, and kept out of other users' reach
+LAYOUT_CACHE_DIR = os.path.join(tempfile.gettempdir(), f"dtcc_layout_cache-{os.getuid()}" if hasattr(os, "getuid") else "dtcc_layout_cache")
+LAYOUT_CACHE_VERSION = 2  # Bump when the cached structure changes
+REQUIRED_RECORD_TYPES = ("submitting_header", "contra_record")  # Header groups and contract enrichment depend on them
+_MATCHER_CONDITION = re.compile(r"line\[(\d+):(\d+)\]\s*==\s*'([^']*)'")
+
+def parse_matcher_expression(expression):
+    """Parse "line[a:b] == 'x' and ..." into (start, end, value) conditions - the string is never evaluated"""
+    conditions = []
+    for part in expression.split(" and "):
+        match = _MATCHER_CONDITION.fullmatch(part.strip())
+        if not match:
+            raise ValueError(f"unsupported matcher expression {expression!r} (expected line[a:b] == '...' joined by 'and')")
+        start, end, value = int(match.group(1)), int(match.group(2)), match.group(3)
+        if len(value) != end - start:
+            raise ValueError(f"matcher {part.strip()!r} compares a {end - start}-character slice with {value!r}")
+        conditions.append((start, end, value))
+    return tuple(conditions)
+
+def conditions_matcher(conditions):
+    """Matcher for declarative slice conditions - keyed when they are a record code (+ sequence)"""
+    spans = [(start, end) for start, end, value in conditions]
+    if spans == [(1, 3)]:
+        return record_key_matcher(conditions[0][2])
+    if spans == [(1, 3), (3, 5)]:
+        return record_key_matcher(conditions[0][2], conditions[1][2])
+    return lambda line: all(line[start:end] == value for start, end, value in conditions)
+
+def validate_layout_config(raw_config):
+    """Check spans, types, overlaps and matchers; returns the config as plain tuples ready to cache"""
+    problems = []
+    layouts = {}
+    
+    for record_type, config in (raw_config or {}).items():
+        layout = []
+        fields = []
+        columns = set()
+        
+        for index, entry in enumerate(config.get("layout") or []):
+            column, start, end = entry.get("column"), entry.get("start"), entry.get("end")
+            where = f"{record_type}.{column or f'#{index}'}"
+            if not isinstance(start, int) or not isinstance(end, int) or not 0 <= start < end <= MRO_RECORD_LENGTH:
+                problems.append(f"{where}: span [{start}, {end}) is outside the {MRO_RECORD_LENGTH}-character record")
+                continue
+            if column in columns:
+                problems.append(f"{where}: duplicate column")
+                continue
+            
+            field_type = entry.get("type", "string")
+            scale = entry.get("scale")
+            if field_type not in LAYOUT_FIELD_TYPES:
+                problems.append(f"{where}: unknown type {field_type!r}")
+                continue
+            if field_type == "decimal" and (not isinstance(scale, int) or not 0 <= scale <= end - start):
+                problems.append(f"{where}: decimal needs an integer scale between 0 and {end - start}")
+                continue
+            
+            columns.add(column)
+            fields.append((start, end, column, entry.get("redefines")))
+            layout.append((column, start, end) if field_type == "string" else (column, start, end, (field_type, scale)))
+        
+        # Overlapping spans are only allowed where one field declares that it redefines the other
+        fields.sort()
+        for position, (start, end, column, redefines) in enumerate(fields):
+            if redefines is not None and redefines not in columns:
+                problems.append(f"{record_type}.{column}: redefines unknown column {redefines!r}")
+            for other_start, other_end, other_column, other_redefines in fields[position + 1:]:
+                if other_start >= end:
+                    break
+                if redefines != other_column and other_redefines != column:
+                    problems.append(f"{record_type}: {column} [{start}, {end}) overlaps {other_column} [{other_start}, {other_end}) "
+                                    f"- add 'redefines' if intentional")
+        
+        try:
+            conditions = parse_matcher_expression(config.get("matcher") or "")
+        except ValueError as e:
+            problems.append(f"{record_type}: {e}")
+            conditions = ()
+        
+        if not layout:
+            problems.append(f"{record_type}: no valid layout fields")
+        layouts[record_type] = {
+            "layout": layout,
+            "conditions": conditions,
+            "display_name": config.get("display_name") or record_type
+        }
+    
+    for record_type in REQUIRED_RECORD_TYPES:
+        if record_type not in layouts:
+            problems.append(f"{record_type}: required record type is missing")
+    if "contra_record" in layouts:
+        contra_columns = {entry[0] for entry in layouts["contra_record"]["layout"]}
+        for field in CONTRA_ENRICH_FIELDS:
+            if field not in contra_columns:
+                problems.append(f"contra_record.{field}: required for contract enrichment")
+    
+    if problems:
+        raise ValueError("Invalid layout config:\n  " + "\n  ".join(problems))
+    return layouts
+
+def _layouts_from_json(cached):
+    """Validated layouts back from their JSON cache - lists become the tuples the compiler expects"""
+    return {
+        record_type: {
+            "layout": [tuple(entry[:3]) + ((tuple(entry[3]),) if len(entry) > 3 else ()) for entry in layout["layout"]],
+            "conditions": tuple(tuple(condition) for condition in layout["conditions"]),
+            "display_name": layout["display_name"]
+        }
+        for record_type, layout in cached.items()
+    }
+
+def _private_cache_dir():
+    """LAYOUT_CACHE_DIR created owner-only (0700), or None when it belongs to someone else"""
+    os.makedirs(LAYOUT_CACHE_DIR, mode=0o700, exist_ok=True)
+    if hasattr(os, "getuid") and os.stat(LAYOUT_CACHE_DIR).st_uid != os.getuid():
+        return None
+    return LAYOUT_CACHE_DIR
+
+def load_layout_config(config_path):
+    """RECORD_CONFIGS built from the YAML; returns (record_configs, config_hash)"""
+    with open(config_path, "rb") as f:
+        content = f.read()
+    config_hash = hashlib.sha256(content).hexdigest()
+    cache_file = f"layouts-v{LAYOUT_CACHE_VERSION}-{config_hash}.json"
+    
+    try:
+        cache_dir = _private_cache_dir()
+        if cache_dir is None:
+            raise OSError(f"{LAYOUT_CACHE_DIR} is not owned by this user")
+        with open(os.path.join(cache_dir, cache_file), "r", encoding="utf-8") as f:
+            layouts = _layouts_from_json(json.load(f))
+        print(f"  Layouts loaded from cache ({config_hash[:12]})")
+    except Exception:
+        # Missing, foreign, partial or stale cache - validate the YAML again
+        import yaml  # Only needed when the config changed
+        layouts = validate_layout_config(yaml.safe_load(content))
+        try:
+            cache_dir = _private_cache_dir()
+            if cache_dir is not None:
+                cache_path = os.path.join(cache_dir, cache_file)
+                temp_path = f"{cache_path}.{os.getpid()}.tmp"
+                with open(temp_path, "w", encoding="utf-8") as f:
+                    json.dump(layouts, f)
+                os.replace(temp_path, cache_path)  # Atomic, so concurrent notebooks never read a partial file
+        except OSError as e:
+            print(f"  Could not cache compiled layouts: {e}")
+        print(f"  Layouts parsed and validated from {config_path} ({config_hash[:12]})")
+    
+    record_configs = {
+        record_type: {
+            "layout": layout["layout"],
+            "matcher": conditions_matcher(layout["conditions"]),
+            "display_name": layout["display_name"]
+        }
+        for record_type, layout in layouts.items()
+    }
+    return record_configs, config_hash
+
+# Dispatch-table record classifier
+class RecordClassifier:
+    """Route each line to its record type with a keyed lookup instead of a matcher scan"""
+
+    def __init__(self, record_configs):
+        self.full_keys = {}        # line[1:5] -> record type (record code + sequence)
+        self.header_keys = {}      # line[1:3] -> record type (header-only keys, e.g. '10', '12')
+        self.positions = {}        # record type -> position in RECORD_CONFIGS
+        self.custom_matchers = []  # (position, record type, matcher) for matchers without a key
+
+        for position, (record_type, config) in enumerate(record_configs.items()):
+            self.positions[record_type] = position
+            record_key = getattr(config["matcher"], "record_key", None)
+
+            if record_key is None:
+                self.custom_matchers.append((position, record_type, config["matcher"]))
+                continue
+
+            record_code, sequence = record_key
+            if record_code in self.header_keys:
+                # An earlier header-only key already claims every line with this code
+                continue
+            if sequence is None:
+                self.header_keys[record_code] = record_type
+            else:
+                self.full_keys.setdefault(record_code + sequence, record_type)
+
+        # Pure key dispatch unless a config still uses an opaque matcher
+        self.classify = self._classify_ordered if self.custom_matchers else self._classify_keyed
+
+    def _classify_keyed(self, line):
+        record_type = self.full_keys.get(line[1:5])
+        if record_type is None:
+            record_type = self.header_keys.get(line[1:3])
+        return record_type
+
+    def _classify_ordered(self, line):
+        # Opaque matchers only run when they precede the keyed hit in config order
+        record_type = self._classify_keyed(line)
+        keyed_position = self.positions[record_type] if record_type else len(self.positions)
+        for position, custom_type, matcher in self.custom_matchers:
+            if position > keyed_position:
+                break
+            try:
+                if matcher(line):
+                    return custom_type
+            except Exception as e:
+                print(f"Error matching {custom_type}: {e}")
+        return record_type
+
+class CompiledLayout:
+    """Layout compiled once into a single multi-slice getter over a padded line"""
+
+    def __init__(self, layout):
+        self.layout = list(layout)
+        self.columns = tuple(col for col, start, end, *_ in layout)
+        self.width = max(end for col, start, end, *_ in layout)
+        # column -> (kind, scale, field width) for fields declared with a type
+        self.field_types = {col: field_type[0] + (end - start,) for col, start, end, *field_type in layout if field_type}
+        getter = itemgetter(*[slice(start, end) for col, start, end, *_ in layout])
+        slice_fields = getter if len(layout) > 1 else (lambda line: (getter(line),))
+        columns, width, strip = self.columns, self.width, str.strip
+
+        # Closures over locals keep the per-line path free of attribute lookups
+        def values(line):
+            # Pad short lines once so every slice is in range, then strip in bulk
+            if len(line) < width:
+                line = line.ljust(width)
+            return list(map(strip, slice_fields(line)))
+
+        def record(line):
+            if len(line) < width:
+                line = line.ljust(width)
+            return dict(zip(columns, map(strip, slice_fields(line))))
+
+        self.values = values
+        self.record = record
+
+
+# Everything a parse needs, built once per layout config
+_LAYOUTS_BY_KEY = {}  # Pool workers look layouts up by key - matcher closures cannot be pickled
+
+class RecordLayouts:
+    """Record configs with their classifier, compiled extractors and contra enrichment extractor.
+
+    Every configured type is classified, but only record_types (all by default) are compiled, each
+    limited to columns[record_type] when given - lines of other types are dropped by key, unsliced.
+    """
+
+    def __init__(self, record_configs, key="builtin", record_types=None, columns=None, config_path=None):
+        self.record_configs = record_configs
+        self.key = key
+        self.config_path = config_path
+        self.record_types = record_types
+        self.columns = columns or {}
+        self.classifier = RecordClassifier(record_configs)
+        self.compiled = {
+            record_type: CompiledLayout(_project_layout(config["layout"], self.columns.get(record_type)))
+            for record_type, config in record_configs.items()
+            if record_types is None or record_type in record_types
+        }
+        # Contra values feed contract enrichment whether or not contra records are selected
+        contra_layout = record_configs["contra_record"]["layout"]
+        self.contra = CompiledLayout([next(entry for entry in contra_layout if entry[0] == field) for field in CONTRA_ENRICH_FIELDS])
+        self.contra_field_types = {f"CONTRA_{field}": field_type for field, field_type in self.contra.field_types.items()}
+        _LAYOUTS_BY_KEY[key] = self
+
+    def display_name(self, record_type):
+        return self.record_configs[record_type]["display_name"]
+
+    @property
+    def source(self):
+        """Picklable (key, config path, record types, columns) - resolve_layouts(*source) rebuilds these
+        layouts in a fresh process"""
+        return self.key, self.config_path, sorted(self.record_types) if self.record_types else None, self.columns
+
+    @property
+    def is_selection(self):
+        return len(self.compiled) < len(self.record_configs) or bool(self.columns)
+
+    def select(self, record_types=None, columns=None):
+        """These layouts restricted to record_types and, per type, to the listed columns (layout order kept)"""
+        if not record_types and not columns:
+            return self
+        record_types = list(record_types or self.record_configs)
+        columns = {record_type: list(names) for record_type, names in (columns or {}).items() if names}
+
+        unknown_types = [record_type for record_type in list(record_types) + list(columns) if record_type not in self.record_configs]
+        if unknown_types:
+            raise ValueError(f"Unknown record types: {', '.join(unknown_types)} (known: {', '.join(self.record_configs)})")
+        problems = [f"{record_type} has columns but is not selected" for record_type in columns if record_type not in record_types]
+        for record_type, names in columns.items():
+            available = {entry[0] for entry in self.record_configs[record_type]["layout"]}
+            problems += [f"{record_type} has no column {name}" for name in names if name not in available]
+        if problems:
+            raise ValueError("Invalid column selection:\n  " + "\n  ".join(problems))
+
+        selection = json.dumps({"record_types": sorted(record_types), "columns": columns}, sort_keys=True)
+        key = f"{self.key}:{hashlib.sha256(selection.encode()).hexdigest()[:12]}"
+        return _LAYOUTS_BY_KEY.get(key) or RecordLayouts(self.record_configs, key, set(record_types), columns, self.config_path)
+
+def _project_layout(layout, columns=None):
+    """Layout entries for the requested columns only - unrequested fields are never sliced"""
+    if not columns:
+        return layout
+    wanted = set(columns)
+    return [entry for entry in layout if entry[0] in wanted]
+
+def get_layouts(config_path=None):
+    """Layouts from a YAML config (memoized by content hash), or the built-ins when there is none"""
+    if config_path and os.path.exists(config_path):
+        record_configs, config_hash = load_layout_config(config_path)
+        return _LAYOUTS_BY_KEY.get(config_hash) or RecordLayouts(record_configs, config_hash, config_path=os.path.abspath(config_path))
+    return _LAYOUTS_BY_KEY.get("builtin") or RecordLayouts(RECORD_CONFIGS)
+
+def layouts_by_key(key):
+    return _LAYOUTS_BY_KEY[key]
+
+def resolve_layouts(key, config_path=None, record_types=None, columns=None):
+    """Layouts for key (see RecordLayouts.source), rebuilt from their config when this process has not built them"""
+    layouts = _LAYOUTS_BY_KEY.get(key)
+    if layouts is None:
+        layouts = get_layouts(config_path).select(record_types, columns)
+        if layouts.key != key:
+            raise ValueError(f"Layouts {key} cannot be rebuilt from {config_path or 'the built-ins'} (got {layouts.key})")
+    return layouts
@@ -0,0 +1,127 @@
+"""Processing ledger - which source files were already processed, keyed by name, size and content hash"""
+
+import hashlib
+import json
+import os
+from datetime import datetime
+from urllib.parse import quote
+
+LEDGER_VERSION = 1
+HASH_BUFFER_SIZE = 8 * 1024 * 1024
+
+def file_sha256(path, buffer_size=None):
+    """Content hash of a local file, read in fixed-size blocks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(buffer_size or HASH_BUFFER_SIZE), b""):
+            digest.update(block)
+    return f"sha256:{digest.hexdigest()}"
+
+class ContentDigest:
+    """SHA-256 of a source taken while it is read for parsing, so the ledger does not read it again.
+
+    wrap(stream) hashes every block read through it (update() takes blocks directly); value stays None
+    until the read reached the end, so a parse that stopped early never records a partial hash.
+    """
+
+    def __init__(self):
+        self.digest = hashlib.sha256()
+        self.complete = False
+
+    def update(self, block):
+        self.digest.update(block)
+
+    def wrap(self, stream):
+        return _DigestStream(stream, self)
+
+    @property
+    def value(self):
+        return f"sha256:{self.digest.hexdigest()}" if self.complete else None
+
+class _DigestStream:
+    def __init__(self, stream, digest):
+        self.stream = stream
+        self.digest = digest
+
+    def read(self, size=-1):
+        block = self.stream.read(size)
+        if block:
+            self.digest.update(block)
+        elif size != 0:
+            self.digest.complete = True
+        return block
+
+    def close(self):
+        self.stream.close()
+
+def _read_local_text(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+def _write_local_text(path, text):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(temp_path, path)
+
+class ProcessingLedger:
+    """One small JSON document per source file name, so a lookup reads one object however long the history.
+
+    read_text(path) returns the document text or None when it does not exist; write_text(path, text)
+    replaces it. Both default to the local filesystem; the notebook passes storage-backed ones.
+    """
+
+    def __init__(self, root, read_text=None, write_text=None):
+        self.root = root.rstrip("/")
+        self.read_text = read_text or _read_local_text
+        self.write_text = write_text or _write_local_text
+
+    def path(self, file_name):
+        return f"{self.root}/{quote(file_name, safe='')}.json"
+
+    def entries(self, file_name):
+        """Every recorded run of file_name, oldest first"""
+        text = self.read_text(self.path(file_name))
+        if not text:
+            return []
+        return json.loads(text).get("entries", [])
+
+    def find(self, file_name, size, content_hash, modified=None):
+        """Entry for this exact content, or None. content_hash may be a callable - it is only
+        evaluated when an entry with the same name and size exists, so new files are never hashed here.
+
+        An entry recorded with the same modified time (source_modified) is the same version of the file,
+        still in place - an ADF retry, say - and matches without hashing it.
+        """
+        candidates = [entry for entry in self.entries(file_name) if entry["size"] == size]
+        if not candidates:
+            return None
+        if modified is not None:
+            for entry in reversed(candidates):
+                if entry.get("source_modified") == modified:
+                    return entry
+        if callable(content_hash):
+            content_hash = content_hash()
+        for entry in reversed(candidates):
+            if entry["content_hash"] == content_hash:
+                return entry
+        return None
+
+    def record(self, file_name, size, content_hash, **details):
+        """Append a processed-file entry; details hold the outputs, archive path and so on"""
+        entries = self.entries(file_name)
+        entry = {
+            "file_name": file_name,
+            "size": size,
+            "content_hash": content_hash,
+            "processed_at": datetime.now().isoformat(timespec="seconds"),
+            **details
+        }
+        entries.append(entry)
+        document = {"version": LEDGER_VERSION, "file_name": file_name, "entries": entries}
+        self.write_text(self.path(file_name), json.dumps(document, indent=2, default=str))
+        return entry
@@ -0,0 +1,318 @@
+"""Warm listener - one long-running session picks up source files as they land and parses them on a worker pool.
+
+Arrivals come from a source: PollingSource lists a location every few seconds, QueueSource reads blob-created
+messages from a queue (LocalQueue stands in for Azure Storage Queue locally). Pending arrivals sit in a bounded
+queue - while it is full the source is not read, so further files wait where they landed.
+"""
+
+import base64
+import binascii
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque, namedtuple
+from datetime import datetime, timezone
+from itertools import count
+
+POLL_INTERVAL = 5.0
+LISTENER_WORKERS = 2
+LISTENER_QUEUE_DEPTH = 8
+METRICS_INTERVAL = 60.0
+LATENCY_SAMPLES = 1000       # Latest drop-to-parsed latencies kept for the percentiles
+THROUGHPUT_WINDOW = 300.0    # Seconds of completions behind the recent throughput figures
+
+FileArrival = namedtuple("FileArrival", "name size landed_at receipt")  # landed_at in epoch seconds
+QueueMessage = namedtuple("QueueMessage", "id body enqueued_at")
+
+def _event_timestamp(event_time):
+    """Epoch seconds of an Event Grid eventTime such as 2025-08-01T06:30:12.1234567Z"""
+    seconds, _, fraction = event_time.rstrip("Z").partition(".")
+    stamp = datetime.strptime(seconds[:19], "%Y-%m-%dT%H:%M:%S").replace(tzinfo=timezone.utc).timestamp()
+    return stamp + float(f"0.{fraction}") if fraction.isdigit() else stamp
+
+def parse_blob_event(body):
+    """(file name, size, event time) from a plain file name or an Event Grid BlobCreated message.
+
+    Event Grid writes its events to Storage Queue base64-encoded; other event types give (None, None, None).
+    Raises ValueError for a body that is not UTF-8 or an event that is not valid JSON.
+    """
+    text = (body.decode("utf-8") if isinstance(body, bytes) else body).strip()
+    if not text.startswith(("{", "[")):
+        try:
+            decoded = base64.b64decode(text, validate=True).decode("utf-8").strip()
+        except (binascii.Error, UnicodeDecodeError):
+            decoded = ""
+        if not decoded.startswith(("{", "[")):
+            return text or None, None, None  # A bare file name
+        text = decoded
+    event = json.loads(text)
+    if isinstance(event, list):
+        event = event[0] if event else {}
+    if not isinstance(event, dict):
+        raise ValueError(f"Not an event object: {text[:80]}")
+    if event.get("eventType", "Microsoft.Storage.BlobCreated") != "Microsoft.Storage.BlobCreated":
+        return None, None, None
+    data = event.get("data") or {}
+    if not isinstance(data, dict):
+        raise ValueError(f"Event data is not an object: {text[:80]}")
+    path = event.get("subject") or data.get("url") or ""
+    landed_at = _event_timestamp(event["eventTime"]) if event.get("eventTime") else None
+    return os.path.basename(path.rstrip("/")) or None, data.get("contentLength"), landed_at
+
+class LocalQueue:
+    """In-process stand-in for the arrival queue - same receive/delete/release calls and visibility rules:
+    a received message is hidden until it is deleted or released"""
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.visible = deque()
+        self.hidden = {}
+        self.ids = count(1)
+
+    def send(self, body):
+        with self.condition:
+            self.visible.append(QueueMessage(next(self.ids), body, time.time()))
+            self.condition.notify()
+
+    def receive(self, max_messages=1, timeout=None):
+        with self.condition:
+            if not self.visible and timeout:
+                self.condition.wait(timeout)
+            messages = [self.visible.popleft() for _ in range(min(max_messages, len(self.visible)))]
+            self.hidden.update((message.id, message) for message in messages)
+            return messages
+
+    def delete(self, message):
+        with self.condition:
+            self.hidden.pop(message.id, None)
+
+    def release(self, message):
+        with self.condition:
+            if self.hidden.pop(message.id, None) is not None:
+                self.visible.appendleft(message)
+                self.condition.notify()
+
+    def __len__(self):
+        return len(self.visible)
+
+class PollingSource:
+    """Lists a location every interval seconds. A file is handed out once its size and modification time are
+    unchanged between two listings, so uploads still in progress are left alone, and only once per version -
+    a failed file is not retried until it changes or is dropped again.
+
+    list_files() returns (name, size, modification time in epoch seconds) tuples; accept(name) filters them.
+    """
+
+    def __init__(self, list_files, interval=None, accept=None):
+        self.list_files = list_files
+        self.interval = POLL_INTERVAL if interval is None else interval
+        self.accept = accept or (lambda name: True)
+        self.previous = {}
+        self.handed_out = {}
+        self.next_poll = 0.0
+
+    def arrivals(self, limit, stopped):
+        wait = self.next_poll - time.monotonic()
+        if wait > 0 and stopped.wait(wait):
+            return []
+        self.next_poll = time.monotonic() + self.interval
+        listing = {name: (size, modified) for name, size, modified in self.list_files() if self.accept(name)}
+        self.handed_out = {name: version for name, version in self.handed_out.items() if name in listing}
+        ready = sorted(
+            (FileArrival(name, size, modified, None) for name, (size, modified) in listing.items()
+             if self.previous.get(name) == (size, modified) and self.handed_out.get(name) != (size, modified)),
+            key=lambda arrival: arrival.landed_at
+        )[:limit]
+        self.previous = listing
+        for arrival in ready:
+            self.handed_out[arrival.name] = (arrival.size, arrival.landed_at)
+        return ready
+
+    def done(self, arrival, ok):
+        pass  # Processed files leave the location; failed ones stay handed out until they change
+
+    def release(self, arrival):
+        self.handed_out.pop(arrival.name, None)
+
+class QueueSource:
+    """Arrivals from a queue with receive(max_messages, timeout)/delete(message)/release(message) - LocalQueue,
+    or the notebook's Azure Storage Queue adapter. Messages stay hidden while their file is processed and are
+    deleted once it is done; released ones (listener stopped first) are delivered again"""
+
+    def __init__(self, arrival_queue, wait=None, accept=None):
+        self.queue = arrival_queue
+        self.wait = POLL_INTERVAL if wait is None else wait
+        self.accept = accept or (lambda name: True)
+
+    def arrivals(self, limit, stopped):
+        arrivals = []
+        for message in self.queue.receive(limit, self.wait):
+            try:
+                name, size, landed_at = parse_blob_event(message.body)
+            except ValueError as e:
+                # A poison message would come back after every visibility timeout, so it is dropped once
+                print(f"  Deleting undecodable queue message {message.id}: {e}")
+                self.queue.delete(message)
+                continue
+            if name is None or not self.accept(name):
+                self.queue.delete(message)  # Other blobs and event types are not ours to process
+                continue
+            arrivals.append(FileArrival(name, size, landed_at or message.enqueued_at, message))
+        return arrivals
+
+    def done(self, arrival, ok):
+        self.queue.delete(arrival.receipt)  # A failed file is logged; a re-drop sends a new event
+
+    def release(self, arrival):
+        self.queue.release(arrival.receipt)
+
+def _percentile(values, fraction):
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+class ListenerMetrics:
+    """Running totals, queue depth, recent throughput and drop-to-parsed latency of a listener"""
+
+    def __init__(self, workers):
+        self.workers = workers
+        self.lock = threading.Lock()
+        self.started_at = time.time()
+        self.counts = {"received": 0, "success": 0, "skipped": 0, "failed": 0}
+        self.bytes_processed = 0
+        self.queue_depth = 0
+        self.max_queue_depth = 0
+        self.in_flight = 0
+        self.busy_seconds = 0.0
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+        self.completions = deque()  # (finished at, bytes) within THROUGHPUT_WINDOW
+
+    def received(self, queue_depth):
+        with self.lock:
+            self.counts["received"] += 1
+            self.queue_depth = queue_depth
+            self.max_queue_depth = max(self.max_queue_depth, queue_depth)
+
+    def started(self, queue_depth):
+        with self.lock:
+            self.queue_depth = queue_depth
+            self.in_flight += 1
+
+    def finished(self, status, seconds, latency, size):
+        now = time.time()
+        with self.lock:
+            self.in_flight -= 1
+            self.counts[status] = self.counts.get(status, 0) + 1
+            self.busy_seconds += seconds
+            self.bytes_processed += size or 0
+            self.latencies.append(latency)
+            self.completions.append((now, size or 0))
+
+    def snapshot(self):
+        now = time.time()
+        with self.lock:
+            while self.completions and self.completions[0][0] < now - THROUGHPUT_WINDOW:
+                self.completions.popleft()
+            uptime = now - self.started_at
+            window = min(uptime, THROUGHPUT_WINDOW) or 1.0
+            latencies = sorted(self.latencies)
+            return {
+                "uptime_seconds": round(uptime, 1),
+                **self.counts,
+                "queue_depth": self.queue_depth,
+                "max_queue_depth": self.max_queue_depth,
+                "in_flight": self.in_flight,
+                "bytes_processed": self.bytes_processed,
+                "files_per_minute": round(len(self.completions) * 60 / window, 2),
+                "mb_per_second": round(sum(size for _, size in self.completions) / (1024 * 1024) / window, 3),
+                "worker_utilization": round(self.busy_seconds / (uptime * self.workers), 3) if uptime else 0.0,
+                "latency_seconds": {
+                    "mean": round(sum(latencies) / len(latencies), 3),
+                    "p50": round(_percentile(latencies, 0.5), 3),
+                    "p95": round(_percentile(latencies, 0.95), 3),
+                    "max": round(latencies[-1], 3)
+                } if latencies else None
+            }
+
+class FileListener:
+    """Feeds a source's arrivals through a bounded queue to a pool of worker threads running process(name).
+
+    process returns the file's result; a dict's "status" ("success"/"skipped"/"failed") is counted, an
+    exception counts as failed. on_metrics(snapshot) runs every metrics_interval seconds and once at the end.
+    """
+
+    def __init__(self, source, process, workers=None, max_pending=None, metrics_interval=None, on_metrics=None):
+        self.source = source
+        self.process = process
+        self.workers = workers or LISTENER_WORKERS
+        self.max_pending = max_pending or LISTENER_QUEUE_DEPTH
+        self.metrics_interval = METRICS_INTERVAL if metrics_interval is None else metrics_interval
+        self.on_metrics = on_metrics
+        self.pending = queue.Queue()
+        self.slot_free = threading.Event()
+        self.stopped = threading.Event()
+        self.metrics = ListenerMetrics(self.workers)
+
+    def stop(self):
+        self.stopped.set()
+
+    def run(self, max_seconds=None):
+        """Listen until stop() or max_seconds (None/0 = no limit); returns the final metrics snapshot.
+
+        Files already being processed are finished; arrivals still queued are released back to the source.
+        """
+        deadline = time.monotonic() + max_seconds if max_seconds else None
+        threads = [threading.Thread(target=self._work, name=f"listener-{index}", daemon=True) for index in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        next_report = time.monotonic() + self.metrics_interval
+        try:
+            while not self.stopped.is_set() and (deadline is None or time.monotonic() < deadline):
+                free = self.max_pending - self.pending.qsize()
+                if free <= 0:
+                    # Backpressure: the source is not read until a worker takes a pending file
+                    self.slot_free.clear()
+                    self.slot_free.wait(1.0)
+                else:
+                    for arrival in self.source.arrivals(free, self.stopped):
+                        self.pending.put(arrival)
+                        self.metrics.received(self.pending.qsize())
+                if self.on_metrics is not None and time.monotonic() >= next_report:
+                    self.on_metrics(self.metrics.snapshot())
+                    next_report = time.monotonic() + self.metrics_interval
+        finally:
+            self.stopped.set()
+            while True:
+                try:
+                    self.source.release(self.pending.get_nowait())
+                except queue.Empty:
+                    break
+            for _ in threads:
+                self.pending.put(None)
+            for thread in threads:
+                thread.join()
+        snapshot = self.metrics.snapshot()
+        if self.on_metrics is not None:
+            self.on_metrics(snapshot)
+        return snapshot
+
+    def _work(self):
+        while True:
+            arrival = self.pending.get()
+            self.slot_free.set()
+            if arrival is None:
+                return
+            if self.stopped.is_set():
+                self.source.release(arrival)
+                continue
+            self.metrics.started(self.pending.qsize())
+            start = time.time()
+            try:
+                result = self.process(arrival.name)
+                status = result.get("status", "success") if isinstance(result, dict) else "success"
+            except Exception as e:
+                print(f"  Listener failed to process {arrival.name}: {e}")
+                status = "failed"
+            finished = time.time()
+            self.metrics.finished(status, finished - start, finished - (arrival.landed_at or start), arrival.size)
+            self.source.done(arrival, status != "failed")
@@ -0,0 +1,102 @@
+"""Per-stage wall/CPU timings and counters for one processed file, serializable to JSON"""
+
+import json
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows laptops - peak memory is simply not reported
+    resource = None
+
+METRICS_VERSION = 1
+
+def peak_memory_mb():
+    """Peak resident memory of this process and of its finished children (parallel engine workers)"""
+    if resource is None:
+        return {}
+    # ru_maxrss is in KB on Linux
+    return {
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "peak_child_rss_mb": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+    }
+
+class StageMetrics:
+    """Accumulates named stages (wall and CPU seconds, call count), counters and per-type row counts.
+
+    CPU time is the calling thread's, so concurrent batch files do not inflate each other's numbers.
+    """
+
+    def __init__(self, file_name=None):
+        self.file_name = file_name
+        self.stages = {}    # Insertion order = order the stages first ran
+        self.counters = {}
+        self.rows = {}
+        self.unknown_layouts = None  # UnknownLayoutSummary.to_dict() of the parsed file
+        self.compression = {}       # "input"/"output"/"archive" -> stored vs raw bytes and codec time
+
+    def add(self, stage, wall_seconds, cpu_seconds=None, calls=1):
+        totals = self.stages.get(stage)
+        if totals is None:
+            totals = self.stages[stage] = {"wall_seconds": 0.0, "cpu_seconds": 0.0, "calls": 0}
+        totals["wall_seconds"] += wall_seconds
+        if cpu_seconds is None:
+            totals["cpu_seconds"] = None
+        elif totals["cpu_seconds"] is not None:
+            totals["cpu_seconds"] += cpu_seconds
+        totals["calls"] += calls
+
+    @contextmanager
+    def stage(self, name):
+        wall_start, cpu_start = time.perf_counter(), time.thread_time()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - wall_start, time.thread_time() - cpu_start)
+
+    def merge(self, stages):
+        """Fold in stages measured elsewhere (e.g. process pool chunks) - their times are summed"""
+        for name, totals in stages.items():
+            self.add(name, totals["wall_seconds"], totals["cpu_seconds"], totals["calls"])
+
+    def count(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def add_compression(self, name, stats):
+        """Fold in a CompressedReader/CompressedWriter's stats()"""
+        totals = self.compression.get(name)
+        if totals is None:
+            totals = self.compression[name] = {"compression": stats["compression"], "stored_bytes": 0, "raw_bytes": 0, "codec_seconds": 0.0}
+        for key in ("stored_bytes", "raw_bytes", "codec_seconds"):
+            totals[key] += stats[key]
+
+    def compression_summary(self):
+        """Ratio (raw/stored) and codec throughput in raw MB/s per compressed stream"""
+        summary = {}
+        for name, totals in self.compression.items():
+            seconds = totals["codec_seconds"]
+            summary[name] = {
+                **totals,
+                "codec_seconds": round(seconds, 6),
+                "ratio": round(totals["raw_bytes"] / totals["stored_bytes"], 3) if totals["stored_bytes"] else None,
+                "codec_mb_per_second": round(totals["raw_bytes"] / (1024 * 1024) / seconds, 2) if seconds > 0 else None
+            }
+        return summary
+
+    def to_dict(self):
+        return {
+            "version": METRICS_VERSION,
+            "file_name": self.file_name,
+            "stages": {
+                name: {key: round(value, 6) if isinstance(value, float) else value for key, value in totals.items()}
+                for name, totals in self.stages.items()
+            },
+            "counters": self.counters,
+            "rows": self.rows,
+            "unknown_layouts": self.unknown_layouts,
+            "compression": self.compression_summary(),
+            **peak_memory_mb()
+        }
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), indent=2, default=str)
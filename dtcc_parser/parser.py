@@ -0,0 +1,286 @@
+"""MRO line reading and parsing - classify, extract and enrich lines into a sink"""
+
+import mmap
+import multiprocessing
+import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from itertools import count, islice
+
+from .compression import CompressedReader, compression_of
+from .layouts import layouts_by_key, resolve_layouts
+from .metrics import StageMetrics
+from .sinks import ColumnarRecordSink
+
+READ_BUFFER_SIZE = 8 * 1024 * 1024
+PARALLEL_CHUNK_LINES = 200000  # Minimum lines per chunk; chunks end at the next '10'/contra line after this
+PARSE_BLOCK_LINES = 65536  # Lines read, classified and extracted per pass - each pass is timed as its own stage
+
+def extract_file_drop_date(source_file):
+    match = re.search(r'\.D(\d{6})\.', source_file)
+    if match:
+        date_str = match.group(1)
+        try:
+            return datetime.strptime(date_str, "%y%m%d").date()
+        except ValueError:
+            return None
+    return None
+
+def parse_line_to_record(line, layout):
+    record = {}
+    for col, start, end, *_ in layout:
+        if start < len(line):
+            record[col] = line[start:end].strip()
+        else:
+            record[col] = ""
+    return record
+
+def decode_lines(raw_lines):
+    """Non-empty text lines from raw byte lines - CR stripped, invalid UTF-8 replaced"""
+    lines = [raw_line.rstrip(b"\r").decode("utf-8", errors="replace") for raw_line in raw_lines]
+    return [line for line in lines if line.strip()]
+
+def iter_stream_lines(stream, buffer_size=None):
+    """Non-empty lines of a binary read stream, read in fixed-size blocks"""
+    pending = b""
+    while True:
+        block = stream.read(buffer_size or READ_BUFFER_SIZE)
+        if not block:
+            break
+        chunk_lines = (pending + block).split(b"\n")
+        pending = chunk_lines.pop()
+        yield from decode_lines(chunk_lines)
+    if pending:
+        yield from decode_lines([pending])
+
+def iter_compressed_lines(stream, compression, buffer_size=None, metrics=None):
+    """Lines of a gzip/zstd stream, decoded as they are read; codec stats go to metrics as 'input'"""
+    reader = CompressedReader(stream, compression)
+    try:
+        yield from iter_stream_lines(reader, buffer_size)
+    finally:
+        reader.close()
+        if metrics is not None:
+            metrics.add_compression("input", reader.stats())
+
+def iter_local_lines(path, buffer_size=None, digest=None):
+    """Stream non-empty lines in fixed-size blocks so memory stays flat as files grow; digest (a ContentDigest)
+    hashes the bytes as they are read"""
+    with open(path, "rb") as f:
+        yield from iter_stream_lines(f if digest is None else digest.wrap(f), buffer_size)
+
+def iter_mmap_lines(path, window_size=None, digest=None):
+    """Same lines as iter_local_lines, read through a memory map of the file.
+
+    Windows of whole lines are decoded straight from the mapped pages (no block copy, no per-line
+    decode call) and split in one pass; the OS pages the file in and out, so resident memory is
+    the current window rather than the file. digest hashes the mapped bytes as in iter_local_lines.
+    """
+    window_size = window_size or READ_BUFFER_SIZE
+    with open(path, "rb") as f:
+        try:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, OSError):
+            # Empty files cannot be mapped and some FUSE mounts refuse to - fall back to block reads
+            mapped = None
+        if mapped is None:
+            yield from iter_local_lines(path, window_size, digest)
+            return
+
+        with mapped, memoryview(mapped) as view:
+            end = len(mapped)
+            position = 0
+            while position < end:
+                stop = end
+                if position + window_size < end:
+                    stop = mapped.rfind(b"\n", position, position + window_size)
+                    if stop < position:  # A single line longer than the window
+                        stop = mapped.find(b"\n", position + window_size)
+                        stop = end if stop < 0 else stop
+                # A newline is never part of a UTF-8 sequence, so decoding a window equals decoding its lines
+                text = str(view[position:stop], "utf-8", "replace")
+                if digest is not None:
+                    digest.update(view[position:stop + 1])
+                yield from [line.rstrip("\r") for line in text.split("\n") if line.strip()]
+                position = stop + 1
+            if digest is not None:
+                digest.complete = True
+
+def iter_file_lines(path, buffer_size=None, metrics=None):
+    """Lines of a local source file - memory-mapped, or decoded as a stream when it is gzip/zstd compressed"""
+    compression = compression_of(path)
+    if compression is None:
+        return iter_mmap_lines(path, buffer_size)
+    return iter_compressed_lines(open(path, "rb"), compression, buffer_size, metrics)
+
+def parse_mro_lines(lines, sink, state=None, metrics=None):
+    """Classify, extract and enrich lines into a sink; returns the carried parse state"""
+    state = state or {}
+    file_row_number = state.get("file_row_number", 0)
+    header_group_number = state.get("header_group_number", 0)
+    current_header_participant = state.get("participant")
+    current_contra_values = state.get("contra_values")
+    metrics = metrics or StageMetrics()
+
+    layouts = sink.layouts
+    classify = layouts.classifier.classify
+    compiled_layouts = layouts.compiled
+    contra_values_of = layouts.contra.values
+    lines = iter(lines)
+
+    # Lines are processed in blocks so reading, classification and extraction can be timed
+    # separately without a timer call per line
+    while True:
+        with metrics.stage("read"):
+            block = list(islice(lines, PARSE_BLOCK_LINES))
+        if not block:
+            break
+
+        # Route every line to its record type with a single keyed lookup
+        with metrics.stage("classify"):
+            record_types = list(map(classify, block))
+
+        with metrics.stage("extract"):
+            for file_row_number, line, record_type in zip(count(file_row_number + 1), block, record_types):
+
+                # Check for header record
+                if len(line) > 2 and line[1:3] == "10":
+                    header_group_number += 1
+                    current_header_participant = line[3:7].strip() if len(line) > 6 else ""
+
+                if record_type is not None:
+                    # Only slicing a bad line is skipped - sink errors (storage writes) propagate
+                    try:
+                        # Store contra record for enrichment
+                        if record_type == "contra_record":
+                            current_contra_values = contra_values_of(line)
+
+                        # Types left out of the selection are dropped here, before any field is sliced
+                        compiled = compiled_layouts.get(record_type)
+                        if compiled is None:
+                            continue
+                        values = compiled.values(line)
+
+                    except Exception as e:
+                        print(f"Error processing line {file_row_number}: {e}")
+                        continue
+
+                    # Parse the record straight into the sink, enriching contract records with contra data
+                    sink.add(record_type, values, file_row_number, header_group_number,
+                             current_header_participant or "",
+                             current_contra_values if record_type == "contract_record" else None)
+
+                else:
+                    sink.add_unknown(file_row_number, line)
+
+    return {
+        "file_row_number": file_row_number,
+        "header_group_number": header_group_number,
+        "participant": current_header_participant,
+        "contra_values": current_contra_values
+    }
+
+# Parallel parsing - the reader cuts the file at submitting header/contra boundaries and a process pool parses the chunks
+def _contra_boundary_keys(layouts):
+    """Two-character record keys that can start a contra record"""
+    classifier = layouts.classifier
+    if classifier.custom_matchers:
+        raise ValueError("Parallel parsing requires every layout matcher to expose a record_key")
+    keys = {key for key, record_type in classifier.header_keys.items() if record_type == "contra_record"}
+    keys.update(key[:2] for key, record_type in classifier.full_keys.items() if record_type == "contra_record")
+    return keys
+
+def iter_mro_chunks(lines, layouts, chunk_lines=None):
+    """Group lines into chunks that start on a '10' or contra line; yields (chunk, carried parse state)"""
+    chunk_lines = chunk_lines or PARALLEL_CHUNK_LINES
+    contra_keys = _contra_boundary_keys(layouts)
+    boundary_keys = contra_keys | {"10"}
+    classify = layouts.classifier.classify
+    contra_values_of = layouts.contra.values
+
+    # Only header and contra lines change the carried state, so the reader tracks it with a
+    # two-character check per line; the last contra line is parsed only when a chunk is cut
+    file_row_number = 0
+    header_group_number = 0
+    participant = None
+    last_contra_line = None
+    chunk = []
+    chunk_state = {"file_row_number": 0, "header_group_number": 0, "participant": None, "contra_values": None}
+
+    for line in lines:
+        key = line[1:3]
+        if key in boundary_keys:
+            if len(chunk) >= chunk_lines:
+                yield chunk, chunk_state
+                contra_values = None if last_contra_line is None else contra_values_of(last_contra_line)
+                chunk = []
+                chunk_state = {
+                    "file_row_number": file_row_number,
+                    "header_group_number": header_group_number,
+                    "participant": participant,
+                    "contra_values": contra_values
+                }
+            if key == "10":
+                header_group_number += 1
+                participant = line[3:7].strip() if len(line) > 6 else ""
+            if key in contra_keys and classify(line) == "contra_record":
+                last_contra_line = line
+
+        chunk.append(line)
+        file_row_number += 1
+
+    if chunk:
+        yield chunk, chunk_state
+
+def _start_worker(layouts_source):
+    """Process pool initializer - build the layouts once per worker, for _parse_chunk to look up by key"""
+    resolve_layouts(*layouts_source)
+
+def _parse_chunk(chunk, state, layouts_key, file_name, load_time, file_drop_date, unknown_detail=False):
+    """Process pool task - parse one chunk into its own columnar sink"""
+    sink = ColumnarRecordSink(file_name, load_time, file_drop_date, layouts_by_key(layouts_key), unknown_detail=unknown_detail)
+    metrics = StageMetrics()
+    parse_mro_lines(chunk, sink, state, metrics)
+    # The chunk is already in memory, so only the worker's classify/extract time is meaningful
+    chunk_stages = {name: totals for name, totals in metrics.stages.items() if name != "read"}
+    return sink.record_columns, sink.unknown, sink.unknown_rows, chunk_stages
+
+def parse_lines_parallel(lines, sink, workers, chunk_lines=None, metrics=None):
+    """Parse lines across a process pool into a ColumnarRecordSink; returns (line count, chunk count).
+
+    Worker classify/extract times are summed across processes; read is the driver's chunking time.
+    """
+    max_in_flight = workers * 2  # Backpressure: the reader waits instead of queueing the whole file
+    metrics = metrics or StageMetrics()
+    chunk_count = 0
+    file_row_number = 0
+
+    def merge(future):
+        record_columns, unknown, unknown_rows, chunk_stages = future.result()
+        sink.merge(record_columns, unknown, unknown_rows)
+        metrics.merge(chunk_stages)
+
+    # Workers start from a clean interpreter rather than a fork of this one: forking while storage I/O or py4j
+    # threads hold a lock can deadlock the child. Each worker rebuilds the layouts from their config once
+    start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(start_method),
+                             initializer=_start_worker, initargs=(sink.layouts.source,)) as pool:
+        pending = deque()
+        chunks = iter_mro_chunks(lines, sink.layouts, chunk_lines)
+        while True:
+            with metrics.stage("read"):
+                chunk_and_state = next(chunks, None)
+            if chunk_and_state is None:
+                break
+            chunk, state = chunk_and_state
+            pending.append(pool.submit(_parse_chunk, chunk, state, sink.layouts.key,
+                                       sink.file_name, sink.load_time, sink.file_drop_date, sink.unknown_rows is not None))
+            chunk_count += 1
+            file_row_number += len(chunk)
+            if len(pending) >= max_in_flight:
+                merge(pending.popleft())
+        while pending:
+            merge(pending.popleft())
+
+    return file_row_number, chunk_count
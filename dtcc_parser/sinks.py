@@ -0,0 +1,208 @@
+"""Columnar record accumulation - one buffer per column, constant metadata stored once"""
+
+from array import array
+from collections import deque
+
+from .layouts import CONTRA_ENRICH_FIELDS, get_layouts
+from .unknown import UnknownLayoutSummary, unknown_line_code, unknown_line_detail
+
+class RecordColumns:
+    """Column buffers for a single record type"""
+
+    def __init__(self, columns):
+        self.columns = columns
+        self.buffers = [[] for _ in columns]
+        self.row_numbers = array("q")
+        self.group_numbers = array("q")
+        self.participants = []
+        self.contra_buffers = None  # Created on the first enriched row so unenriched types carry no CONTRA_ columns
+
+    def __len__(self):
+        return len(self.row_numbers)
+
+    def add(self, values, file_row_number, header_group_number, participant, contra_values=None):
+        # deque(maxlen=0) drains the map in C - one append per column, no per-row container kept
+        deque(map(list.append, self.buffers, values), maxlen=0)
+        self.row_numbers.append(file_row_number)
+        self.group_numbers.append(header_group_number)
+        self.participants.append(participant)
+
+        if contra_values is not None and self.contra_buffers is None:
+            self.contra_buffers = [[None] * (len(self) - 1) for _ in CONTRA_ENRICH_FIELDS]
+        if self.contra_buffers is not None:
+            deque(map(list.append, self.contra_buffers, contra_values or [None] * len(CONTRA_ENRICH_FIELDS)), maxlen=0)
+
+    def extend(self, other):
+        """Append another chunk's columns, backfilling CONTRA_ columns on whichever side lacks them"""
+        count, other_count = len(self), len(other)
+        deque(map(list.extend, self.buffers, other.buffers), maxlen=0)
+        self.row_numbers.extend(other.row_numbers)
+        self.group_numbers.extend(other.group_numbers)
+        self.participants.extend(other.participants)
+
+        if other.contra_buffers is not None:
+            if self.contra_buffers is None:
+                self.contra_buffers = [[None] * count for _ in CONTRA_ENRICH_FIELDS]
+            deque(map(list.extend, self.contra_buffers, other.contra_buffers), maxlen=0)
+        elif self.contra_buffers is not None:
+            for buffer in self.contra_buffers:
+                buffer.extend([None] * other_count)
+
+# Typed conversion - whole columns through Arrow compute kernels, invalid values become nulls and are counted
+def typed_arrow_column(values, field_type):
+    """Convert one column of stripped strings; returns (Arrow array, invalid count)"""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    kind, scale, width = field_type
+    strings = pa.array(values, pa.string())
+
+    if kind == "date":
+        present = pc.invert(pc.match_substring_regex(strings, r"^0*$"))
+        # strptime alone takes short values such as '2024013' - require 8 digits like the Spark engine
+        candidate = pc.and_(present, pc.match_substring_regex(strings, r"^[0-9]{8}$"))
+        parsed = pc.cast(pc.strptime(pc.if_else(candidate, strings, None), format="%Y%m%d", unit="s", error_is_null=True), pa.date32())
+        # strptime also rolls impossible days over ('20240230' -> 2024-03-01); Spark's to_date nulls them
+        converted = pc.if_else(pc.equal(pc.strftime(parsed, format="%Y%m%d"), strings), parsed, None)
+    else:
+        present = pc.not_equal(strings, "")
+        # Arrow's string casts reject a leading '+', which the pattern (and Spark) accept
+        numeric = pc.replace_substring_regex(pc.if_else(pc.match_substring_regex(strings, r"^[+-]?[0-9]+$"), strings, None), r"^\+", "")
+        if kind == "int":
+            converted = pc.cast(numeric, pa.int64())
+        else:
+            # The unscaled integer is exactly the decimal's storage - relabel its scale instead of dividing
+            unscaled = pc.cast(numeric, pa.decimal128(width, 0))
+            converted = pa.Array.from_buffers(pa.decimal128(width, scale), len(unscaled), unscaled.buffers(), unscaled.null_count)
+
+    invalid_count = pc.sum(pc.and_kleene(pc.fill_null(present, False), pc.is_null(converted))).as_py() or 0
+    return converted, invalid_count
+
+def convert_typed_column(values, field_type):
+    """Convert one column of stripped strings; returns (pandas-ready values, invalid count)"""
+    converted, invalid_count = typed_arrow_column(values, field_type)
+    if field_type[0] == "int" and converted.null_count:
+        return converted.to_pandas(integer_object_nulls=True), invalid_count
+    return converted.to_pandas(), invalid_count
+
+def report_invalid_values(invalid_values):
+    """Print the "record_type.COLUMN" -> count tally of values that failed typed conversion, worst first"""
+    if invalid_values:
+        print(f"    Invalid typed values: {sum(invalid_values.values()):,} (set to null)")
+        worst = sorted(invalid_values.items(), key=lambda item: item[1], reverse=True)
+        for column, count in worst[:10]:
+            print(f"      {column}: {count:,}")
+        if len(worst) > 10:
+            print(f"      ... and {len(worst) - 10} more columns")
+
+class ColumnarRecordSink:
+    """Accumulates parsed records per type and hands whole columns to pandas"""
+
+    def __init__(self, file_name, load_time, file_drop_date, layouts=None, typed=False, unknown_detail=False):
+        self.file_name = file_name
+        self.load_time = load_time
+        self.file_drop_date = file_drop_date
+        self.layouts = layouts or get_layouts()
+        self.typed = typed
+        self.record_columns = {}  # Insertion order = first appearance in the file
+        self.unknown = UnknownLayoutSummary()
+        self.unknown_rows = [] if unknown_detail else None  # (row number, record code, detail) per line, only on request
+        self.invalid_values = {}  # "record_type.COLUMN" -> values that failed typed conversion
+
+    def add(self, record_type, values, file_row_number, header_group_number, participant, contra_values=None):
+        columns = self.record_columns.get(record_type)
+        if columns is None:
+            columns = self.record_columns[record_type] = RecordColumns(self.layouts.compiled[record_type].columns)
+        columns.add(values, file_row_number, header_group_number, participant, contra_values)
+
+    def add_unknown(self, file_row_number, line):
+        self.unknown.add(file_row_number, line)
+        if self.unknown_rows is not None:
+            self.unknown_rows.append((file_row_number, unknown_line_code(line), unknown_line_detail(line)))
+
+    def merge(self, record_columns, unknown, unknown_rows=None):
+        """Append a chunk parsed by another sink - chunks must arrive in file order"""
+        for record_type, columns in record_columns.items():
+            if record_type in self.record_columns:
+                self.record_columns[record_type].extend(columns)
+            else:
+                self.record_columns[record_type] = columns
+        self.unknown.merge(unknown)
+        if self.unknown_rows is not None and unknown_rows:
+            self.unknown_rows.extend(unknown_rows)
+
+    def counts(self):
+        return {record_type: len(columns) for record_type, columns in self.record_columns.items()}
+
+    @property
+    def unknown_count(self):
+        return self.unknown.total
+
+    def to_pandas(self, record_type):
+        """Build one record type's DataFrame column-at-a-time; constants are broadcast by pandas"""
+        import numpy as np
+        import pandas as pd
+
+        columns = self.record_columns[record_type]
+        data = dict(zip(columns.columns, columns.buffers))
+        data["FILEROWNUMBER"] = np.frombuffer(columns.row_numbers, dtype=np.int64)
+        data["FILEHEADERGROUPNUMBER"] = np.frombuffer(columns.group_numbers, dtype=np.int64)
+        data["SUBMITTINGPARTICIPANTNUMBER"] = columns.participants
+        data["SOURCEFILENAME"] = self.file_name
+        data["LOADDATE"] = self.load_time
+        data["MODIFIEDDATE"] = self.load_time
+        data["FILEDROPDAY"] = self.file_drop_date
+        if columns.contra_buffers is not None:
+            for field, buffer in zip(CONTRA_ENRICH_FIELDS, columns.contra_buffers):
+                data[f"CONTRA_{field}"] = buffer
+        if self.typed:
+            self.convert_types(record_type, data)
+        return pd.DataFrame(data)
+
+    def unknown_to_pandas(self):
+        """One row per unknown line when detail was requested, else None (the summary has the counts)"""
+        import pandas as pd
+        if not self.unknown_rows:
+            return None
+        row_numbers, codes, details = zip(*self.unknown_rows)
+        return pd.DataFrame({
+            "FILENAME": self.file_name,
+            "FILEROWNUMBER": row_numbers,
+            "RECORDTYPE": codes,
+            "DETAIL": details,
+            "LOADDATE": self.load_time
+        })
+
+    def field_types(self, record_type):
+        field_types = dict(self.layouts.compiled[record_type].field_types)
+        if record_type == "contract_record":
+            field_types.update(self.layouts.contra_field_types)
+        return field_types
+
+    def convert_types(self, record_type, data):
+        """Replace typed columns in place, tallying values that did not convert"""
+        for column, field_type in self.field_types(record_type).items():
+            if column not in data:
+                continue
+            data[column], invalid_count = convert_typed_column(data[column], field_type)
+            if invalid_count:
+                self.invalid_values[f"{record_type}.{column}"] = invalid_count
+
+    def iter_frames(self):
+        """Yield (record_type, pandas DataFrame), releasing each type's buffers as it goes"""
+        for record_type in list(self.record_columns):
+            pandas_df = self.to_pandas(record_type)
+            del self.record_columns[record_type]
+            yield record_type, pandas_df
+
+    def report_invalid_values(self):
+        report_invalid_values(self.invalid_values)
+
+    def finish(self):
+        """Return ({record_type: pandas DataFrame}, unknown pandas DataFrame or None)"""
+        dataframes = dict(self.iter_frames())
+        self.report_invalid_values()
+        unknown_df = self.unknown_to_pandas()
+        if self.unknown_rows:
+            self.unknown_rows = []
+        return dataframes, unknown_df
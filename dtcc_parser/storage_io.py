@@ -0,0 +1,127 @@
+"""Concurrent storage I/O - output writes, folder creation, archive copies and log writes share a bounded
+thread pool and are retried with backoff, so post-parse time tracks the slowest single call"""
+
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+IO_CONCURRENCY = 8
+IO_RETRIES = 3
+IO_RETRY_DELAY = 0.5  # Seconds before the first retry; doubles on each further attempt
+NON_RETRYABLE_ERRORS = (FileNotFoundError, ValueError, TypeError)  # Retrying will not change the outcome
+
+class LocalStorage:
+    """Local-filesystem stand-in for the notebook's dbutils.fs-backed storage - same calls, same results"""
+
+    def mkdirs(self, path):
+        os.makedirs(path, exist_ok=True)
+
+    def put(self, path, text):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            f.write(text)
+
+    def cp(self, source, destination):
+        os.makedirs(os.path.dirname(destination) or ".", exist_ok=True)
+        shutil.copyfile(source, destination)
+
+    def mv(self, source, destination):
+        os.makedirs(os.path.dirname(destination) or ".", exist_ok=True)
+        shutil.move(source, destination)
+
+    def rm(self, path):
+        os.remove(path)
+
+class StorageIO:
+    """Bounded thread pool for storage calls.
+
+    submit() runs any callable with retries on the pool and returns its future; call() retries one in the
+    calling thread. mkdirs() creates each folder once per pool and returns the shared future, which
+    put/cp/mv wait on (folder=) before touching it. after= futures must have been submitted earlier, so
+    a waiting task never holds a worker its prerequisite needs. storage defaults to LocalStorage.
+    """
+
+    def __init__(self, storage=None, max_workers=None, retries=None, retry_delay=None):
+        self.storage = storage or LocalStorage()
+        self.max_workers = max_workers or IO_CONCURRENCY
+        self.retries = IO_RETRIES if retries is None else retries
+        self.retry_delay = IO_RETRY_DELAY if retry_delay is None else retry_delay
+        self.pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="storage-io")
+        self.lock = threading.Lock()
+        self.folders = {}
+        self.retry_count = 0
+
+    def call(self, description, action, *args, retries=None, **kwargs):
+        """action(*args, **kwargs) in this thread, retried with exponential backoff; the last error is raised"""
+        retries = self.retries if retries is None else retries
+        delay = self.retry_delay
+        for attempt in range(retries + 1):
+            try:
+                return action(*args, **kwargs)
+            except NON_RETRYABLE_ERRORS:
+                raise
+            except Exception as e:
+                if attempt == retries:
+                    raise
+                with self.lock:
+                    self.retry_count += 1
+                print(f"    Retrying {description} in {delay:.1f}s ({attempt + 1}/{retries}): {e}")
+                time.sleep(delay)
+                delay *= 2
+
+    def _run(self, description, action, args, kwargs, after, retries):
+        for future in after:
+            future.result()  # A failed prerequisite fails this call too
+        return self.call(description, action, *args, retries=retries, **kwargs)
+
+    def submit(self, description, action, *args, after=(), retries=None, **kwargs):
+        """Run action on the pool once every after= future is done; retries=0 for calls that are not idempotent"""
+        return self.pool.submit(self._run, description, action, args, kwargs, tuple(after), retries)
+
+    def mkdirs(self, path):
+        path = path.rstrip("/")
+        with self.lock:
+            future = self.folders.get(path)
+            # A folder whose creation failed is tried again by the next caller
+            if future is None or (future.done() and future.exception() is not None):
+                future = self.folders[path] = self.submit(f"mkdirs {path}", self.storage.mkdirs, path)
+        return future
+
+    def _after(self, folder):
+        return (self.mkdirs(folder),) if folder else ()
+
+    def put(self, path, text, folder=None):
+        return self.submit(f"put {path}", self.storage.put, path, text, after=self._after(folder))
+
+    def cp(self, source, destination, folder=None):
+        return self.submit(f"cp {source}", self.storage.cp, source, destination, after=self._after(folder))
+
+    def mv(self, source, destination, folder=None):
+        return self.submit(f"mv {source}", self.storage.mv, source, destination, after=self._after(folder))
+
+    def rm(self, path, after=()):
+        return self.submit(f"rm {path}", self.storage.rm, path, after=after)
+
+    def close(self):
+        self.pool.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def gather(futures):
+    """Results of futures in the order given - the first failure is raised once all have finished"""
+    error = None
+    results = []
+    for future in futures:
+        try:
+            results.append(future.result())
+        except Exception as e:
+            error = error or e
+    if error is not None:
+        raise error
+    return results
@@ -0,0 +1,166 @@
+"""Synthetic MRO files generated from the record layouts - for benchmarks and local checks"""
+
+import argparse
+import random
+from datetime import date, timedelta
+
+from .layouts import MRO_RECORD_LENGTH, get_layouts
+
+HEADER_TYPE = "submitting_header"
+CONTRA_TYPE = "contra_record"
+CONTRACT_TYPE = "contract_record"
+TEMPLATES_PER_TYPE = 64  # Lines are drawn from pre-rendered templates so generation keeps up with the parser
+_TEXT_CHARS = "ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789 "
+_DATE_ORIGIN = date(1990, 1, 1)
+
+def _field_value(rnd, kind, width):
+    """Random value for one field, right-sized for its span"""
+    if kind == "date":
+        if rnd.random() < 0.2:
+            return "0" * width  # Blank dates are zero-filled in real files
+        return (_DATE_ORIGIN + timedelta(days=rnd.randrange(15000))).strftime("%Y%m%d")[:width].ljust(width)
+    if kind in ("int", "decimal"):
+        digits = rnd.randrange(1, width + 1)
+        return "".join(rnd.choice("0123456789") for _ in range(digits)).zfill(width)
+    length = rnd.randrange(0, width + 1)
+    return "".join(rnd.choice(_TEXT_CHARS) for _ in range(length)).ljust(width)
+
+def _record_key(layouts, record_type):
+    record_key = getattr(layouts.record_configs[record_type]["matcher"], "record_key", None)
+    if record_key is None:
+        raise ValueError(f"Cannot generate {record_type}: its matcher has no record_key")
+    return record_key
+
+def render_record(layouts, record_type, rnd):
+    """One fixed-width line for record_type with random field values and its record key in place"""
+    line = [" "] * MRO_RECORD_LENGTH
+    field_types = layouts.compiled[record_type].field_types
+    for col, start, end, *_ in layouts.record_configs[record_type]["layout"]:
+        kind = field_types[col][0] if col in field_types else "string"
+        line[start:end] = _field_value(rnd, kind, end - start)
+    record_code, sequence = _record_key(layouts, record_type)
+    line[0] = rnd.choice("ABCDEFGHIJKLMNOPQRSTUVWXYZ")
+    line[1:3] = record_code
+    if sequence is not None:
+        line[3:5] = sequence
+    return "".join(line)
+
+def _malformed_line(rnd, line):
+    """A line the parser must survive: truncated, unknown record code or garbage"""
+    choice = rnd.randrange(3)
+    if choice == 0:
+        return line[:rnd.randrange(3, 60)]
+    if choice == 1:
+        return line[0] + "99" + line[3:]
+    return "".join(rnd.choice(_TEXT_CHARS + ",\"") for _ in range(rnd.randrange(1, 120))).strip() or "X"
+
+def generate_mro_lines(layouts=None, groups=10, contras_per_group=2, contracts_per_contra=20,
+                       record_mix=None, malformed_ratio=0.0, seed=0):
+    """Yield MRO lines: header groups of contras, each with contracts followed by their detail records.
+
+    record_mix maps contract-level record types to the average number of records per contract
+    (default: one of each). groups=None keeps generating until the caller stops iterating.
+    """
+    layouts = layouts or get_layouts()
+    rnd = random.Random(seed)
+    detail_types = [record_type for record_type in layouts.record_configs
+                    if record_type not in (HEADER_TYPE, CONTRA_TYPE, CONTRACT_TYPE)]
+    record_mix = record_mix if record_mix is not None else dict.fromkeys(detail_types, 1)
+    unknown_types = set(record_mix) - set(detail_types)
+    if unknown_types:
+        raise ValueError(f"record_mix has unknown contract-level record types: {sorted(unknown_types)}")
+
+    templates = {
+        record_type: [render_record(layouts, record_type, rnd) for _ in range(TEMPLATES_PER_TYPE)]
+        for record_type in [HEADER_TYPE, CONTRA_TYPE, CONTRACT_TYPE] + list(record_mix)
+    }
+    contract_spans = {
+        record_type: next(((start, end) for col, start, end, *_ in layouts.record_configs[record_type]["layout"]
+                           if col == "CONTRACTNUMBER"), None)
+        for record_type in templates
+    }
+
+    def emit(line):
+        yield line
+        if malformed_ratio and rnd.random() < malformed_ratio:
+            yield _malformed_line(rnd, line)
+
+    def record(record_type, contract_number=None):
+        line = rnd.choice(templates[record_type])
+        span = contract_spans[record_type]
+        if contract_number is not None and span is not None:
+            start, end = span
+            line = line[:start] + contract_number.ljust(end - start)[:end - start] + line[end:]
+        return line
+
+    group_number = 0
+    while groups is None or group_number < groups:
+        group_number += 1
+        header = record(HEADER_TYPE)
+        yield from emit(header[:3] + f"{group_number % 10000:04d}" + header[7:])
+        for contra_number in range(contras_per_group):
+            yield from emit(record(CONTRA_TYPE))
+            for contract_index in range(contracts_per_contra):
+                contract_number = f"SYN{group_number:06d}{contra_number:03d}{contract_index:06d}"
+                yield from emit(record(CONTRACT_TYPE, contract_number))
+                for record_type, average in record_mix.items():
+                    count = int(average) + (rnd.random() < average % 1)
+                    for _ in range(count):
+                        yield from emit(record(record_type, contract_number))
+
+def write_mro_file(path, target_bytes=None, layouts=None, line_ending="\n", **options):
+    """Write generated lines to path, stopping once target_bytes is reached; returns (lines, bytes)"""
+    if target_bytes is not None:
+        options["groups"] = None
+    line_count = 0
+    bytes_written = 0
+    ending_bytes = len(line_ending)
+    with open(path, "w", newline="") as f:
+        batch = []
+        for line in generate_mro_lines(layouts, **options):
+            batch.append(line)
+            line_count += 1
+            bytes_written += len(line) + ending_bytes
+            if len(batch) >= 10000:
+                f.write(line_ending.join(batch) + line_ending)
+                batch = []
+            if target_bytes is not None and bytes_written >= target_bytes:
+                break
+        if batch:
+            f.write(line_ending.join(batch) + line_ending)
+    return line_count, bytes_written
+
+def parse_record_mix(text):
+    """'contract_valuation=2,contract_agent_record=0.5' -> {record_type: average per contract}"""
+    record_mix = {}
+    for item in filter(None, (part.strip() for part in text.split(","))):
+        record_type, _, average = item.partition("=")
+        record_mix[record_type.strip()] = float(average) if average else 1.0
+    return record_mix
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="dtcc_parser.synthetic", description="Generate a synthetic DTCC MRO file")
+    parser.add_argument("output", help="MRO file to write")
+    parser.add_argument("--size-mb", type=float, help="Approximate file size (overrides --groups)")
+    parser.add_argument("--groups", type=int, default=10, help="Submitting header groups")
+    parser.add_argument("--contras", type=int, default=2, help="Contra records per header group")
+    parser.add_argument("--contracts", type=int, default=20, help="Contracts per contra record")
+    parser.add_argument("--mix", help="Records per contract, e.g. contract_valuation=2,contract_agent_record=0.5")
+    parser.add_argument("--malformed-ratio", type=float, default=0.0, help="Probability of a malformed line after each line")
+    parser.add_argument("--layout-config", help="Layout YAML (default: built-in layouts)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    line_count, bytes_written = write_mro_file(
+        args.output,
+        target_bytes=int(args.size_mb * 1024 * 1024) if args.size_mb else None,
+        layouts=get_layouts(args.layout_config),
+        groups=args.groups, contras_per_group=args.contras, contracts_per_contra=args.contracts,
+        record_mix=parse_record_mix(args.mix) if args.mix else None,
+        malformed_ratio=args.malformed_ratio, seed=args.seed
+    )
+    print(f"  Wrote {line_count:,} lines ({bytes_written / (1024 * 1024):.1f} MB) → {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,69 @@
+"""Unknown-layout accounting - unmatched lines are counted per record code with a few sample lines each"""
+
+UNKNOWN_SAMPLE_SIZE = 5
+UNKNOWN_DETAIL_WIDTH = 80
+
+def unknown_line_code(line):
+    return line[1:3] if len(line) > 2 else ""
+
+def unknown_line_detail(line):
+    return line[:UNKNOWN_DETAIL_WIDTH] if len(line) > UNKNOWN_DETAIL_WIDTH else line
+
+class UnknownLayoutSummary:
+    """Line counts per record code plus the first sample_size (row number, detail) pairs of each code"""
+
+    def __init__(self, sample_size=None):
+        self.sample_size = UNKNOWN_SAMPLE_SIZE if sample_size is None else sample_size
+        self.counts = {}    # Insertion order = first appearance in the file
+        self.samples = {}
+
+    def add(self, file_row_number, line):
+        code = unknown_line_code(line)
+        count = self.counts.get(code, 0)
+        self.counts[code] = count + 1
+        if count < self.sample_size:
+            self.samples.setdefault(code, []).append([file_row_number, unknown_line_detail(line)])
+
+    def add_aggregate(self, code, count, samples):
+        """Fold in a count and samples computed elsewhere (e.g. a Spark aggregation)"""
+        self.counts[code] = self.counts.get(code, 0) + count
+        code_samples = self.samples.setdefault(code, [])
+        code_samples.extend(list(sample) for sample in samples[:self.sample_size - len(code_samples)])
+
+    def merge(self, other):
+        """Append another chunk's summary - chunks must arrive in file order to keep the first samples"""
+        for code, count in other.counts.items():
+            self.add_aggregate(code, count, other.samples.get(code, []))
+
+    @property
+    def total(self):
+        return sum(self.counts.values())
+
+    def to_dict(self):
+        return {
+            "total": self.total,
+            "sample_size": self.sample_size,
+            "by_record_code": {
+                code: {
+                    "count": count,
+                    "samples": [{"FILEROWNUMBER": row, "DETAIL": detail} for row, detail in self.samples.get(code, [])]
+                }
+                for code, count in self.counts.items()
+            }
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        summary = cls(data["sample_size"])
+        for code, info in data["by_record_code"].items():
+            summary.add_aggregate(code, info["count"], [[sample["FILEROWNUMBER"], sample["DETAIL"]] for sample in info["samples"]])
+        return summary
+
+    def describe(self):
+        """Report lines - one per record code, most frequent first, with its first sample"""
+        lines = []
+        for code, count in sorted(self.counts.items(), key=lambda item: item[1], reverse=True):
+            samples = self.samples.get(code)
+            example = f" - e.g. row {samples[0][0]:,}: {samples[0][1]!r}" if samples else ""
+            lines.append(f"{code!r}: {count:,} lines{example}")
+        return lines
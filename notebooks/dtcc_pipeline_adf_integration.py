@@ -1,26 +1,128 @@
 
-import pandas as pd
 from datetime import datetime, date
 import re
+import hashlib
 import os
-from pyspark.sql import SparkSession
-from pyspark.sql.types import *
-from pyspark.sql.functions import *
+import json
+import sys
+import time
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from functools import partial
+from collections import defaultdict
+# pyspark.sql functions/types and pandas are imported where they are used, so a run that never touches
+# the distributed engine, typed schemas or DataFrames does not pay for them at startup
+
+try:
+    import dtcc_parser
+except ImportError:
+    # Repos checkout - the package sits at the repo root, next to notebooks/
+    sys.path.append(os.path.abspath(".."))
+from dtcc_parser import (
+    CONTRACT_OUTPUT_FORMATS, CheckpointStore, CheckpointedCsvSink, ColumnarRecordSink, CompressedWriter, ContentDigest,
+    ContractIndex, FileListener, PollingSource, ProcessingLedger, QueueMessage, QueueSource, StageMetrics, StorageIO,
+    StreamingCsvSink, UnknownLayoutSummary, compression_of, concatenate_csv_parts, encode_contracts,
+    extract_file_drop_date, file_sha256, gather, get_layouts, iter_compressed_lines, iter_mmap_lines, iter_stream_lines,
+    open_compressed, open_source, parse_file_distributed, parse_input_files, parse_line_to_record, parse_lines_parallel,
+    parse_mro_lines, parse_with_checkpoints, plan_batches, strip_compression_suffix, validate_compression,
+    validate_contract_output, with_compression_suffix
+)
 
 # COMMAND ----------
 
 # Parameters from Azure Data Factory
 dbutils.widgets.text("input_file", "", "Specific Input File Name (from DTCC SFTP)")
 dbutils.widgets.text("processing_date", "", "Processing Date (YYYY-MM-DD)")
-dbutils.widgets.text("mode", "auto", "Processing Mode: 'single' for ADF, 'batch' for manual")
+dbutils.widgets.text("input_files", "", "JSON Array of Input File Names Processed in One Run (ADF micro-batch)")
+dbutils.widgets.text("mode", "auto", "Processing Mode: 'auto' (from input_file/input_files), 'plan' to group input_files into batches, or 'listen'")
+dbutils.widgets.text("engine", "driver", "Parsing Engine: 'driver', 'parallel' (process pool) or 'spark' (distributed)")
+dbutils.widgets.text("parallel_workers", "", "Parallel Engine Worker Processes (blank = all cores)")
+dbutils.widgets.text("read_buffer_size", "8388608", "Driver Read Buffer Size (bytes)")
+dbutils.widgets.text("output_format", "csv", "Output Format: 'csv', 'parquet' or 'delta'")
+dbutils.widgets.text("output_compression", "snappy", "Parquet/Delta Compression: 'snappy' or 'zstd'")
+dbutils.widgets.text("csv_writer", "frame", "CSV Writer: 'frame' (DataFrame round trip) or 'streaming'")
+dbutils.widgets.text("csv_buffer_size", "4194304", "Streaming CSV Buffer Size per Record Type (bytes)")
+dbutils.widgets.text("layout_config", "../configs/config.yaml", "Record Layout YAML (built-in layouts if not found)")
+dbutils.widgets.text("typed_output", "false", "Typed Output: convert amounts/counts/dates per layout ('true'/'false')")
+dbutils.widgets.text("batch_parallelism", "4", "Batch Mode: Files Processed Concurrently")
+dbutils.widgets.text("consolidate_outputs", "true", "Batch Mode: Consolidate Per-File CSV Parts ('true'/'false')")
+dbutils.widgets.text("force_reprocess", "false", "Reprocess Files Already in the Processing Ledger ('true'/'false')")
+dbutils.widgets.text("checkpoint_interval_mb", "0", "Streaming CSV: Checkpoint Every N MB of Input (0 = off)")
+dbutils.widgets.text("record_types", "", "Record Types to Parse, comma-separated (blank = all)")
+dbutils.widgets.text("columns", "", 'Columns per Record Type as JSON, e.g. {"contract_record": ["CONTRACTNUMBER"]} (blank = all)')
+dbutils.widgets.text("unknown_detail", "false", "Write Every Unknown-Layout Line to unknown_layouts ('true'/'false')")
+dbutils.widgets.text("csv_compression", "none", "CSV Output Compression: 'none', 'gzip' or 'zstd'")
+dbutils.widgets.text("archive_compression", "none", "Compress Archived Source Files: 'none', 'gzip' or 'zstd'")
+dbutils.widgets.text("io_concurrency", "8", "Concurrent Storage Calls after Parsing (output writes, archive, logs)")
+dbutils.widgets.text("io_retries", "3", "Retries per Failed Storage Call (exponential backoff)")
+dbutils.widgets.text("storage_protocol", "auto", "Storage Protocol: 'auto' (cached probe), 'abfss' or 'wasbs'")
+dbutils.widgets.text("batch_max_files", "10", "Plan Mode: Files per Micro-Batch (0 = no limit)")
+dbutils.widgets.text("batch_max_mb", "0", "Plan Mode: Total Source MB per Micro-Batch (0 = no limit)")
+dbutils.widgets.text("listener_source", "poll", "Listen Mode: Arrivals from 'poll' (list source) or 'queue' (blob-created events)")
+dbutils.widgets.text("listener_queue", "dtcc-source-events", "Listen Mode: Storage Queue Receiving the Source Container's Events")
+dbutils.widgets.text("listener_poll_seconds", "5", "Listen Mode: Seconds between Source Listings / Empty Queue Reads")
+dbutils.widgets.text("listener_workers", "2", "Listen Mode: Files Processed Concurrently")
+dbutils.widgets.text("listener_queue_depth", "8", "Listen Mode: Arrivals Held Pending before the Source Is Paused")
+dbutils.widgets.text("listener_max_minutes", "0", "Listen Mode: Stop after N Minutes (0 = until cancelled)")
+dbutils.widgets.text("listener_metrics_seconds", "60", "Listen Mode: Seconds between Metrics Reports")
+dbutils.widgets.text("contract_output", "none", "Nested Row per Contract besides the Flat Outputs: 'none', 'parquet' or 'jsonl'")
 
 # Get parameter values
 input_file_param = dbutils.widgets.get("input_file")
+input_files_param = dbutils.widgets.get("input_files")
 processing_date_param = dbutils.widgets.get("processing_date")
 mode_param = dbutils.widgets.get("mode")
+engine_param = dbutils.widgets.get("engine")
+parallel_workers_param = dbutils.widgets.get("parallel_workers")
+read_buffer_size_param = dbutils.widgets.get("read_buffer_size")
+output_format_param = dbutils.widgets.get("output_format")
+output_compression_param = dbutils.widgets.get("output_compression")
+csv_writer_param = dbutils.widgets.get("csv_writer")
+csv_buffer_size_param = dbutils.widgets.get("csv_buffer_size")
+layout_config_param = dbutils.widgets.get("layout_config")
+typed_output_param = dbutils.widgets.get("typed_output")
+batch_parallelism_param = dbutils.widgets.get("batch_parallelism")
+consolidate_outputs_param = dbutils.widgets.get("consolidate_outputs")
+force_reprocess_param = dbutils.widgets.get("force_reprocess")
+checkpoint_interval_param = dbutils.widgets.get("checkpoint_interval_mb")
+record_types_param = dbutils.widgets.get("record_types")
+columns_param = dbutils.widgets.get("columns")
+unknown_detail_param = dbutils.widgets.get("unknown_detail")
+csv_compression_param = dbutils.widgets.get("csv_compression")
+archive_compression_param = dbutils.widgets.get("archive_compression")
+io_concurrency_param = dbutils.widgets.get("io_concurrency")
+io_retries_param = dbutils.widgets.get("io_retries")
+storage_protocol_param = dbutils.widgets.get("storage_protocol")
+batch_max_files_param = dbutils.widgets.get("batch_max_files")
+batch_max_mb_param = dbutils.widgets.get("batch_max_mb")
+listener_source_param = dbutils.widgets.get("listener_source")
+listener_queue_param = dbutils.widgets.get("listener_queue")
+listener_poll_seconds_param = dbutils.widgets.get("listener_poll_seconds")
+listener_workers_param = dbutils.widgets.get("listener_workers")
+listener_queue_depth_param = dbutils.widgets.get("listener_queue_depth")
+listener_max_minutes_param = dbutils.widgets.get("listener_max_minutes")
+listener_metrics_seconds_param = dbutils.widgets.get("listener_metrics_seconds")
+contract_output_param = dbutils.widgets.get("contract_output")
 
 # Determine processing mode
-if input_file_param and input_file_param.strip():
+INPUT_FILES = parse_input_files(input_files_param)
+if (mode_param or "").strip().lower() == "plan":
+    PROCESSING_MODE = "plan"    # ADF asks how to group its file list into micro-batches
+    TARGET_FILE = None
+    PROCESSING_DATE = processing_date_param if processing_date_param else datetime.now().strftime("%Y-%m-%d")
+    print(f" PLAN MODE: Grouping {len(INPUT_FILES)} files into micro-batches")
+elif (mode_param or "").strip().lower() == "listen":
+    PROCESSING_MODE = "listen"  # Warm session processing files as they land, until cancelled
+    TARGET_FILE = None
+    PROCESSING_DATE = datetime.now().strftime("%Y-%m-%d")  # Start date - each file uses the date it is processed
+    print(f" LISTEN MODE: Processing files as they land in the source container")
+elif INPUT_FILES:
+    PROCESSING_MODE = "micro_batch"  # ADF triggered for a group of files, processed one after another
+    TARGET_FILE = None
+    PROCESSING_DATE = processing_date_param if processing_date_param else datetime.now().strftime("%Y-%m-%d")
+    print(f" ADF MICRO-BATCH MODE: Processing {len(INPUT_FILES)} files")
+    print(f"Processing date: {PROCESSING_DATE}")
+elif input_file_param and input_file_param.strip():
     PROCESSING_MODE = "single"  # ADF triggered for specific file
     TARGET_FILE = input_file_param.strip()
     PROCESSING_DATE = processing_date_param if processing_date_param else datetime.now().strftime("%Y-%m-%d")
@@ -32,7 +134,110 @@ else:
     PROCESSING_DATE = datetime.now().strftime("%Y-%m-%d")
     print(f"BATCH MODE: Processing all files in source container")
 
+# Parsing engine: 'driver' parses in the notebook process, 'parallel' fans chunks out to a
+# process pool on the driver node, 'spark' keeps lines on the executors
+PARSING_ENGINE = engine_param.strip().lower() if engine_param and engine_param.strip() else "driver"
+if PARSING_ENGINE not in ("driver", "parallel", "spark"):
+    raise ValueError(f"Unknown parsing engine: {engine_param}")
+PARALLEL_WORKERS = int(parallel_workers_param) if parallel_workers_param and parallel_workers_param.strip() else (os.cpu_count() or 1)
+
+# Block size for the streaming driver reader
+READ_BUFFER_SIZE = int(read_buffer_size_param) if read_buffer_size_param and read_buffer_size_param.strip() else 8 * 1024 * 1024
+
+# Output backend: CSV files (default) or Parquet/Delta tables partitioned by processing date and source file
+OUTPUT_FORMAT = output_format_param.strip().lower() if output_format_param and output_format_param.strip() else "csv"
+OUTPUT_COMPRESSION = output_compression_param.strip().lower() if output_compression_param and output_compression_param.strip() else "snappy"
+if OUTPUT_FORMAT not in ("csv", "parquet", "delta"):
+    raise ValueError(f"Unknown output format: {output_format_param}")
+if OUTPUT_COMPRESSION not in ("snappy", "zstd"):
+    raise ValueError(f"Unknown output compression: {output_compression_param}")
+
+# Streaming CSV writes rows as the driver parser emits them, skipping the pandas/Spark round trip
+CSV_WRITER = csv_writer_param.strip().lower() if csv_writer_param and csv_writer_param.strip() else "frame"
+CSV_BUFFER_SIZE = int(csv_buffer_size_param) if csv_buffer_size_param and csv_buffer_size_param.strip() else 4 * 1024 * 1024
+if CSV_WRITER not in ("frame", "streaming"):
+    raise ValueError(f"Unknown CSV writer: {csv_writer_param}")
+if CSV_WRITER == "streaming" and PARSING_ENGINE != "driver":
+    raise ValueError("The streaming CSV writer requires the driver parsing engine")
+if PARSING_ENGINE == "spark" and OUTPUT_FORMAT == "csv":
+    # CSV files are rendered through pandas on the driver, which would collect every record type
+    raise ValueError("The spark engine keeps the file on the executors - use output_format 'parquet' or 'delta'")
+STREAMING_CSV = OUTPUT_FORMAT == "csv" and CSV_WRITER == "streaming"
+
+# Record layouts come from the YAML config when it is reachable from the notebook
+LAYOUT_CONFIG_PATH = layout_config_param.strip() if layout_config_param and layout_config_param.strip() else "../configs/config.yaml"
+
+# Typed output converts layout fields flagged with a type after extraction (strings otherwise)
+TYPED_OUTPUT = (typed_output_param or "false").strip().lower() in ("true", "1", "yes")
+if TYPED_OUTPUT and STREAMING_CSV:
+    raise ValueError("Typed output converts whole columns and is not available with the streaming CSV writer")
+
+# Batch mode: files run concurrently, each writing its own part outputs
+BATCH_PARALLELISM = max(1, int(batch_parallelism_param)) if batch_parallelism_param and batch_parallelism_param.strip() else 4
+CONSOLIDATE_OUTPUTS = (consolidate_outputs_param or "true").strip().lower() in ("true", "1", "yes")
+
+# Files whose name, size and content hash are already in the processing ledger are skipped unless forced
+FORCE_REPROCESS = (force_reprocess_param or "false").strip().lower() in ("true", "1", "yes")
+
+# Checkpoints let a rerun resume a large file from its last submitting header group instead of line 1
+CHECKPOINT_INTERVAL_BYTES = int(float(checkpoint_interval_param) * 1024 * 1024) if checkpoint_interval_param and checkpoint_interval_param.strip() else 0
+if CHECKPOINT_INTERVAL_BYTES and not STREAMING_CSV:
+    raise ValueError("Checkpointed parsing needs CSV output with the streaming CSV writer")
+
+# Record-type allowlist and column projection - other lines are dropped by key and unlisted fields never sliced
+RECORD_TYPE_FILTER = [name.strip() for name in (record_types_param or "").split(",") if name.strip()] or None
+COLUMN_FILTER = json.loads(columns_param) if columns_param and columns_param.strip() else None
+
+# Unknown lines are counted per record code with a few samples; one output row per line only on request
+UNKNOWN_DETAIL = (unknown_detail_param or "false").strip().lower() in ("true", "1", "yes")
+
+# .mro.gz/.mro.zst sources are always decoded while reading; CSV outputs and archived copies are compressed on request
+CSV_COMPRESSION = validate_compression(csv_compression_param)
+ARCHIVE_COMPRESSION = validate_compression(archive_compression_param)
+if CSV_COMPRESSION and OUTPUT_FORMAT != "csv":
+    raise ValueError("csv_compression applies to CSV output; Parquet/Delta use output_compression")
+
+# Output writes, folder creation, archive copy and log writes overlap on one bounded pool, each call retried
+IO_CONCURRENCY = max(1, int(io_concurrency_param)) if io_concurrency_param and io_concurrency_param.strip() else 8
+IO_RETRIES = max(0, int(io_retries_param)) if io_retries_param and io_retries_param.strip() else 3
+# DataFrame CSVs are built on the driver one record type at a time; this many finished CSV texts may wait for storage
+CSV_WRITES_IN_FLIGHT = 2
+
+# ABFSS/WASBS is probed on first storage access unless pinned here
+STORAGE_PROTOCOL = (storage_protocol_param or "auto").strip().lower()
+STORAGE_PROTOCOL = None if STORAGE_PROTOCOL in ("", "auto") else STORAGE_PROTOCOL
+if STORAGE_PROTOCOL not in (None, "abfss", "wasbs"):
+    raise ValueError(f"Unknown storage protocol: {storage_protocol_param}")
+
+# Plan mode closes a micro-batch at this many files or source MB, whichever comes first
+BATCH_MAX_FILES = max(0, int(batch_max_files_param)) if batch_max_files_param and batch_max_files_param.strip() else 10
+BATCH_MAX_BYTES = int(float(batch_max_mb_param) * 1024 * 1024) if batch_max_mb_param and batch_max_mb_param.strip() else 0
+
+# Listen mode: arrivals from source listings or a blob-created event queue, dispatched to a bounded worker pool
+LISTENER_SOURCE = (listener_source_param or "poll").strip().lower()
+if LISTENER_SOURCE not in ("poll", "queue"):
+    raise ValueError(f"Unknown listener source: {listener_source_param}")
+LISTENER_QUEUE = (listener_queue_param or "").strip()
+LISTENER_POLL_SECONDS = float(listener_poll_seconds_param) if listener_poll_seconds_param and listener_poll_seconds_param.strip() else 5.0
+LISTENER_WORKERS = max(1, int(listener_workers_param)) if listener_workers_param and listener_workers_param.strip() else 2
+LISTENER_QUEUE_DEPTH = max(1, int(listener_queue_depth_param)) if listener_queue_depth_param and listener_queue_depth_param.strip() else 8
+LISTENER_MAX_SECONDS = float(listener_max_minutes_param) * 60 if listener_max_minutes_param and listener_max_minutes_param.strip() else 0
+LISTENER_METRICS_SECONDS = float(listener_metrics_seconds_param) if listener_metrics_seconds_param and listener_metrics_seconds_param.strip() else 60.0
+
+# Contract-centric output: 13xx records grouped per contract during the driver parse, written as one nested file per source
+CONTRACT_OUTPUT = validate_contract_output(contract_output_param)
+if CONTRACT_OUTPUT and PARSING_ENGINE != "driver":
+    raise ValueError("contract_output groups records during the driver parse and requires the driver parsing engine")
+if CONTRACT_OUTPUT and CHECKPOINT_INTERVAL_BYTES:
+    raise ValueError("contract_output holds every contract until the end of the file and cannot resume from a checkpoint")
+
 print(f" Mode: {PROCESSING_MODE}")
+print(f" Engine: {PARSING_ENGINE}")
+print(f" Output: {OUTPUT_FORMAT}" + (f" ({OUTPUT_COMPRESSION})" if OUTPUT_FORMAT != "csv" else f" ({CSV_COMPRESSION})" if CSV_COMPRESSION else ""))
+if ARCHIVE_COMPRESSION:
+    print(f" Archive: {ARCHIVE_COMPRESSION}")
+if CONTRACT_OUTPUT:
+    print(f" Contracts: {CONTRACT_OUTPUT_FORMATS[CONTRACT_OUTPUT]}")
 
 
 # COMMAND ----------
@@ -58,329 +263,225 @@ print(f"Storage configured for: {STORAGE_ACCOUNT_NAME}")
 
 # COMMAND ----------
 
-# Determine working protocol (UNCHANGED)
-print("Testing storage connection...")
+# Determine working protocol - resolved on first use instead of listing the source container at startup.
+# The storage_protocol widget pins it; otherwise the last working choice for this account is cached on the
+# driver (it outlives notebook runs on the same cluster) and confirmed with one existence check of the target
+# file - a single HEAD request, so the cost no longer grows with the container
+STORAGE_ENDPOINTS = {"abfss": "dfs.core.windows.net", "wasbs": "blob.core.windows.net"}
+STORAGE_PROTOCOL_CACHE = "/tmp/dtcc_storage_protocol.json"
+STORAGE_PROTOCOL_LOCK = threading.Lock()
 
 PROTOCOL = None
 ENDPOINT = None
 
-# Try ABFSS first
-try:
-    abfss_path = f"abfss://source@{STORAGE_ACCOUNT_NAME}.dfs.core.windows.net/"
-    files = dbutils.fs.ls(abfss_path)
-    
-    print(f"ABFSS connection successful")
-    PROTOCOL = "abfss"
-    ENDPOINT = "dfs.core.windows.net"
-    
-except Exception as e1:
-    print(f"    ABFSS failed, trying WASBS...")
-    
-    # Try WASBS as fallback
+# Runs at most once per notebook run; every file's metrics carry it
+STORAGE_PROBE_METRICS = StageMetrics()
+
+def storage_path_exists(path):
+    """Existence check through the Hadoop FileSystem API - never a listing; connection and auth errors raise"""
+    hadoop_path = spark._jvm.org.apache.hadoop.fs.Path(path)
+    hadoop_conf = spark._jsparkSession.sessionState().newHadoopConf()
+    return hadoop_path.getFileSystem(hadoop_conf).exists(hadoop_path)
+
+def _cached_protocols():
+    try:
+        with open(STORAGE_PROTOCOL_CACHE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _cache_protocol(protocol):
+    """Remember the working protocol for this account on the driver's local disk"""
     try:
-        wasbs_path = f"wasbs://source@{STORAGE_ACCOUNT_NAME}.blob.core.windows.net/"
-        files = dbutils.fs.ls(wasbs_path)
+        cached = _cached_protocols()
+        cached[STORAGE_ACCOUNT_NAME] = protocol
+        temp_path = f"{STORAGE_PROTOCOL_CACHE}.{os.getpid()}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump(cached, f)
+        os.replace(temp_path, STORAGE_PROTOCOL_CACHE)
+    except OSError as e:
+        print(f"    Could not cache the storage protocol: {e}")
+
+def resolve_storage_protocol(probe_file=""):
+    """Set PROTOCOL/ENDPOINT once per run; probe_file (in the source container) is the only object checked"""
+    global PROTOCOL, ENDPOINT
+    with STORAGE_PROTOCOL_LOCK:
+        if PROTOCOL is not None:
+            return PROTOCOL
+        probe_wall_start, probe_cpu_start = time.perf_counter(), time.thread_time()
         
-        print(f"  WASBS connection successful")
-        PROTOCOL = "wasbs"
-        ENDPOINT = "blob.core.windows.net"
+        if STORAGE_PROTOCOL:
+            protocol, origin = STORAGE_PROTOCOL, "widget"
+        else:
+            # The cached protocol is tried first; a stale cache just costs the fallback
+            cached = _cached_protocols().get(STORAGE_ACCOUNT_NAME)
+            candidates = sorted(STORAGE_ENDPOINTS, key=lambda candidate: candidate != cached)
+            protocol, origin = None, "cached" if cached in STORAGE_ENDPOINTS else "probed"
+            print(f"Testing storage connection...")
+            for candidate in candidates:
+                try:
+                    storage_path_exists(f"{candidate}://source@{STORAGE_ACCOUNT_NAME}.{STORAGE_ENDPOINTS[candidate]}/{probe_file}")
+                    protocol = candidate
+                    break
+                except Exception as e:
+                    print(f"    {candidate.upper()} failed: {e}")
+                    origin = "probed"
+            if protocol is None:
+                print(f"Connection failed with both protocols")
+                raise ConnectionError(f"Storage account {STORAGE_ACCOUNT_NAME} is not reachable over ABFSS or WASBS")
+            if protocol != cached:
+                _cache_protocol(protocol)
         
-    except Exception as e2:
-        print(f"Connection failed with both protocols")
-        raise
+        PROTOCOL, ENDPOINT = protocol, STORAGE_ENDPOINTS[protocol]
+        STORAGE_PROBE_METRICS.add("storage_probe", time.perf_counter() - probe_wall_start, time.thread_time() - probe_cpu_start)
+        print(f"🔗 Using: {PROTOCOL} protocol ({origin})")
+        return PROTOCOL
+
+def storage_root(container_name):
+    """protocol://container@account.endpoint - resolves the protocol on first use"""
+    resolve_storage_protocol()
+    return f"{PROTOCOL}://{container_name}@{STORAGE_ACCOUNT_NAME}.{ENDPOINT}"
 
-print(f"🔗 Using: {PROTOCOL} protocol")
+def get_storage_path(container_name, file_path=""):
+    """Construct full storage path"""
+    return f"{storage_root(container_name)}/{file_path}"
 
 # COMMAND ----------
 
-# Complete RECORD_CONFIGS with exact naming (UNCHANGED)
-RECORD_CONFIGS = {
-    "contract_valuation": {
-        "layout": [
-            ("SUBMITTERCODE", 0, 1), ("RECORDTYPE", 1, 3), ("SEQUENCENUMBER", 3, 5), ("CONTRACTNUMBER", 5, 35),
-            ("CONTRACTVALUEAMOUNT1", 35, 51), ("CONTRACTVALUEQUALIFIER1", 51, 54),
-            ("CONTRACTVALUEAMOUNT2", 55, 71), ("CONTRACTVALUEQUALIFIER2", 71, 74),
-            ("CONTRACTVALUEAMOUNT3", 75, 91), ("CONTRACTVALUEQUALIFIER3", 91, 94),
-            ("CONTRACTVALUEAMOUNT4", 95, 111), ("CONTRACTVALUEQUALIFIER4", 111, 114),
-            ("CONTRACTVALUEAMOUNT5", 115, 131), ("CONTRACTVALUEQUALIFIER5", 131, 134),
-            ("CONTRACTPERCENTAGEAMOUNT1", 135, 145), ("CONTRACTPERCENTAGEAMOUNTQUALIFIER1", 145, 148),
-            ("CONTRACTPERCENTAGEAMOUNT2", 149, 159), ("CONTRACTPERCENTAGEAMOUNTQUALIFIER2", 159, 162),
-            ("CONTRACTPERCENTAGEAMOUNT3", 163, 173), ("CONTRACTPERCENTAGEAMOUNTQUALIFIER3", 173, 176),
-            ("REJECTCODELIST", 288, 300)
-        ],
-        "matcher": lambda line: len(line) > 4 and line[1:3] == '13' and line[3:5] == '02',
-        "display_name": "Contract Valuation"
-    },
-    
-    "submitting_header": {
-        "layout": [
-            ("SUBMITTERCODE", 0, 1), ("RECORDTYPE", 1, 3), ("SUBMITTINGPARTICIPANTNUMBER", 3, 7),
-            ("IPSBUSINESSCODE", 7, 10), ("TRANSMISSIONUNIQUEID", 10, 40), ("TOTALCOUNT", 40, 52),
-            ("VALUATIONDATE", 52, 60), ("TESTINDICATOR", 60, 61), ("ASSOCIATEDCARRIERCOMPANYID", 61, 71),
-            ("REJECTCODE", 288, 300)
-        ],
-        "matcher": lambda line: len(line) > 2 and line[1:3] == '10',
-        "display_name": "Submitting Header"
-    },
-    
-    "contra_record": {
-        "layout": [
-            ("SUBMITTERCODE", 0, 1), ("RECORDTYPE", 1, 3), ("CONTRAPARTICIPANTNUMBER", 3, 7),
-            ("ASSOCIATEDFIRMID", 7, 11), ("ASSOCIATEDFIRMSUBMITTEDCONTRACTCOUNT", 11, 21),
-            ("ASSOCIATEDFIRMDELIVEREDCONTRACTCOUNT", 21, 31), ("IPSEVENTCODE", 31, 34),
-            ("IPSSTAGECODE", 34, 37), ("REJECTCODE", 288, 300)
-        ],
-        "matcher": lambda line: len(line) > 2 and line[1:3] == '12',
-        "display_name": "Contra Record"
-    },
-    
-    "contract_underlying_asset": {
-        "layout": [
-            ("SUBMITTERSCODE", 0, 1), ("RECORDTYPE", 1, 3), ("SEQUENCENUMBER", 3, 5), ("CONTRACTNUMBER", 5, 35),
-            ("CUSIPFUNDID", 35, 54), ("FUNDVALUE", 54, 70), ("FUNDPERCENTAGE", 70, 80), ("FUNDUNITS", 80, 98),
-            ("GUARANTEEDINTERESTRATE", 98, 108), ("FUNDSECURITYNAME", 108, 148), ("FUNDSECURITYTYPE", 148, 151),
-            ("MUTUALFUNDCUSIP", 151, 160), ("RESTRICTIONINDICATOR", 160, 161), ("RESTRICTIONREASON", 161, 162),
-            ("STANDINGALLOCINDICATOR", 162, 163), ("STANDINGALLOCATIONPCT", 163, 173), ("MATURITYELECTIONINSTRUCTIONS", 173, 175),
-            ("RATEFUNDRISKTHRESHOLDPCT", 175, 185), ("TOTALNETFUNDFEEPCT", 185, 195), ("MVAINDICATOR", 195, 196),
-            ("THIRDPARTYPLATFORMID", 196, 226), ("THIRDPARTYPLATFORMSOURCE", 226, 228), ("COREFUNDINDICATOR", 228, 229),
-            ("LOCKFEATUREINDICATOR", 229, 230), ("CARRIERFUNDLEVELFEE", 230, 240), ("INDEXSTRATEGYTERM", 240, 243),
-            ("INDEXSTRATEGYTERMQUALIFIER", 243, 244), ("NUMBEROFINDEXPERIODS", 244, 247), ("DURATIONOFINDEXPERIODS", 247, 250),
-            ("REJECTCODE", 288, 300)
-        ],
-        "matcher": lambda line: len(line) > 4 and line[1:3] == '13' and line[3:5] == '03',
-        "display_name": "Contract Underlying Asset"
-    },
-    
-    "contract_record": {
-        "layout": [
-            ("SUBMITTERCODE", 0, 1), ("RECORDTYPE", 1, 3), ("SEQUENCENUMBER", 3, 5), ("CONTRACTNUMBER", 5, 35),
-            ("CUSIPNUMBER", 35, 44), ("CONTRACTSTATUS", 44, 46), ("ENDRECEIVINGCOMPANYID", 46, 66),
-            ("ENDRECEIVINGCOMPANYIDQUALIFIER", 66, 68), ("GROUPNUMBER", 68, 98), ("ORIGINALCONTRACTNUMBER", 98, 128),
-            ("DISTRIBUTORSACCOUNTID", 128, 158), ("IRSQUALIFICATIONCODE", 158, 162), ("PRODUCTTYPECODE", 162, 165),
-            ("COMMISSIONOPTION", 165, 169), ("FEEBASEDADVISORYINDICATOR", 169, 170), ("INHERITEDPAYOUTTIMINGCHOICE", 170, 171),
-            ("INVESTMENTONLYINDICATOR", 171, 172), ("COMMISSIONEXTENSION", 175, 185), ("ERISAINDICATOR", 185, 186),
-            ("CONTRACTSTATE", 186, 188), ("FUNDTRANSFERSRESTRICTIONINDICATOR", 188, 189), ("FUNDTRANSFERSRESTRICTIONREASON", 189, 191),
-            ("NONASSIGNABILITYINDICATOR", 191, 192), ("LIFETERMDURATION", 192, 194), ("DIVIDENDOPTION", 194, 196),
-            ("QLACINDICATOR", 196, 197), ("MVAINDICATOR", 197, 198), ("PRODUCTSHARECLASS", 198, 200),
-            ("COMMISSIONSCHEDULEIDENTIFIER", 200, 220), ("CONTRACTFEESINCLUDED", 220, 221), ("PRIORCARRIERPROCESSINGLOCATION", 221, 231),
-            ("REJECTCODE", 288, 300)
-        ],
-        "matcher": lambda line: len(line) > 4 and line[1:3] == '13' and line[3:5] == '01',
-        "display_name": "Contract Record"
-    },
-    
-    "contract_index_loop": {
-        "layout": [
-            ("SUBMITTERCODE", 0, 1), ("RECORDTYPE", 1, 3), ("SEQUENCENUMBER", 3, 5), ("CONTRACTNUMBER", 5, 35),
-            ("CUSIPFUNDID", 35, 54), ("INDEXDURATIONVALUE", 54, 70), ("INDEXDURATIONSTARTDATE", 70, 78),
-            ("INDEXDURATIONENDDATE", 78, 86), ("INDEXTERMMATURITYDATE", 86, 94), ("INDEXCREDITINGMETHOD", 94, 95),
-            ("INDEXCREDITINGMODE", 95, 98), ("INDEXCREDITINGMODEQUALIFIER", 98, 99), ("INDEXOPTIONPERIOD", 99, 102),
-            ("INDEXTYPE", 102, 103), ("INDEXDURATIONRATE1", 103, 113), ("INDEXDURATIONRATETYPE1", 113, 115),
-            ("INDEXDURATIONRATE2", 115, 125), ("INDEXDURATIONRATETYPE2", 125, 127),
-            ("INDEXDURATIONRATE3", 127, 137), ("INDEXDURATIONRATETYPE3", 137, 139),
-            ("INDEXDURATIONRATE4", 139, 149), ("INDEXDURATIONRATETYPE4", 149, 151),
-            ("INDEXDURATIONRATE5", 151, 161), ("INDEXDURATIONRATETYPE5", 161, 163),
-            ("INDEXDURATIONRATE6", 163, 173), ("INDEXDURATIONRATETYPE6", 173, 175),
-            ("INDEXOPTIONEFFECTIVEDATE", 175, 183), ("INDEXOPTIONBASEVALUE", 183, 199),
-            ("DAILYTRACKINGVALUE", 199, 215), ("LOCKEXECUTIONDATE", 215, 223),
-            ("LOCKEXECUTIONINDICATOR", 223, 224), ("TRANSFERWINDOWSTARTDATE", 224, 232),
-            ("TRANSFERWINDOWENDDATE", 232, 240), ("GROUPINGID", 240, 244), ("CARRIERFUNDLEVELFEE", 244, 249),
-            ("CARRIERFUNDLEVELFEEQUALIFIER", 249, 251), ("REJECTCODE", 288, 300)
-        ],
-        "matcher": lambda line: len(line) > 4 and line[1:3] == '13' and line[3:5] == '14',
-        "display_name": "Contract Index Loop"
-    },
-    
-    "contract_band_guaranteed_loop": {
-        "layout": [
-            ("SUBMITTERCODE", 0, 1), ("RECORDTYPE", 1, 3), ("SEQUENCENUMBER", 3, 5), ("CONTRACTNUMBER", 5, 35),
-            ("CUSIPFUNDID", 35, 54), ("DEPOSITGUARANTEEDSTARTDATE", 54, 62), ("DEPOSITGUARANTEEDENDDATE", 62, 70),
-            ("DEPOSITGUARANTEEDMATURITYDATE", 70, 78), ("DEPOSITGUARANTEEDRATE1", 78, 88),
-            ("DEPOSITGUARANTEEDRATETYPE1", 88, 90), ("DEPOSITGUARANTEEDUNITS", 90, 108),
-            ("DEPOSITGUARANTEEDPERIODFREQUENCYCODE", 108, 110), ("DEPOSITGUARANTEEDPERIODNUMBER", 110, 120),
-            ("DEPOSITGUARANTEEDVALUE", 120, 136), ("DEPOSITGUARANTEEDRATE2", 136, 146),
-            ("DEPOSITGUARANTEEDRATETYPE2", 146, 148), ("DEPOSITGUARANTEEDRATE3", 148, 158),
-            ("DEPOSITGUARANTEEDRATETYPE3", 158, 160), ("DEPOSITGUARANTEEDRATE4", 160, 170),
-            ("DEPOSITGUARANTEEDRATETYPE4", 170, 172), ("DEPOSITGUARANTEEDRATE5", 172, 182),
-            ("DEPOSITGUARANTEEDRATETYPE5", 182, 184), ("DEPOSITGUARANTEEDRATE6", 184, 194),
-            ("DEPOSITGUARANTEEDRATETYPE6", 194, 196), ("GROUPINGID", 236, 240), ("REJECTCODE", 288, 300)
-        ],
-        "matcher": lambda line: len(line) > 4 and line[1:3] == '13' and line[3:5] == '04',
-        "display_name": "Contract Band Guaranteed Loop"
-    },
-    
-    "contract_agent_record": {
-        "layout": [
-            ("SUBMITTERCODE", 0, 1), ("RECORDTYPE", 1, 3), ("SEQUENCENUMBER", 3, 5), ("CONTRACTNUMBER", 5, 35),
-            ("AGENTIDENTIFIER", 35, 55), ("AGENTIDENTIFIERQUALIFIER", 55, 57), ("AGENTROLE", 57, 59),
-            ("AGENTNONNATURALNAME", 59, 164), ("AGENTLASTNAME", 59, 94), ("AGENTFIRSTNAME", 94, 119),
-            ("AGENTMIDDLENAME", 119, 144), ("AGENTPREFIX", 144, 154), ("AGENTSUFFIX", 154, 164),
-            ("DISTRIBUTORASSIGNEDAGENTID", 164, 184), ("AGENTNATURALNONNATURALNAMEINDICATOR", 184, 185),
-            ("NATIONALPRODUCERNUMBER", 185, 195), ("FUNDTRANSFERAGENTAUTHINDICATOR", 195, 196),
-            ("CRDNUMBER", 196, 206), ("CARRIERASSIGNEDAGENTID", 206, 226), ("REJECTCODE", 288, 300)
-        ],
-        "matcher": lambda line: len(line) > 4 and line[1:3] == '13' and line[3:5] == '05',
-        "display_name": "Contract Agent Record"
-    },
-    
-    "contract_dates_record": {
-        "layout": [
-            ("SUBMITTERCODE", 0, 1), ("RECORDTYPE", 1, 3), ("SEQUENCENUMBER", 3, 5), ("CONTRACTNUMBER", 5, 35),
-            ("CONTRACTDATE1", 35, 43), ("CONTRACTDATEQUALIFIER1", 43, 46),
-            ("CONTRACTDATE2", 47, 55), ("CONTRACTDATEQUALIFIER2", 55, 58),
-            ("CONTRACTDATE3", 59, 67), ("CONTRACTDATEQUALIFIER3", 67, 70),
-            ("CONTRACTDATE4", 71, 79), ("CONTRACTDATEQUALIFIER4", 79, 82),
-            ("CONTRACTDATE5", 83, 91), ("CONTRACTDATEQUALIFIER5", 91, 94),
-            ("CONTRACTDATE6", 95, 103), ("CONTRACTDATEQUALIFIER6", 103, 106),
-            ("CONTRACTDATE7", 107, 115), ("CONTRACTDATEQUALIFIER7", 115, 118),
-            ("CONTRACTDATE8", 119, 127), ("CONTRACTDATEQUALIFIER8", 127, 130),
-            ("CONTRACTDATE9", 131, 139), ("CONTRACTDATEQUALIFIER9", 139, 142),
-            ("CONTRACTDATE10", 143, 151), ("CONTRACTDATEQUALIFIER10", 151, 154),
-            ("CONTRACTDATE11", 155, 163), ("CONTRACTDATEQUALIFIER11", 163, 166),
-            ("CONTRACTDATE12", 167, 175), ("CONTRACTDATEQUALIFIER12", 175, 178),
-            ("CONTRACTDATE13", 179, 187), ("CONTRACTDATEQUALIFIER13", 187, 190),
-            ("CONTRACTDATE14", 191, 199), ("CONTRACTDATEQUALIFIER14", 199, 202),
-            ("CONTRACTDATE15", 203, 211), ("CONTRACTDATEQUALIFIER15", 211, 214),
-            ("CONTRACTDATE16", 215, 223), ("CONTRACTDATEQUALIFIER16", 223, 226),
-            ("CONTRACTDATE17", 227, 235), ("CONTRACTDATEQUALIFIER17", 235, 238),
-            ("CONTRACTDATE18", 239, 247), ("CONTRACTDATEQUALIFIER18", 247, 250),
-            ("CONTRACTDATE19", 251, 259), ("CONTRACTDATEQUALIFIER19", 259, 262),
-            ("CONTRACTDATE20", 263, 271), ("CONTRACTDATEQUALIFIER20", 271, 274),
-            ("REJECTCODE", 288, 300)
-        ],
-        "matcher": lambda line: len(line) > 4 and line[1:3] == '13' and line[3:5] == '06',
-        "display_name": "Contract Dates Record"
-    },
-    
-    "contract_events_record": {
-        "layout": [
-            ("SUBMITTERCODE", 0, 1), ("RECORDTYPE", 1, 3), ("SEQUENCENUMBER", 3, 5), ("CONTRACTNUMBER", 5, 35),
-            ("EVENTPERIODTYPE1", 35, 38), ("EVENTTOTALAMOUNT1", 38, 54), ("EVENTTYPECODE1", 54, 57), ("GROSSNETINDICATOR1", 57, 58),
-            ("EVENTPERIODTYPE2", 59, 62), ("EVENTTOTALAMOUNT2", 62, 78), ("EVENTTYPECODE2", 78, 81), ("GROSSNETINDICATOR2", 81, 82),
-            ("EVENTPERIODTYPE3", 83, 86), ("EVENTTOTALAMOUNT3", 86, 102), ("EVENTTYPECODE3", 102, 105), ("GROSSNETINDICATOR3", 105, 106),
-            ("EVENTPERIODTYPE4", 107, 110), ("EVENTTOTALAMOUNT4", 110, 126), ("EVENTTYPECODE4", 126, 129), ("GROSSNETINDICATOR4", 129, 130),
-            ("EVENTPERIODTYPE5", 131, 134), ("EVENTTOTALAMOUNT5", 134, 150), ("EVENTTYPECODE5", 150, 153), ("GROSSNETINDICATOR5", 153, 154),
-            ("NEXTEVENTDATE1", 154, 162), ("NEXTEVENTDATE2", 162, 170), ("NEXTEVENTDATE3", 170, 178),
-            ("NEXTEVENTDATE4", 178, 186), ("NEXTEVENTDATE5", 186, 194), ("REJECTCODE", 288, 300)
-        ],
-        "matcher": lambda line: len(line) > 4 and line[1:3] == '13' and line[3:5] == '07',
-        "display_name": "Contract Events Record"
-    },
-    
-    "contract_party_record": {
-        "layout": [
-            ("SUBMITTERCODE", 0, 1), ("RECORDTYPE", 1, 3), ("SEQUENCENUMBER", 3, 5), ("CONTRACTNUMBER", 5, 35),
-            ("PARTYNONNATURALNAME", 35, 140), ("PARTYLASTNAME", 36, 70), ("PARTYMIDDLENAME", 96, 120), ("PARTYFIRSTNAME", 71, 95),
-            ("PARTYROLE", 140, 142), ("PARTYID", 142, 162), ("PARTYIDQUALIFIER", 162, 164),
-            ("PARTYDATEOFBIRTH", 164, 172), ("PARTYNONNATURALDATE", 164, 172), ("PARTYNONNATURALDATEQUALIFIER", 172, 175),
-            ("PARTYNATURALINDICATOR", 175, 176), ("CONTRACTPARTYROLEQUALIFIER", 176, 177), ("IMPAIREDRISK", 177, 178),
-            ("TRUSTREVOCABILITYINDICATOR", 178, 179), ("PARTYGENDER", 179, 180), ("BENEFICIARYAMOUNTQUANTITY", 180, 196),
-            ("BENEFICIARYQUANTITYQUALIFIER", 196, 198), ("BENEFICIARYQUANTITYPERCENT", 198, 208),
-            ("BENEFICIARYDISTRIBUTIONOPTION", 208, 209), ("UNDERWRITINGRISKCLASS", 209, 239),
-            ("REJECTCODE", 288, 300)
-        ],
-        "matcher": lambda line: len(line) > 4 and line[1:3] == '13' and line[3:5] == '09',
-        "display_name": "Contract Party Record"
-    },
-    
-    "contract_party_address_record": {
-        "layout": [
-            ("SUBMITTERCODE", 0, 1), ("RECORDTYPE", 1, 3), ("SEQUENCENUMBER", 3, 5), ("CONTRACTNUMBER", 5, 35),
-            ("PARTYROLE", 35, 37), ("PARTYADDRESSLINE1", 37, 72), ("PARTYADDRESSLINE2", 72, 107),
-            ("PARTYCITY", 107, 137), ("PARTYSTATE", 137, 139), ("PARTYPOSTALCODE", 139, 154),
-            ("PARTYCOUNTRYCODE", 154, 157), ("PARTYADDRESSLINE3", 157, 192), ("PARTYADDRESSLINE4", 192, 227),
-            ("PARTYADDRESSLINE5", 227, 262), ("FOREIGNADDRESSINDICATOR", 262, 263),
-            ("REJECTCODE", 288, 300)
-        ],
-        "matcher": lambda line: len(line) > 4 and line[1:3] == '13' and line[3:5] == '10',
-        "display_name": "Contract Party Address Record"
-    },
-    
-    "Contract_annuitization_payout_record": {
-        "layout": [
-            ("SUBMITTERCODE", 0, 1), ("RECORDTYPE", 1, 3), ("SEQUENCENUMBER", 3, 5), ("CONTRACTNUMBER", 5, 35),
-            ("ANNUITYPAYOUTAMOUNT", 35, 51), ("ANNUITYPAYMENTAMOUNTQUALIFIER", 51, 54), ("ANNUITYFREQUENCYCODE", 54, 57),
-            ("PAYOUTOPTION", 57, 59), ("LIVESTYPE", 59, 60), ("PAYOUTTYPE", 60, 61), ("CERTAINPERIOD", 61, 65),
-            ("INCREASEPERCENTAGE", 65, 75), ("ASSUMEDINTERESTRATE", 75, 85), ("LEVELIZATIONINDICATOR", 85, 86),
-            ("PRIMARYSURVIVORADJUSTMENTTYPE", 86, 87), ("PRIMARYSURVIVORADJUSTMENTPERCENTAGE", 87, 97),
-            ("JOINTSURVIVORADJUSTMENTTYPE", 97, 98), ("JOINTSURVIVORADJUSTMENTPERCENTAGE", 98, 108),
-            ("EXCLUSIONVALUE", 108, 124), ("EXCLUSIONINDICATOR", 124, 126), ("CERTAINPERIODQUALIFIER", 126, 129),
-            ("LIQUIDITYOPTION", 129, 131), ("LIQUIDITYWAITINGPERIOD", 131, 133), ("LIQUIDITYTRIGGEREVENT", 133, 135),
-            ("LIQUIDITYPARTIAL", 135, 136), ("PAYMENTSTARTDATE", 136, 144), ("PAYMENTENDDATE", 144, 152),
-            ("RETURNOFPREMIUMPERCENTAGE", 152, 162), ("PAYOUTCHANGEDATE", 162, 170), ("PAYOUTCHANGEAMOUNT", 170, 186),
-            ("PAYOUTCHANGEQUALIFIER", 186, 188), ("PAYOUTCHANGEDIRECTIONINDICATOR", 188, 189), ("PAYOUTCHANGEFREQUENCY", 189, 191),
-            ("REJECTCODE", 288, 300)
-        ],
-        "matcher": lambda line: len(line) > 4 and line[1:3] == '13' and line[3:5] == '11',
-        "display_name": "Contract Annuitization Payout Record"
-    },
-    
-    "contract_party_communication_record": {
-        "layout": [
-            ("SYSTEMCODE", 0, 1), ("RECORDTYPE", 1, 3), ("SEQUENCENUMBER", 3, 5), ("CONTRACTNUMBER", 5, 35),
-            ("CONTRACTENTITYTELEPHONETYPE1", 35, 37), ("CONTRACTENTITYTELEPHONENUMBER1", 37, 49), ("CONTRACTENTITYTELEPHONEEXTENSION1", 49, 55),
-            ("CONTRACTENTITYTELEPHONETYPE2", 55, 57), ("CONTRACTENTITYTELEPHONENUMBER2", 57, 69), ("CONTRACTENTITYTELEPHONEEXTENSION2", 69, 75),
-            ("CONTRACTENTITYTELEPHONETYPE3", 75, 77), ("CONTRACTENTITYTELEPHONENUMBER3", 77, 89), ("CONTRACTENTITYTELEPHONEEXTENSION3", 89, 95),
-            ("CONTRACTENTITYEMAILADDRESS1", 95, 175), ("CONTRACTENTITYEMAILQUALIFIER1", 175, 177),
-            ("CONTRACTENTITYEMAILADDRESS2", 177, 257), ("CONTRACTENTITYEMAILQUALIFIER2", 257, 259),
-            ("ELECTRONICDELIVERYINDICATOR", 259, 260), ("REJECTCODE", 288, 300)
-        ],
-        "matcher": lambda line: len(line) > 4 and line[1:3] == '13' and line[3:5] == '12',
-        "display_name": "Contract Party Communication Record"
-    },
-    
-    "contract_service_feature_record": {
-        "layout": [
-            ("SUBMITTERSCODE", 0, 1), ("RECORDTYPE", 1, 3), ("SEQUENCENUMBER", 3, 5), ("CONTRACTNUMBER", 5, 35),
-            ("BENEFITACTIVATIONINDICATOR", 35, 36), ("BENEFITACTIVATIONDATE", 36, 44), ("CREDITINGPERIODEXPIRATIONDATE", 44, 52),
-            ("MARKETROLLUPDATE", 52, 60), ("MARKETROLLUPFREQUENCY", 60, 61), ("SERVICEFEATUREVALUE", 74, 88),
-            ("SERVICEFEATUREVALUEQUALIFIER", 88, 90), ("SERVICEFEATUREFREQUENCY", 90, 91), ("SERVICEFEATURESTARTDATE", 92, 100),
-            ("SERVICEFEATURESTOPDATE", 100, 108), ("EXPENSETYPE1", 108, 110), ("EXPENSEVALUE1", 110, 116), ("EXPENSEQUALIFIER1", 116, 118),
-            ("EXPENSETYPE2", 118, 120), ("EXPENSEVALUE2", 120, 126), ("EXPENSEQUALIFIER2", 126, 128),
-            ("LIVESTYPE", 128, 129), ("BENEFITREDUCTIONMETHOD", 129, 130), ("SERVICEFEATURENAME", 134, 169),
-            ("SERVICEFEATUREPRODUCTCODE", 169, 189), ("SERVICEFEATUREPROGRAMTYPE", 189, 190),
-            ("TYPECODE1", 190, 194), ("SUBTYPECODE1", 194, 198), ("TYPECODE2", 198, 202), ("SUBTYPECODE2", 202, 206),
-            ("TYPECODE3", 206, 210), ("SUBTYPECODE3", 210, 214), ("SURRENDERCHARGESCHEDULE", 238, 288),
-            ("REJECTCODE", 288, 300)
-        ],
-        "matcher": lambda line: len(line) > 4 and line[1:3] == '13' and line[3:5] == '15',
-        "display_name": "Contract Service Feature Record"
-    }
-}
+# Record layouts, classifier and compiled extractors come from the Spark-free dtcc_parser package.
+# configs/config.yaml replaces the built-in layouts when it is reachable; YAML parsing and
+# validation run once per config content hash and later runs load the cached result.
+if not os.path.exists(LAYOUT_CONFIG_PATH):
+    print(f"  Layout config {LAYOUT_CONFIG_PATH} not found - using built-in layouts")
+ALL_LAYOUTS = get_layouts(LAYOUT_CONFIG_PATH)
+LAYOUT_CONFIG_HASH = None if ALL_LAYOUTS.key == "builtin" else ALL_LAYOUTS.key
+LAYOUTS = ALL_LAYOUTS.select(RECORD_TYPE_FILTER, COLUMN_FILTER)
+
+RECORD_CONFIGS = LAYOUTS.record_configs
+RECORD_CLASSIFIER = LAYOUTS.classifier
+COMPILED_LAYOUTS = LAYOUTS.compiled  # Selected record types only
 
 print(f"  Loaded {len(RECORD_CONFIGS)} record configurations")
 for config_name in RECORD_CONFIGS.keys():
     print(f"      {config_name}")
+print(f"  Classifier: {len(RECORD_CLASSIFIER.full_keys)} record/sequence keys, "
+      f"{len(RECORD_CLASSIFIER.header_keys)} header-only keys")
+if LAYOUTS.is_selection:
+    print(f"  Parsing {len(COMPILED_LAYOUTS)} record types: {', '.join(COMPILED_LAYOUTS)}")
+    for config_name, columns in LAYOUTS.columns.items():
+        print(f"      {config_name}: {', '.join(columns)}")
 
 # COMMAND ----------
 
-# Core parsing functions (UNCHANGED)
-def extract_file_drop_date(source_file):
-    match = re.search(r'\.D(\d{6})\.', source_file)
-    if match:
-        date_str = match.group(1)
-        try:
-            return datetime.strptime(date_str, "%y%m%d").date()
-        except ValueError:
-            return None
-    return None
+# Spark schemas for typed output and file reading
+def typed_spark_type(field_type):
+    from pyspark.sql.types import DateType, DecimalType, LongType
+    kind, scale, width = field_type
+    if kind == "date":
+        return DateType()
+    if kind == "int":
+        return LongType()
+    return DecimalType(width, scale)
 
-def parse_line_to_record(line, layout):
-    record = {}
-    for col, start, end in layout:
-        if start < len(line):
-            record[col] = line[start:end].strip()
+def typed_spark_schema(pandas_df, field_types):
+    """Explicit schema for a typed frame - all-null typed columns cannot be inferred"""
+    from pyspark.sql.types import DateType, LongType, StringType, StructField, StructType, TimestampType
+    fields = []
+    for column in pandas_df.columns:
+        if column in field_types:
+            data_type = typed_spark_type(field_types[column])
+        elif column in ("FILEROWNUMBER", "FILEHEADERGROUPNUMBER"):
+            data_type = LongType()
+        elif column in ("LOADDATE", "MODIFIEDDATE"):
+            data_type = TimestampType()
+        elif column == "FILEDROPDAY":
+            data_type = DateType()
         else:
-            record[col] = ""
-    return record
+            data_type = StringType()
+        fields.append(StructField(column, data_type, True))
+    return StructType(fields)
 
-def read_mro_file_content(file_path):
-    print(f" Reading file: {os.path.basename(file_path)}")
+def _local_file_path(file_path):
+    """Map local, file: and dbfs: paths to a filesystem path; None for remote storage URIs"""
+    if file_path.startswith("dbfs:/"):
+        return "/dbfs/" + file_path[len("dbfs:/"):].lstrip("/")
+    if file_path.startswith("file:"):
+        return file_path[len("file:"):]
+    if "://" in file_path:
+        return None
+    return file_path
+
+def iter_mro_lines(file_path, buffer_size=None, metrics=None, digest=None):
+    """Stream non-empty lines in fixed-size blocks so memory stays flat as files grow.
     
+    With digest (a ContentDigest) the source bytes are hashed as they are read, for the processing ledger.
+    """
+    buffer_size = buffer_size or READ_BUFFER_SIZE
+    local_path = _local_file_path(file_path)
+    compression = compression_of(file_path)
+    print(f" Reading file: {os.path.basename(file_path)}" + (f" ({compression})" if compression else ""))
+    
+    if compression is not None:
+        # gzip/zstd sources are decoded as they stream in, local or remote; ratio and codec time go to the metrics
+        stream = open_input_stream(file_path)
+        yield from iter_compressed_lines(stream if digest is None else digest.wrap(stream), compression, buffer_size, metrics)
+        return
+    
+    if local_path is None and digest is not None:
+        # Spark's line reader never shows the driver the file's bytes - read them through one Hadoop stream instead
+        stream = digest.wrap(open_input_stream(file_path))
+        try:
+            yield from iter_stream_lines(stream, buffer_size)
+        finally:
+            stream.close()
+        return
+    
+    if local_path is None:
+        # ABFSS/WASBS: pull one partition at a time instead of collecting the whole file
+        for row in spark.read.text(file_path).toLocalIterator(prefetchPartitions=True):
+            if row.value is not None and row.value.strip():
+                yield row.value
+        return
+    
+    # Locally staged and DBFS-FUSE files are memory-mapped and decoded a window at a time
+    yield from iter_mmap_lines(local_path, buffer_size, digest)
+
+class _HadoopInputStream:
+    """Positioned reads from ABFSS/WASBS through the Hadoop FileSystem API"""
+
+    def __init__(self, path, offset=0):
+        hadoop_path = spark._jvm.org.apache.hadoop.fs.Path(path)
+        hadoop_fs = hadoop_path.getFileSystem(spark._jsparkSession.sessionState().newHadoopConf())
+        self._remaining = hadoop_fs.getFileStatus(hadoop_path).getLen() - offset
+        self._stream = hadoop_fs.open(hadoop_path)
+        if offset:
+            self._stream.seek(offset)
+
+    def read(self, size):
+        size = min(size, self._remaining)
+        if size <= 0:
+            return b""
+        # Java byte[] results cross py4j as bytes
+        block = spark._jvm.org.apache.commons.io.IOUtils.toByteArray(self._stream, size)
+        self._remaining -= len(block)
+        return bytes(block)
+
+    def close(self):
+        self._stream.close()
+
+def open_input_stream(path, offset=0):
+    """Binary read stream positioned at offset, for local/DBFS-FUSE paths or remote storage URIs"""
+    local_path = _local_file_path(path)
+    if local_path is None:
+        return _HadoopInputStream(path, offset)
+    stream = open(local_path, "rb")
+    stream.seek(offset)
+    return stream
+
+def read_mro_file_content(file_path):
+    """Materialize all non-empty lines - for small files and ad-hoc checks only"""
     try:
-        df = spark.read.text(file_path)
-        lines = df.collect()
-        content_lines = [row.value for row in lines if row.value is not None]
+        content_lines = list(iter_mro_lines(file_path))
         print(f"     Read {len(content_lines)} lines")
         return content_lines
     except Exception as e:
@@ -389,9 +490,107 @@ def read_mro_file_content(file_path):
 
 # COMMAND ----------
 
-# Enhanced parsing function (UNCHANGED)
-def parse_mro_file_enhanced(file_path, file_name):
-    """Enhanced MRO parsing with all record types"""
+# Extractor benchmark - run manually to compare compiled layouts against parse_line_to_record
+def benchmark_layout_extractors(lines, repeat=3):
+    """Time per-record-type extraction for parse_line_to_record vs CompiledLayout"""
+    lines_by_type = {}
+    for line in lines:
+        record_type = RECORD_CLASSIFIER.classify(line)
+        if record_type is not None:
+            lines_by_type.setdefault(record_type, []).append(line)
+
+    results = {}
+    for record_type, type_lines in lines_by_type.items():
+        if record_type not in COMPILED_LAYOUTS:
+            continue
+        compiled = COMPILED_LAYOUTS[record_type]
+        layout = compiled.layout
+
+        for line in type_lines:
+            if compiled.record(line) != parse_line_to_record(line, layout):
+                raise AssertionError(f"Compiled extractor mismatch for {record_type}: {line!r}")
+
+        loop_time = min(_time_extractor(lambda line: parse_line_to_record(line, layout), type_lines) for _ in range(repeat))
+        record_time = min(_time_extractor(compiled.record, type_lines) for _ in range(repeat))
+        values_time = min(_time_extractor(compiled.values, type_lines) for _ in range(repeat))
+
+        results[record_type] = {
+            "lines": len(type_lines),
+            "fields": len(layout),
+            "loop_seconds": loop_time,
+            "compiled_record_seconds": record_time,
+            "compiled_values_seconds": values_time,
+            "record_speedup": loop_time / record_time if record_time > 0 else 0,
+            "values_speedup": loop_time / values_time if values_time > 0 else 0
+        }
+        print(f"{RECORD_CONFIGS[record_type]['display_name']}: {len(type_lines):,} lines, {len(layout)} fields, "
+              f"record {results[record_type]['record_speedup']:.2f}x, values {results[record_type]['values_speedup']:.2f}x")
+
+    return results
+
+def _time_extractor(extract, lines):
+    start = time.perf_counter()
+    for line in lines:
+        extract(line)
+    return time.perf_counter() - start
+
+# COMMAND ----------
+
+# Columnar record accumulation (dtcc_parser.ColumnarRecordSink) handing whole columns to Spark
+class SparkRecordSink(ColumnarRecordSink):
+    """Columnar sink over this notebook's layouts whose finish() returns Spark DataFrames"""
+
+    def __init__(self, file_name, load_time, file_drop_date, layouts=None):
+        super().__init__(file_name, load_time, file_drop_date, layouts or LAYOUTS, TYPED_OUTPUT, UNKNOWN_DETAIL)
+
+    def drain_to_spark(self):
+        """Convert every record type to a Spark DataFrame, releasing each type's buffers as it goes"""
+        spark_dataframes = {}
+        for record_type, pandas_df in self.iter_frames():
+            schema = typed_spark_schema(pandas_df, self.field_types(record_type)) if self.typed else None
+            spark_dataframes[record_type] = spark.createDataFrame(pandas_df, schema)
+        return spark_dataframes
+
+    def finish(self):
+        """Return (spark_dataframes, unknown_df) like the original parser"""
+        build_start = datetime.now()
+        spark_dataframes = self.drain_to_spark()
+        build_time = (datetime.now() - build_start).total_seconds()
+        print(f"  Built {len(spark_dataframes)} DataFrames in {build_time:.2f}s")
+        self.report_invalid_values()
+        
+        unknown_df = None
+        if self.unknown_rows:
+            unknown_df = spark.createDataFrame(self.unknown_to_pandas())
+            self.unknown_rows = []
+        return spark_dataframes, unknown_df
+
+# COMMAND ----------
+
+# Unknown-layout accounting (dtcc_parser.UnknownLayoutSummary) - counts per record code go to the console,
+# the metrics JSON and the processing log instead of one output row per unmatched line
+def report_unknown_layouts(summary, metrics):
+    """Print the per-code counts and samples and keep them in the file's metrics"""
+    if summary.total:
+        print(f"    Unknown layouts: {summary.total:,} lines in {len(summary.counts)} record codes"
+              + (" (detail in unknown_layouts)" if UNKNOWN_DETAIL else ""))
+        for description in summary.describe()[:10]:
+            print(f"      {description}")
+        if len(summary.counts) > 10:
+            print(f"      ... and {len(summary.counts) - 10} more record codes")
+    metrics.unknown_layouts = summary.to_dict()
+
+# Enhanced parsing function - lines are parsed by dtcc_parser.parse_mro_lines
+def parse_mro_file_enhanced(file_path, file_name, sink_factory=None, metrics=None, record_types=None, columns=None,
+                            on_contracts=None, digest=None):
+    """Enhanced MRO parsing - returns whatever the sink's finish() produces.
+
+    record_types/columns narrow the widget selection further for this call (see RecordLayouts.select).
+    With on_contracts, 13xx records are also grouped per contract as they are parsed (dtcc_parser.ContractIndex)
+    and on_contracts(contracts) runs once the sink has finished. digest hashes the source as it is read (iter_mro_lines).
+    """
+    metrics = metrics or StageMetrics(file_name)
+    layouts = LAYOUTS.select(record_types, columns)
     
     file_drop_date = extract_file_drop_date(file_name)
     now_time = datetime.now()
@@ -400,189 +599,479 @@ def parse_mro_file_enhanced(file_path, file_name):
     print(f"File drop date: {file_drop_date}")
     
     try:
-        # Read file content
-        lines = read_mro_file_content(file_path)
-        non_empty_lines = [line for line in lines if line.strip()]
-        print(f"  Processing {len(non_empty_lines)} non-empty lines")
-        
-        # Initialize data collection
-        parsed_data = {}
-        unknown_layouts = []
-        
-        header_group_number = 0
-        current_header_participant = None
-        current_contra_record = None
-        
-        # Process each line
-        for file_row_number, line in enumerate(non_empty_lines, 1):
-            matched = False
-            
-            # Check for header record
-            if len(line) > 2 and line[1:3] == "10":
-                header_group_number += 1
-                current_header_participant = line[3:7].strip() if len(line) > 6 else ""
-            
-            # Try to match against each record type
-            for record_type, config in RECORD_CONFIGS.items():
-                try:
-                    if config["matcher"](line):
-                        matched = True
-                        
-                        # Parse the record
-                        record = parse_line_to_record(line, config["layout"])
-                        
-                        # Add metadata
-                        record["FILEROWNUMBER"] = file_row_number
-                        record["FILEHEADERGROUPNUMBER"] = header_group_number
-                        record["SUBMITTINGPARTICIPANTNUMBER"] = current_header_participant or ""
-                        record["SOURCEFILENAME"] = file_name
-                        record["LOADDATE"] = now_time
-                        record["MODIFIEDDATE"] = now_time
-                        record["FILEDROPDAY"] = file_drop_date
-                        
-                        # Store contra record for enrichment
-                        if record_type == "contra_record":
-                            current_contra_record = record.copy()
-                        
-                        # Enrich contract records with contra data
-                        elif record_type == "contract_record" and current_contra_record:
-                            enrich_fields = [
-                                "CONTRAPARTICIPANTNUMBER", "ASSOCIATEDFIRMID",
-                                "ASSOCIATEDFIRMSUBMITTEDCONTRACTCOUNT",
-                                "ASSOCIATEDFIRMDELIVEREDCONTRACTCOUNT",
-                                "IPSEVENTCODE", "IPSSTAGECODE"
-                            ]
-                            for field in enrich_fields:
-                                record[f"CONTRA_{field}"] = current_contra_record.get(field, "")
-                        
-                        # Collect the record
-                        if record_type not in parsed_data:
-                            parsed_data[record_type] = []
-                        parsed_data[record_type].append(record)
-                        break
-                        
-                except Exception as e:
-                    print(f"Error processing line {file_row_number}: {e}")
-                    continue
-            
-            if not matched:
-                unknown_layouts.append({
-                    "FILENAME": file_name,
-                    "FILEROWNUMBER": file_row_number,
-                    "RECORDTYPE": line[1:3] if len(line) > 2 else "",
-                    "DETAIL": line[:80] if len(line) > 80 else line,
-                    "LOADDATE": now_time
-                })
-        
-        # Convert to Spark DataFrames
-        spark_dataframes = {}
-        for record_type, records in parsed_data.items():
-            if records:
-                pandas_df = pd.DataFrame(records)
-                spark_df = spark.createDataFrame(pandas_df)
-                spark_dataframes[record_type] = spark_df
-                
-                display_name = RECORD_CONFIGS[record_type]['display_name']
-                print(f"{display_name}: {len(records):,} records")
+        # Columnar buffers by default; a streaming sink writes outputs as records arrive
+        sink = (sink_factory or SparkRecordSink)(file_name, now_time, file_drop_date, layouts=layouts)
+        finish_stage = "frame_build" if isinstance(sink, ColumnarRecordSink) else "write_flush"
         
-        # Handle unknown layouts
-        unknown_df = None
-        if unknown_layouts:
-            unknown_pandas_df = pd.DataFrame(unknown_layouts)
-            unknown_df = spark.createDataFrame(unknown_pandas_df)
-            print(f"    Unknown layouts: {len(unknown_layouts):,} records")
+        # Hash index on (header group, CONTRACTNUMBER) filled line by line alongside the sink
+        contracts = None
+        if on_contracts is not None:
+            contracts = ContractIndex(file_name, now_time, file_drop_date, layouts, TYPED_OUTPUT)
+            sink = contracts.wrap(sink)
+        
+        classify_start = datetime.now()
+        state = parse_mro_lines(iter_mro_lines(file_path, metrics=metrics, digest=digest), sink, metrics=metrics)
+        file_row_number = state["file_row_number"]
+        
+        classify_time = (datetime.now() - classify_start).total_seconds()
+        lines_per_second = file_row_number / classify_time if classify_time > 0 else 0
+        print(f"  Processed {file_row_number:,} non-empty lines")
+        print(f"  Classified and parsed {file_row_number:,} lines in {classify_time:.2f}s ({lines_per_second:,.0f} lines/sec)")
+        
+        for record_type, count in sink.counts().items():
+            display_name = RECORD_CONFIGS[record_type]['display_name']
+            print(f"{display_name}: {count:,} records")
+        report_unknown_layouts(sink.unknown, metrics)
+        
+        # Columnar sinks build their DataFrames here; streaming sinks flush their last buffers
+        with metrics.stage(finish_stage):
+            result = sink.finish()
+        if contracts is not None:
+            print(f"  Grouped {len(contracts):,} contracts")
+            on_contracts(contracts)
+        return result
+        
+    except Exception as e:
+        print(f"Error parsing file: {e}")
+        raise
+
+# COMMAND ----------
+
+# Parallel parsing engine - the driver cuts the file at submitting header/contra boundaries and a process pool
+# parses the chunks (dtcc_parser.parse_lines_parallel)
+def parse_mro_file_parallel(file_path, file_name, workers=None, metrics=None, digest=None):
+    """Parse one file across a process pool; output matches parse_mro_file_enhanced row for row"""
+    workers = workers or PARALLEL_WORKERS
+    metrics = metrics or StageMetrics(file_name)
+    file_drop_date = extract_file_drop_date(file_name)
+    now_time = datetime.now()
+    
+    print(f"\n Parsing: {file_name} ({workers} worker processes)")
+    print(f"File drop date: {file_drop_date}")
+    
+    sink = SparkRecordSink(file_name, now_time, file_drop_date)
+    
+    try:
+        classify_start = datetime.now()
+        lines = iter_mro_lines(file_path, metrics=metrics, digest=digest)
+        file_row_number, chunk_count = parse_lines_parallel(lines, sink, workers, metrics=metrics)
+        
+        classify_time = (datetime.now() - classify_start).total_seconds()
+        lines_per_second = file_row_number / classify_time if classify_time > 0 else 0
+        print(f"  Processed {file_row_number:,} non-empty lines in {chunk_count} chunks")
+        print(f"  Classified and parsed {file_row_number:,} lines in {classify_time:.2f}s ({lines_per_second:,.0f} lines/sec)")
         
+        for record_type, count in sink.counts().items():
+            display_name = RECORD_CONFIGS[record_type]['display_name']
+            print(f"{display_name}: {count:,} records")
+        report_unknown_layouts(sink.unknown, metrics)
+        
+        with metrics.stage("frame_build"):
+            return sink.finish()
+        
+    except Exception as e:
+        print(f"Error parsing file: {e}")
+        raise
+
+# COMMAND ----------
+
+# Distributed parsing engine (dtcc_parser.parse_file_distributed) - classification, extraction and enrichment
+# run on the executors
+def parse_mro_file_distributed(file_path, file_name, metrics=None, on_release=None):
+    """MRO parsing with Spark column expressions - lines are never collected to the driver.
+    
+    on_release(release) receives the call that unpersists the cached lines, to run once the outputs are written.
+    """
+    metrics = metrics or StageMetrics(file_name)
+    
+    print(f"\n Parsing (distributed): {file_name}")
+    print(f"File drop date: {extract_file_drop_date(file_name)}")
+    
+    try:
+        spark_dataframes, unknown_df, unknown, _ = parse_file_distributed(
+            spark, file_path, file_name, LAYOUTS, TYPED_OUTPUT, UNKNOWN_DETAIL, metrics=metrics, on_release=on_release)
+        report_unknown_layouts(unknown, metrics)
         return spark_dataframes, unknown_df
         
     except Exception as e:
         print(f"Error parsing file: {e}")
         raise
 
+def parse_mro_file(file_path, file_name, metrics=None, on_contracts=None, on_release=None, digest=None):
+    """Parse an MRO file with the engine selected by the 'engine' widget (contract grouping: driver engine only).
+    
+    on_release(release) is called with a cleanup to run after the outputs are written (spark engine).
+    digest hashes the source as the driver reads it; the spark engine never reads it, so it stays incomplete.
+    """
+    if PARSING_ENGINE == "spark":
+        return parse_mro_file_distributed(file_path, file_name, metrics, on_release)
+    if PARSING_ENGINE == "parallel":
+        return parse_mro_file_parallel(file_path, file_name, metrics=metrics, digest=digest)
+    return parse_mro_file_enhanced(file_path, file_name, metrics=metrics, on_contracts=on_contracts, digest=digest)
+
+# COMMAND ----------
+
+# Storage I/O pool (dtcc_parser.StorageIO) - after parsing, the per-record-type writes, folder creation,
+# archive copy and log writes are latency-bound round trips to ADLS. They overlap on one bounded pool shared
+# by every file of the run, so batch files respect the same limit, and each call is retried with backoff.
+class DbutilsStorage:
+    """StorageIO backend over dbutils.fs - dtcc_parser.LocalStorage is its local stand-in"""
+
+    def mkdirs(self, path):
+        dbutils.fs.mkdirs(path)
+
+    def put(self, path, text):
+        dbutils.fs.put(path, text, overwrite=True)
+
+    def cp(self, source, destination):
+        dbutils.fs.cp(source, destination)
+
+    def mv(self, source, destination):
+        dbutils.fs.mv(source, destination)
+
+    def rm(self, path):
+        dbutils.fs.rm(path)
+
+STORAGE_IO = StorageIO(DbutilsStorage(), IO_CONCURRENCY, IO_RETRIES)
+
+def prepare_storage_folders(date_folder=None, output_subfolder=None):
+    """Create the date's archive and log folders (and the CSV output subfolder) while the file parses"""
+    folder_date = date_folder if date_folder else datetime.now().strftime("%Y-%m-%d")
+    STORAGE_IO.mkdirs(get_storage_path("processed", folder_date))
+    STORAGE_IO.mkdirs(get_storage_path("logs", folder_date))
+    if output_subfolder and OUTPUT_FORMAT == "csv" and not STREAMING_CSV:
+        STORAGE_IO.mkdirs(csv_output_base_path(output_subfolder))
+
+def report_storage_write(success_message, failure_message, future):
+    """Done-callback printing how a pooled write ended (success_message None = quiet) - failures are reported, not raised"""
+    error = future.exception()
+    if error is not None:
+        print(f"{failure_message}: {error}")
+    elif success_message:
+        print(success_message)
+
 # COMMAND ----------
 
 # Enhanced CSV save function - MODIFIED for ADF integration
+def csv_output_base_path(output_subfolder=None):
+    """parsed container root, or a date-organized subfolder for ADF runs"""
+    if output_subfolder:
+        return get_storage_path("parsed", output_subfolder)
+    return storage_root("parsed")
+
+def write_csv_content(csv_file_path, csv_content):
+    """Write CSV text, gzip/zstd-compressed when csv_compression is set; returns (file name, bytes written, codec stats)"""
+    if not CSV_COMPRESSION:
+        dbutils.fs.put(csv_file_path, csv_content, overwrite=True)
+        return os.path.basename(csv_file_path), len(csv_content.encode("utf-8")), None
+    
+    csv_file_path = with_compression_suffix(csv_file_path, CSV_COMPRESSION)
+    output = CompressedWriter(open_output_stream(csv_file_path), CSV_COMPRESSION)
+    output.write(csv_content.encode("utf-8"))
+    output.close()
+    stats = output.stats()
+    return os.path.basename(csv_file_path), stats['stored_bytes'], stats
+
+def save_csv_output(config_name, display_name, df, base_path, folder=()):
+    """Build one DataFrame's CSV text on this thread and queue its write on the storage I/O pool; returns a future
+    of its saved-file entry. Only the CSV text waits for the write - the pandas copy is released first.
+    """
+    print(f"Saving {config_name}.csv...")
+    write_start, cpu_start = datetime.now(), time.thread_time()
+    
+    # Convert to Pandas for easier CSV handling
+    pandas_df = df.toPandas()
+    record_count = len(pandas_df)
+    
+    # Create CSV content
+    csv_content = pandas_df.to_csv(index=False)
+    del pandas_df
+    build_cpu_seconds = time.thread_time() - cpu_start
+    
+    def write():
+        write_cpu_start = time.thread_time()
+        file_name, bytes_written, compression_stats = write_csv_content(f"{base_path}/{config_name}.csv", csv_content)
+        print(f"{display_name}: {record_count:,} records → {file_name}")
+        return {
+            'config_name': config_name,
+            'display_name': display_name,
+            'count': record_count,
+            'file_name': file_name,
+            'bytes_written': bytes_written,
+            'write_seconds': (datetime.now() - write_start).total_seconds(),
+            'write_cpu_seconds': build_cpu_seconds + time.thread_time() - write_cpu_start,
+            'compression': compression_stats
+        }
+    
+    # Save with exact config name - only the storage write is retried
+    return STORAGE_IO.submit(f"write {config_name}.csv", write, after=folder)
+
 def save_to_csv_enhanced(dataframes, unknown_df=None, output_subfolder=None):
-    """Save DataFrames to CSV using exact config names with optional subfolder"""
+    """Save DataFrames to CSV using exact config names with optional subfolder - storage writes overlap the next build"""
     
     print(f" Saving CSVs to parsed container...")
     
-    saved_files = []
-    
     # Determine output path - MODIFIED for ADF
+    base_path = csv_output_base_path(output_subfolder)
     if output_subfolder:
-        base_path = f"{PROTOCOL}://parsed@{STORAGE_ACCOUNT_NAME}.{ENDPOINT}/{output_subfolder}"
         print(f"  Using subfolder: {output_subfolder}")
-    else:
-        base_path = f"{PROTOCOL}://parsed@{STORAGE_ACCOUNT_NAME}.{ENDPOINT}"
     
-    # Create subfolder if specified
-    if output_subfolder:
+    # Create subfolder if specified - the writes wait for it
+    folder = (STORAGE_IO.mkdirs(base_path),) if output_subfolder else ()
+    
+    outputs = [(config_name, RECORD_CONFIGS[config_name]['display_name'], df) for config_name, df in dataframes.items()]
+    # Unknown layouts - only present when per-line detail was requested, and never empty
+    if unknown_df is not None:
+        outputs.append(('unknown_layouts', 'Unknown Layouts', unknown_df))
+    
+    # Frames are collected and rendered one at a time on this thread, so the driver holds one record type's pandas
+    # copy plus at most CSV_WRITES_IN_FLIGHT CSV texts waiting for storage, however many record types there are
+    writes = []
+    for config_name, display_name, df in outputs:
+        while sum(not write.done() for _, write in writes) >= CSV_WRITES_IN_FLIGHT:
+            wait([write for _, write in writes if not write.done()], return_when=FIRST_COMPLETED)
         try:
-            dbutils.fs.mkdirs(base_path)
-        except:
-            pass
+            writes.append((config_name, save_csv_output(config_name, display_name, df, base_path, folder)))
+        except Exception as e:
+            print(f"Error saving {config_name}: {e}")
     
-    # Save each DataFrame with exact config name
-    for config_name, df in dataframes.items():
+    saved_files = []
+    for config_name, write in writes:
         try:
-            print(f"Saving {config_name}.csv...")
-            
-            # Convert to Pandas for easier CSV handling
-            pandas_df = df.toPandas()
-            
-            # Create CSV content
-            csv_content = pandas_df.to_csv(index=False)
-            
-            # Save with exact config name
-            csv_file_path = f"{base_path}/{config_name}.csv"
-            dbutils.fs.put(csv_file_path, csv_content, overwrite=True)
-            
-            record_count = len(pandas_df)
-            display_name = RECORD_CONFIGS[config_name]['display_name']
-            print(f"{display_name}: {record_count:,} records → {config_name}.csv")
-            
-            saved_files.append({
-                'config_name': config_name,
-                'display_name': display_name,
-                'count': record_count,
-                'file_name': f"{config_name}.csv"
-            })
-            
+            saved_files.append(write.result())
         except Exception as e:
             print(f"Error saving {config_name}: {e}")
     
-    # Save unknown layouts
-    if unknown_df and unknown_df.count() > 0:
+    return saved_files
+
+# COMMAND ----------
+
+# Streaming CSV writer (dtcc_parser.StreamingCsvSink) - output streams for DBFS and remote storage
+class _HadoopOutputStream:
+    """Chunked writes to ABFSS/WASBS through the Hadoop FileSystem API"""
+
+    def __init__(self, path):
+        hadoop_path = spark._jvm.org.apache.hadoop.fs.Path(path)
+        # Session Hadoop conf includes the account keys set through spark.conf
+        hadoop_conf = spark._jsparkSession.sessionState().newHadoopConf()
+        self._stream = hadoop_path.getFileSystem(hadoop_conf).create(hadoop_path, True)
+
+    def write(self, data):
+        self._stream.write(bytearray(data))
+
+    def close(self):
+        self._stream.close()
+
+def open_output_stream(path):
+    """Binary write stream for local/DBFS-FUSE paths or remote storage URIs"""
+    local_path = _local_file_path(path)
+    if local_path is None:
+        return _HadoopOutputStream(path)
+    os.makedirs(os.path.dirname(local_path) or ".", exist_ok=True)
+    return open(local_path, "wb")
+
+def streaming_csv_sink(output_subfolder=None):
+    """Sink factory for parse_mro_file_enhanced that streams CSVs into the parsed container"""
+    return partial(StreamingCsvSink, base_path=csv_output_base_path(output_subfolder), buffer_bytes=CSV_BUFFER_SIZE,
+                   layouts=LAYOUTS, open_stream=open_output_stream, unknown_detail=UNKNOWN_DETAIL, compression=CSV_COMPRESSION,
+                   storage_io=STORAGE_IO)
+
+def benchmark_csv_writers(file_path, file_name, output_dir):
+    """Compare DataFrame-built CSVs against the streaming writer: time, traced peak memory and byte equality"""
+    import tracemalloc
+    
+    # Both writers share one load time so their outputs are comparable byte for byte
+    load_time = datetime.now()
+    file_drop_date = extract_file_drop_date(file_name)
+    frame_dir = os.path.join(output_dir, "frame")
+    streaming_dir = os.path.join(output_dir, "streaming")
+    os.makedirs(frame_dir, exist_ok=True)
+    
+    def write_frames():
+        sink = ColumnarRecordSink(file_name, load_time, file_drop_date, LAYOUTS, unknown_detail=UNKNOWN_DETAIL)
+        parse_mro_lines(iter_mro_lines(file_path), sink)
+        for record_type, pandas_df in sink.iter_frames():
+            with open(os.path.join(frame_dir, f"{record_type}.csv"), "w", newline="") as output:
+                output.write(pandas_df.to_csv(index=False))
+        unknown_df = sink.unknown_to_pandas()
+        if unknown_df is not None:
+            with open(os.path.join(frame_dir, "unknown_layouts.csv"), "w", newline="") as output:
+                output.write(unknown_df.to_csv(index=False))
+    
+    def write_streaming():
+        sink = StreamingCsvSink(file_name, load_time, file_drop_date, streaming_dir, CSV_BUFFER_SIZE, LAYOUTS,
+                                unknown_detail=UNKNOWN_DETAIL)
+        parse_mro_lines(iter_mro_lines(file_path), sink)
+        sink.finish()
+    
+    results = {}
+    for writer, run in (("frame", write_frames), ("streaming", write_streaming)):
+        tracemalloc.start()
+        start = time.perf_counter()
+        run()
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results[writer] = {"seconds": elapsed, "peak_mb": peak / (1024 * 1024)}
+    
+    mismatches = []
+    for name in sorted(set(os.listdir(frame_dir)) | set(os.listdir(streaming_dir))):
         try:
-            print(f"    Saving unknown_layouts.csv...")
-            
-            unknown_pandas_df = unknown_df.toPandas()
-            csv_content = unknown_pandas_df.to_csv(index=False)
-            csv_file_path = f"{base_path}/unknown_layouts.csv"
-            dbutils.fs.put(csv_file_path, csv_content, overwrite=True)
-            
-            unknown_count = len(unknown_pandas_df)
-            print(f"Unknown Layouts: {unknown_count:,} records → unknown_layouts.csv")
-            
-            saved_files.append({
-                'config_name': 'unknown_layouts',
-                'display_name': 'Unknown Layouts',
-                'count': unknown_count,
-                'file_name': 'unknown_layouts.csv'
-            })
-            
+            with open(os.path.join(frame_dir, name), "rb") as a, open(os.path.join(streaming_dir, name), "rb") as b:
+                if a.read() != b.read():
+                    mismatches.append(name)
+        except FileNotFoundError:
+            mismatches.append(name)
+    
+    results["identical"] = not mismatches
+    results["mismatches"] = mismatches
+    print(f"frame: {results['frame']['seconds']:.2f}s, {results['frame']['peak_mb']:.1f} MB peak | "
+          f"streaming: {results['streaming']['seconds']:.2f}s, {results['streaming']['peak_mb']:.1f} MB peak | "
+          f"identical: {results['identical']}")
+    return results
+
+# COMMAND ----------
+
+# Parquet/Delta table writer - one table per record type, partitioned by processing date and source file
+TABLE_PARTITION_COLUMNS = ["PROCESSINGDATE", "SOURCEFILENAME"]
+
+def _storage_size(path):
+    """Total size in bytes of all files under a storage path"""
+    total = 0
+    for file_info in dbutils.fs.ls(path):
+        if file_info.name.endswith("/"):
+            total += _storage_size(file_info.path)
+        else:
+            total += file_info.size
+    return total
+
+TABLE_WRITE_LOCKS = defaultdict(threading.Lock)  # Concurrent batch files commit to a Delta table one at a time
+
+def _write_table(df, table_path, processing_date, output_format, compression):
+    """Write one DataFrame into its partitioned table, replacing only this date/file partition"""
+    from pyspark.sql import functions as F
+    df = df.withColumn("PROCESSINGDATE", F.lit(processing_date))
+    writer = (df.write
+        .format(output_format)
+        .mode("overwrite")
+        .option("partitionOverwriteMode", "dynamic")
+        .option("compression", compression)
+        .partitionBy(*TABLE_PARTITION_COLUMNS))
+    
+    if output_format == "delta":
+        # Dynamic overwrites from concurrent files would conflict on the Delta log
+        with TABLE_WRITE_LOCKS[table_path]:
+            writer.save(table_path)
+            # Superseded files stay in the partition until VACUUM, so read the commit's own byte count
+            from delta.tables import DeltaTable
+            metrics = DeltaTable.forPath(spark, table_path).history(1).collect()[0]["operationMetrics"]
+        return int(metrics.get("numOutputBytes", 0))
+    
+    writer.save(table_path)
+    
+    source_file_name = df.select("SOURCEFILENAME").first()["SOURCEFILENAME"]
+    return _storage_size(f"{table_path}/PROCESSINGDATE={processing_date}/SOURCEFILENAME={source_file_name}")
+
+def save_table_output(config_name, display_name, df, table_path, processing_date, output_format, compression):
+    """Write one DataFrame into its table on the storage I/O pool; returns its saved-file entry, or None when empty"""
+    print(f"Saving {config_name}/...")
+    write_start, cpu_start = datetime.now(), time.thread_time()
+    
+    record_count = df.count()
+    if record_count == 0:
+        return None
+    bytes_written = _write_table(df, table_path, processing_date, output_format, compression)
+    write_seconds = (datetime.now() - write_start).total_seconds()
+    
+    print(f"{display_name}: {record_count:,} records → {config_name}/ ({bytes_written / (1024 * 1024):.2f} MB)")
+    
+    return {
+        'config_name': config_name,
+        'display_name': display_name,
+        'count': record_count,
+        'file_name': f"{config_name}/",
+        'bytes_written': bytes_written,
+        'write_seconds': write_seconds,
+        'write_cpu_seconds': time.thread_time() - cpu_start
+    }
+
+def save_to_table_enhanced(dataframes, unknown_df=None, processing_date=None, output_format="parquet", compression="snappy"):
+    """Save DataFrames as Parquet/Delta tables named after the config names - tables are written concurrently"""
+    
+    processing_date = processing_date or datetime.now().strftime("%Y-%m-%d")
+    base_path = get_storage_path("parsed").rstrip("/")
+    print(f" Saving {output_format} tables to parsed container ({compression})...")
+    
+    # Delta picks up the codec from the session rather than the writer option
+    spark.conf.set("spark.sql.parquet.compression.codec", compression)
+    
+    outputs = [(config_name, RECORD_CONFIGS[config_name]['display_name'], df) for config_name, df in dataframes.items()]
+    if unknown_df is not None:
+        outputs.append(("unknown_layouts", "Unknown Layouts", unknown_df.withColumnRenamed("FILENAME", "SOURCEFILENAME")))
+    
+    # Spark jobs are not retried - a failed write is reported like before
+    writes = [(config_name, STORAGE_IO.submit(f"save {config_name}", save_table_output, config_name, display_name, df,
+                                              f"{base_path}/{config_name}", processing_date, output_format, compression, retries=0))
+              for config_name, display_name, df in outputs]
+    
+    saved_files = []
+    for config_name, write in writes:
+        try:
+            saved_file = write.result()
+            if saved_file is not None:
+                saved_files.append(saved_file)
         except Exception as e:
-            print(f"Error saving unknown layouts: {e}")
+            print(f"Error saving {config_name}: {e}")
     
     return saved_files
 
+def save_outputs(dataframes, unknown_df=None, processing_date=None, output_subfolder=None):
+    """Write parsed outputs with the backend selected by the 'output_format' widget"""
+    if OUTPUT_FORMAT == "csv":
+        return save_to_csv_enhanced(dataframes, unknown_df, output_subfolder)
+    return save_to_table_enhanced(dataframes, unknown_df, processing_date, OUTPUT_FORMAT, OUTPUT_COMPRESSION)
+
+# Contract-centric output (dtcc_parser.ContractIndex) - one nested row per contract, so consumers read a
+# contract with all its 13xx records instead of joining the flat outputs back together
+def contract_output_path(file_name, processing_date=None, output_subfolder=None):
+    """Beside the file's CSVs, or under parsed/contracts/ in the tables' date/file partition layout"""
+    output_file_name = CONTRACT_OUTPUT_FORMATS[CONTRACT_OUTPUT]
+    if OUTPUT_FORMAT == "csv":
+        return f"{csv_output_base_path(output_subfolder)}/{output_file_name}"
+    processing_date = processing_date or datetime.now().strftime("%Y-%m-%d")
+    return get_storage_path("parsed", f"contracts/PROCESSINGDATE={processing_date}/SOURCEFILENAME={file_name}/{output_file_name}")
+
+def write_contract_file(path, table):
+    """Stream the contracts table to storage a batch at a time; returns the bytes written"""
+    output = open_output_stream(path)
+    try:
+        return encode_contracts(table, CONTRACT_OUTPUT, output, OUTPUT_COMPRESSION)
+    finally:
+        output.close()
+
+def save_contract_output(contracts, path):
+    """Nest the grouped records and stream them to storage in one retried call; returns the saved-file entry"""
+    output_file_name = os.path.basename(path)
+    print(f"Saving {output_file_name}...")
+    write_start, cpu_start = datetime.now(), time.thread_time()
+    
+    table = contracts.to_arrow()
+    bytes_written = STORAGE_IO.call(f"write {output_file_name}", write_contract_file, path, table)
+    
+    print(f"Contracts (nested): {table.num_rows:,} contracts → {output_file_name}")
+    return {
+        'config_name': 'contracts',
+        'display_name': 'Contracts (nested)',
+        'count': table.num_rows,
+        'file_name': output_file_name,
+        'bytes_written': bytes_written,
+        'write_seconds': (datetime.now() - write_start).total_seconds(),
+        'write_cpu_seconds': time.thread_time() - cpu_start
+    }
+
 # COMMAND ----------
 
 # File management functions - MODIFIED for ADF integration
-def get_storage_path(container_name, file_path=""):
-    """Construct full storage path"""
-    return f"{PROTOCOL}://{container_name}@{STORAGE_ACCOUNT_NAME}.{ENDPOINT}/{file_path}"
-
 def move_file_to_processed(file_path, file_name, date_folder=None):
     """Move successfully processed file to processed folder with date organization"""
     try:
@@ -590,15 +1079,9 @@ def move_file_to_processed(file_path, file_name, date_folder=None):
         folder_date = date_folder if date_folder else datetime.now().strftime("%Y-%m-%d")
         processed_folder_path = get_storage_path("processed", folder_date)
         
-        # Create folder if it doesn't exist
-        try:
-            dbutils.fs.mkdirs(processed_folder_path)
-        except:
-            pass
-        
-        # Move file
+        # Move file once its folder exists (created at most once per run)
         destination_path = f"{processed_folder_path}/{file_name}"
-        dbutils.fs.mv(file_path, destination_path)
+        STORAGE_IO.mv(file_path, destination_path, folder=processed_folder_path).result()
         
         print(f"  Moved {file_name} to processed/{folder_date}/")
         return destination_path
@@ -607,21 +1090,94 @@ def move_file_to_processed(file_path, file_name, date_folder=None):
         print(f"Could not move file to processed: {e}")
         return None
 
-def log_processing_summary(file_name, parsing_results, processing_time, saved_files, date_folder=None):
-    """Log processing summary with optional date folder"""
+class SourceArchive:
+    """Archival of one processed source file, split around the output writes.
+    
+    start() runs as soon as parsing is done: with archive_compression set, the compressed copy starts on the
+    storage I/O pool and overlaps the output writes, hashing the source bytes it reads so the ledger never
+    has to read the file again. finish() runs once the outputs are written and removes the source - or,
+    uncompressed, moves it (a rename on ADLS). It returns (archive path or None, content hash or None).
+    """
+    
+    def __init__(self, file_path, file_name, date_folder=None, metrics=None):
+        self.file_path = file_path
+        self.file_name = file_name
+        self.folder_date = date_folder if date_folder else datetime.now().strftime("%Y-%m-%d")
+        self.metrics = metrics
+        self.compressed = ARCHIVE_COMPRESSION is not None and compression_of(file_name) is None
+        self.copy = None
+        self.parsed_at = None  # When start() ran - post-parse storage time is measured from here
+    
+    def start(self):
+        self.parsed_at = time.perf_counter()
+        if self.compressed and self.copy is None:
+            destination_path = get_storage_path("processed", f"{self.folder_date}/{with_compression_suffix(self.file_name, ARCHIVE_COMPRESSION)}")
+            self.copy = STORAGE_IO.submit(f"archive {self.file_name}", self._compressed_copy, destination_path)
+    
+    def _compressed_copy(self, destination_path):
+        """One streaming pass: read, hash and compress; returns (archive path, content hash, codec stats)"""
+        copy_start, cpu_start = time.perf_counter(), time.thread_time()
+        digest = hashlib.sha256()
+        source = open_input_stream(self.file_path)
+        output = CompressedWriter(open_output_stream(destination_path), ARCHIVE_COMPRESSION)
+        try:
+            for block in iter(lambda: source.read(READ_BUFFER_SIZE), b""):
+                digest.update(block)
+                output.write(block)
+        finally:
+            source.close()
+        output.close()
+        
+        stats = output.stats()
+        if self.metrics is not None:
+            self.metrics.add("archive_copy", time.perf_counter() - copy_start, time.thread_time() - cpu_start)
+            self.metrics.add_compression("archive", stats)
+        return destination_path, f"sha256:{digest.hexdigest()}", stats
+    
+    def finish(self):
+        if not self.compressed:
+            return move_file_to_processed(self.file_path, self.file_name, self.folder_date), None
+        
+        self.start()
+        try:
+            destination_path, content_hash, stats = self.copy.result()
+            
+            # The source goes only once its compressed copy is complete
+            STORAGE_IO.rm(self.file_path).result()
+            ratio = stats['raw_bytes'] / stats['stored_bytes'] if stats['stored_bytes'] else 0
+            print(f"  Archived {self.file_name} to processed/{self.folder_date}/ ({ARCHIVE_COMPRESSION}, {ratio:.1f}x smaller)")
+            return destination_path, content_hash
+            
+        except Exception as e:
+            print(f"Could not archive file to processed: {e}")
+            return None, None
+
+def archive_source_file(file_path, file_name, date_folder=None, metrics=None):
+    """Archive a processed source in one go - compressed in one streaming pass when archive_compression is set.
+    
+    Returns (archive path or None, content hash or None); plain moves and already-compressed sources return no hash.
+    """
+    return SourceArchive(file_path, file_name, date_folder, metrics).finish()
+
+def parsed_record_count(saved_files):
+    """Records across the flat outputs - the nested contracts file regroups the same records"""
+    return sum(info['count'] for info in saved_files if info['config_name'] != 'contracts')
+
+def log_processing_summary(file_name, parsing_results, processing_time, saved_files, date_folder=None, unknown_layouts=None):
+    """Log processing summary with optional date folder; unknown_layouts is an UnknownLayoutSummary dict.
+    
+    The write runs on the storage I/O pool - returns its future (None when the log could not be built).
+    """
     try:
         # Use provided date or current date
         folder_date = date_folder if date_folder else datetime.now().strftime("%Y-%m-%d")
         log_folder_path = get_storage_path("logs", folder_date)
         
-        # Create folder if it doesn't exist
-        try:
-            dbutils.fs.mkdirs(log_folder_path)
-        except:
-            pass
-        
         # Create log content
-        total_records = sum([info['count'] for info in saved_files])
+        total_records = parsed_record_count(saved_files)
+        total_bytes = sum([info.get('bytes_written', 0) for info in saved_files])
+        total_write_seconds = sum([info.get('write_seconds', 0) for info in saved_files])
+        write_throughput = total_bytes / (1024 * 1024) / total_write_seconds if total_write_seconds > 0 else 0
         
         log_content = f"""DTCC Processing Summary
 ========================
@@ -630,27 +1186,281 @@ Processing Date: {datetime.now()}
 Processing Time: {processing_time:.2f} seconds
 Total Records Parsed: {total_records:,}
 Mode: {PROCESSING_MODE}
+Output Format: {OUTPUT_FORMAT}
+Bytes Written: {total_bytes:,} ({total_bytes / (1024 * 1024):.2f} MB)
+Write Time: {total_write_seconds:.2f} seconds ({write_throughput:.2f} MB/s)
 
-CSV Files Created:
+{OUTPUT_FORMAT.upper()} Files Created:
 """
         
         for file_info in saved_files:
-            log_content += f"  {file_info['file_name']}: {file_info['count']:,} records ({file_info['display_name']})\n"
+            size_mb = file_info.get('bytes_written', 0) / (1024 * 1024)
+            seconds = file_info.get('write_seconds', 0)
+            rate = f", {size_mb / seconds:.2f} MB/s" if seconds > 0 else ""
+            compression = file_info.get('compression')
+            if compression and compression['stored_bytes']:
+                rate += f", {compression['compression']} {compression['raw_bytes'] / compression['stored_bytes']:.1f}x"
+            log_content += f"  {file_info['file_name']}: {file_info['count']:,} records ({file_info['display_name']}) - {size_mb:.2f} MB{rate}\n"
         
-        # Write log file
-        log_file_path = f"{log_folder_path}/{file_name}_processing_summary.txt"
-        dbutils.fs.put(log_file_path, log_content, overwrite=True)
+        if unknown_layouts and unknown_layouts['total']:
+            log_content += f"\nUnknown Layouts: {unknown_layouts['total']:,} lines\n"
+            for description in UnknownLayoutSummary.from_dict(unknown_layouts).describe():
+                log_content += f"  {description}\n"
         
-        print(f"Processing summary logged to logs/{folder_date}/")
+        # Write log file once its folder exists - overlaps the archive move
+        log_file_path = f"{log_folder_path}/{file_name}_processing_summary.txt"
+        log_written = STORAGE_IO.put(log_file_path, log_content, folder=log_folder_path)
+        log_written.add_done_callback(partial(report_storage_write, f"Processing summary logged to logs/{folder_date}/",
+                                              "Could not write processing log"))
+        return log_written
         
     except Exception as e:
         print(f"Could not write processing log: {e}")
 
+def record_write_metrics(metrics, saved_files):
+    """Fold saved-file entries into the metrics: one write stage per output plus row and byte counts"""
+    for file_info in saved_files:
+        config_name = file_info['config_name']
+        metrics.add(f"write.{config_name}", file_info.get('write_seconds', 0), file_info.get('write_cpu_seconds'))
+        metrics.rows[config_name] = file_info['count']
+        metrics.count("bytes_written", file_info.get('bytes_written', 0))
+        if file_info.get('compression'):
+            metrics.add_compression("output", file_info['compression'])
+
+def write_processing_metrics(file_name, metrics, date_folder=None):
+    """Write the machine-readable metrics JSON beside the text processing summary"""
+    try:
+        folder_date = date_folder if date_folder else datetime.now().strftime("%Y-%m-%d")
+        log_folder_path = get_storage_path('logs', folder_date)
+        STORAGE_IO.put(f"{log_folder_path}/{file_name}_metrics.json", metrics.to_json(), folder=log_folder_path).result()
+        print(f"Processing metrics logged to logs/{folder_date}/")
+        
+    except Exception as e:
+        print(f"Could not write processing metrics: {e}")
+
 # COMMAND ----------
 
+# Processing ledger - logs/_ledger/<file name>.json lists every processed version of that file,
+# so a lookup reads one small object no matter how many days of history exist
+LEDGER_MAX_BYTES = 16 * 1024 * 1024
+
+def _read_storage_text(path):
+    """Text of a small storage object, or None when it does not exist"""
+    try:
+        return dbutils.fs.head(path, LEDGER_MAX_BYTES)
+    except Exception as e:
+        if "FileNotFound" in str(e) or "PathNotFound" in str(e):
+            return None
+        raise
+
+def _write_storage_text(path, text):
+    dbutils.fs.put(path, text, overwrite=True)
+
+PROCESSING_LEDGER = None
+
+def processing_ledger():
+    """The ledger under logs/_ledger - built on first use, once the storage protocol is known"""
+    global PROCESSING_LEDGER
+    if PROCESSING_LEDGER is None:
+        PROCESSING_LEDGER = ProcessingLedger(get_storage_path("logs", "_ledger"), _read_storage_text, _write_storage_text)
+    return PROCESSING_LEDGER
+
+def file_content_hash(file_path):
+    """SHA-256 of a source file - local paths are hashed directly, storage URIs through a Hadoop input stream"""
+    local_path = _local_file_path(file_path)
+    if local_path is not None:
+        return file_sha256(local_path, READ_BUFFER_SIZE)
+    
+    stream = open_input_stream(file_path)
+    digest = hashlib.sha256()
+    try:
+        for block in iter(lambda: stream.read(READ_BUFFER_SIZE), b""):
+            digest.update(block)
+    finally:
+        stream.close()
+    return f"sha256:{digest.hexdigest()}"
+
+def find_processed_entry(file_name, file_path, size, metrics, modified=None):
+    """Ledger entry for this exact file content, or None. The file is hashed only when name and size match
+    an entry that was not recorded with this modification time"""
+    if FORCE_REPROCESS:
+        return None, None
+    content_hashes = []
+    
+    def content_hash():
+        with metrics.stage("content_hash"):
+            content_hashes.append(file_content_hash(file_path))
+        return content_hashes[0]
+    
+    with metrics.stage("ledger_lookup"):
+        entry = processing_ledger().find(file_name, size, content_hash, modified)
+    return entry, (content_hashes[0] if content_hashes else None)
+
+def record_processed_file(file_name, file_path, size, content_hash, saved_files, archived_to, metrics, output_subfolder=None,
+                          modified=None):
+    """Add this run to the ledger. The hash normally comes from the lookup, the archive copy or the parse itself
+    (ContentDigest); only a file none of them read in full (spark engine, resumed checkpoint) is read again here.
+    output_subfolder is where the outputs went, so a later batch can still consolidate them when it skips the file.
+    """
+    try:
+        if content_hash is None:
+            with metrics.stage("content_hash"):
+                content_hash = file_content_hash(archived_to or file_path)
+        with metrics.stage("ledger_record"):
+            processing_ledger().record(
+                file_name, size, content_hash,
+                processing_date=PROCESSING_DATE,
+                output_format=OUTPUT_FORMAT,
+                outputs=[{key: info.get(key) for key in ('config_name', 'file_name', 'count')} for info in saved_files],
+                output_subfolder=output_subfolder,
+                source_modified=modified,
+                archived_to=archived_to
+            )
+    except Exception as e:
+        print(f"Could not record {file_name} in the processing ledger: {e}")
+
+def skip_processed_file(file_name, entry, file_path=None, date_folder=None):
+    """Report a ledger hit and archive the re-dropped copy so it does not come back next run"""
+    print(f"  {file_name} already processed on {entry['processed_at']} (processing date {entry.get('processing_date')}) "
+          f"- skipping; set force_reprocess=true to parse it again")
+    if file_path is not None:
+        archive_source_file(file_path, file_name, date_folder)
+
+# COMMAND ----------
+
+# Checkpointed parsing - with checkpoint_interval_mb set, the streaming CSV writer saves its progress under
+# logs/_checkpoints/<file>/ at submitting header group boundaries; a rerun for the same file version
+# (name, size, modification time) resumes from the last checkpoint and writes identical CSVs
+def remove_storage_path(path):
+    dbutils.fs.rm(path, True)
+
+def file_checkpoint_store(file_name):
+    return CheckpointStore(get_storage_path("logs", f"_checkpoints/{file_name}"),
+                           _read_storage_text, _write_storage_text, remove_storage_path)
+
+def parse_mro_file_checkpointed(file_path, file_name, output_subfolder=None, metrics=None):
+    """Streaming CSV parse with a checkpoint every CHECKPOINT_INTERVAL_BYTES of input; returns saved_files"""
+    metrics = metrics or StageMetrics(file_name)
+    file_info = dbutils.fs.ls(file_path)[0]
+    source = {"file_name": file_name, "size": file_info.size, "modification_time": file_info.modificationTime}
+    store = file_checkpoint_store(file_name)
+    file_drop_date = extract_file_drop_date(file_name)
+    base_path = csv_output_base_path(output_subfolder)
+    
+    print(f"\n Parsing: {file_name} (checkpoint every {CHECKPOINT_INTERVAL_BYTES / (1024 * 1024):g} MB)")
+    print(f"File drop date: {file_drop_date}")
+    
+    def make_sink(load_time):
+        return CheckpointedCsvSink(file_name, load_time, file_drop_date, base_path, store.directory, CSV_BUFFER_SIZE,
+                                   LAYOUTS, open_output_stream, open_input_stream, UNKNOWN_DETAIL, CSV_COMPRESSION, STORAGE_IO)
+    
+    try:
+        classify_start = datetime.now()
+        # Compressed sources resume by decoding up to the checkpoint offset (counted in decoded bytes)
+        sink, state = parse_with_checkpoints(file_path, source, store, make_sink, partial(open_source, open_input_stream),
+                                             CHECKPOINT_INTERVAL_BYTES, READ_BUFFER_SIZE, metrics)
+        file_row_number = state["file_row_number"]
+        
+        classify_time = (datetime.now() - classify_start).total_seconds()
+        lines_per_second = file_row_number / classify_time if classify_time > 0 else 0
+        print(f"  Processed {file_row_number:,} non-empty lines")
+        print(f"  Classified and parsed {file_row_number:,} lines in {classify_time:.2f}s ({lines_per_second:,.0f} lines/sec)")
+        
+        for record_type, count in sink.counts().items():
+            display_name = RECORD_CONFIGS[record_type]['display_name']
+            print(f"{display_name}: {count:,} records")
+        report_unknown_layouts(sink.unknown, metrics)
+        
+        # Parts are concatenated into the final CSVs; the checkpoint goes only once they are complete
+        with metrics.stage("write_flush"):
+            saved_files = sink.finish()
+        store.clear()
+        return saved_files
+        
+    except Exception as e:
+        print(f"Error parsing file: {e} - rerun to resume from the last checkpoint")
+        raise
+
+# COMMAND ----------
+
+# Parse + save shared by single and batch modes
+def parse_and_save(file_path, file_name, processing_date=None, output_subfolder=None, metrics=None, on_parsed=None,
+                   digest=None):
+    """Parse one file and write its outputs; returns (parsed record types, saved_files, parsing_time).
+    
+    on_parsed() runs once something was parsed, before the DataFrame outputs are written (SourceArchive.start).
+    With contract_output set, the nested contracts file is written on the storage pool alongside the flat outputs.
+    digest (a ContentDigest) hashes the source as it is parsed; a checkpointed parse may resume mid-file, so it does not.
+    """
+    metrics = metrics or StageMetrics(file_name)
+    parsing_start = datetime.now()
+    
+    contract_writes = []
+    def save_contracts(contracts):
+        # Files without 13xx records get no contracts file, as empty record types get no table partition
+        if len(contracts):
+            contract_writes.append(STORAGE_IO.submit("save contracts", save_contract_output, contracts,
+                                                     contract_output_path(file_name, processing_date, output_subfolder), retries=0))
+    on_contracts = save_contracts if CONTRACT_OUTPUT else None
+    
+    if STREAMING_CSV:
+        # CSVs are written while parsing, so parsing time includes the writes
+        if CHECKPOINT_INTERVAL_BYTES:
+            saved_files = parse_mro_file_checkpointed(file_path, file_name, output_subfolder, metrics)
+        else:
+            saved_files = parse_mro_file_enhanced(file_path, file_name, streaming_csv_sink(output_subfolder), metrics,
+                                                  on_contracts=on_contracts, digest=digest)
+        parsing_time = (datetime.now() - parsing_start).total_seconds()
+        parsed_types = [info['config_name'] for info in saved_files if info['config_name'] != 'unknown_layouts']
+        if parsed_types and on_parsed is not None:
+            on_parsed()
+        saved_files += gather_contract_output(contract_writes)
+        record_write_metrics(metrics, saved_files)
+        return parsed_types, saved_files, parsing_time
+    
+    # Cached Spark lines are released once every output has been written from them, or on failure
+    releases = []
+    try:
+        parsed_dataframes, unknown_df = parse_mro_file(file_path, file_name, metrics, on_contracts, releases.append, digest)
+        parsing_time = (datetime.now() - parsing_start).total_seconds()
+        if not parsed_dataframes:
+            return parsed_dataframes, [], parsing_time
+        if on_parsed is not None:
+            on_parsed()
+        
+        saved_files = save_outputs(parsed_dataframes, unknown_df, processing_date, output_subfolder)
+    finally:
+        for release in releases:
+            release()
+    saved_files += gather_contract_output(contract_writes)
+    record_write_metrics(metrics, saved_files)
+    return parsed_dataframes, saved_files, parsing_time
+
+def gather_contract_output(contract_writes):
+    """Saved-file entries of finished contract writes - a failed one is reported like a failed record type"""
+    saved_files = []
+    for write in contract_writes:
+        try:
+            saved_files.append(write.result())
+        except Exception as e:
+            print(f"Error saving contracts: {e}")
+    return saved_files
+
+def skipped_result(file_name, processing_date, entry, metrics):
+    """ADF result for a file the ledger already has"""
+    return {
+        "status": "skipped",
+        "file_name": file_name,
+        "processing_date": processing_date,
+        "previously_processed_at": entry['processed_at'],
+        "previous_processing_date": entry.get('processing_date'),
+        "outputs": entry.get('outputs', []),
+        "metrics": metrics.to_dict()
+    }
+
 # MODIFIED: Single file processing function for ADF
-def process_single_mro_file(file_name, processing_date):
-    """Process a single MRO file - designed for ADF triggers"""
+def process_single_mro_file(file_name, processing_date, output_subfolder=None):
+    """Process a single MRO file - designed for ADF triggers; outputs go to parsed/<output_subfolder or date>/"""
     
     print(f" SINGLE FILE PROCESSING MODE")
     print(f" Target file: {file_name}")
@@ -658,9 +1468,14 @@ def process_single_mro_file(file_name, processing_date):
     print("=" * 60)
     
     start_time = datetime.now()
+    start_cpu = time.thread_time()
+    metrics = StageMetrics(file_name)
+    # The target file is the only object the protocol probe touches
+    resolve_storage_protocol(file_name)
+    metrics.merge(STORAGE_PROBE_METRICS.stages)
     
     # Construct file path
-    source_path = f"{PROTOCOL}://source@{STORAGE_ACCOUNT_NAME}.{ENDPOINT}/"
+    source_path = get_storage_path("source")
     file_path = f"{source_path}{file_name}"
     
     try:
@@ -670,29 +1485,53 @@ def process_single_mro_file(file_name, processing_date):
             size_mb = file_info.size / (1024 * 1024)
             print(f" Found file: {file_name} ({size_mb:.1f} MB)")
         except:
-            raise FileNotFoundError(f"File not found: {file_name}")
+            file_info = None
         
-        # Parse the file
-        parsing_start = datetime.now()
-        parsed_dataframes, unknown_df = parse_mro_file_enhanced(file_path, file_name)
-        parsing_time = (datetime.now() - parsing_start).total_seconds()
+        if file_info is None:
+            # An ADF retry after a successful run finds the file already archived
+            entries = [] if FORCE_REPROCESS else processing_ledger().entries(file_name)
+            if not entries:
+                raise FileNotFoundError(f"File not found: {file_name}")
+            skip_processed_file(file_name, entries[-1])
+            return skipped_result(file_name, processing_date, entries[-1], metrics)
         
-        if not parsed_dataframes:
-            raise ValueError("No data was parsed from the file")
+        # Re-dropped files with identical content short-circuit here
+        entry, content_hash = find_processed_entry(file_name, file_path, file_info.size, metrics, file_info.modificationTime)
+        if entry is not None:
+            with metrics.stage("archive"):
+                skip_processed_file(file_name, entry, file_path, processing_date)
+            return skipped_result(file_name, processing_date, entry, metrics)
+        metrics.count("bytes_read", file_info.size)
         
-        # Save to CSV with date-organized subfolder
-        output_subfolder = processing_date
-        saved_files = save_to_csv_enhanced(parsed_dataframes, unknown_df, output_subfolder)
+        # Parse the file and save to CSV with date-organized subfolder; folders are created meanwhile and
+        # a compressed archive copy starts as soon as parsing is done
+        output_subfolder = output_subfolder or processing_date
+        prepare_storage_folders(processing_date, output_subfolder)
+        archive = SourceArchive(file_path, file_name, processing_date, metrics)
+        # The ledger's hash is taken as the file is parsed, unless the lookup or the compressed archive copy takes it
+        digest = ContentDigest() if content_hash is None and not archive.compressed else None
+        parsed_dataframes, saved_files, parsing_time = parse_and_save(file_path, file_name, processing_date, output_subfolder,
+                                                                      metrics, archive.start, digest)
         
-        # Log processing summary
-        log_processing_summary(file_name, parsed_dataframes, parsing_time, saved_files, processing_date)
+        if not parsed_dataframes:
+            raise ValueError("No data was parsed from the file")
         
-        # Move to processed folder
-        move_file_to_processed(file_path, file_name, processing_date)
+        # Log processing summary and move to processed folder - concurrently, once the outputs are written
+        log_written = log_processing_summary(file_name, parsed_dataframes, parsing_time, saved_files, processing_date, metrics.unknown_layouts)
+        with metrics.stage("archive"):
+            archived_to, archive_hash = archive.finish()
+        if log_written is not None:
+            log_written.exception()  # Waits; a failed write was already reported
+        metrics.add("post_parse_io", time.perf_counter() - archive.parsed_at)
+        content_hash = content_hash or archive_hash or (digest.value if digest is not None else None)
+        record_processed_file(file_name, file_path, file_info.size, content_hash, saved_files, archived_to, metrics,
+                              output_subfolder, file_info.modificationTime)
         
         # Calculate totals
-        total_records = sum([info['count'] for info in saved_files])
+        total_records = parsed_record_count(saved_files)
         total_time = (datetime.now() - start_time).total_seconds()
+        metrics.add("total", total_time, time.thread_time() - start_cpu)
+        write_processing_metrics(file_name, metrics, processing_date)
         
         # Success summary
         print(f"\n PROCESSING COMPLETED SUCCESSFULLY!")
@@ -701,7 +1540,7 @@ def process_single_mro_file(file_name, processing_date):
         print(f"Processing time: {total_time:.2f} seconds")
         print(f"Total records: {total_records:,}")
         print(f"CSV files created: {len(saved_files)}")
-        print(f"Output location: parsed/{processing_date}/")
+        print(f"Output location: parsed/{output_subfolder}/")
         print(f"Archived to: processed/{processing_date}/")
         
         # Return success status for ADF
@@ -711,7 +1550,8 @@ def process_single_mro_file(file_name, processing_date):
             "processing_date": processing_date,
             "total_records": total_records,
             "csv_files_created": len(saved_files),
-            "processing_time": total_time
+            "processing_time": total_time,
+            "metrics": metrics.to_dict()
         }
         
     except Exception as e:
@@ -721,17 +1561,295 @@ def process_single_mro_file(file_name, processing_date):
         print(f" File: {file_name}")
         print(f"  Error: {error_message}")
         
+        # Stages that did run are still worth charting
+        metrics.add("total", (datetime.now() - start_time).total_seconds(), time.thread_time() - start_cpu)
+        write_processing_metrics(file_name, metrics, processing_date)
+        
         # Return failure status for ADF
         return {
             "status": "failed",
             "file_name": file_name,
             "processing_date": processing_date,
-            "error": error_message
+            "error": error_message,
+            "metrics": metrics.to_dict()
         }
 
 # COMMAND ----------
 
+# Micro-batch processing for ADF - one notebook run handles a group of files, so cluster attach, imports,
+# layouts, the protocol probe, the ledger and the storage pool are paid once per batch instead of per file
+def file_output_subfolder(file_name, processing_date):
+    """parsed/<date>/<file stem>/ - the CSV folder of a file processed alongside others on the same date"""
+    return f"{processing_date}/{os.path.splitext(strip_compression_suffix(file_name))[0]}"
+
+def adf_file_status(result):
+    """Per-file entry of the micro-batch runOutput - metrics stay in each file's metrics JSON"""
+    return {key: value for key, value in result.items() if key != "metrics"}
+
+def process_input_files(file_names, processing_date):
+    """Process ADF's files one after another; a failed file is reported and the rest still run"""
+    
+    print(f" MICRO-BATCH PROCESSING MODE")
+    print(f" Files: {len(file_names)}")
+    print(f"Processing date: {processing_date}")
+    print("=" * 60)
+    
+    start_time = datetime.now()
+    file_statuses = []
+    
+    # In order, like consecutive single-file runs - each file's CSVs get their own parsed/<date>/<file>/ folder
+    for index, file_name in enumerate(file_names, 1):
+        print(f"\n [{index}/{len(file_names)}] {file_name}")
+        try:
+            result = process_single_mro_file(file_name, processing_date, file_output_subfolder(file_name, processing_date))
+        except Exception as e:
+            print(f"  Failed to process {file_name}: {e}")
+            result = {"status": "failed", "file_name": file_name, "processing_date": processing_date,
+                      "error": f"Processing failed: {str(e)}"}
+        file_statuses.append(adf_file_status(result))
+    
+    failed_files = [status['file_name'] for status in file_statuses if status['status'] == 'failed']
+    total_time = (datetime.now() - start_time).total_seconds()
+    
+    print("\n" + "="*60)
+    print("  MICRO-BATCH SUMMARY")
+    print("="*60)
+    print(f"Total Processing Time: {total_time:.2f} seconds")
+    for status in file_statuses:
+        print(f"{status['file_name']}: {status['status']}" + (f" - {status['error']}" if status['status'] == 'failed' else ""))
+    
+    if not failed_files:
+        batch_status = "success"
+    elif len(failed_files) == len(file_statuses):
+        batch_status = "failed"
+    else:
+        batch_status = "partial"
+    return {
+        "status": batch_status,
+        "processing_date": processing_date,
+        "processing_time": total_time,
+        "files": file_statuses,
+        "failed_files": failed_files
+    }
+
+def plan_input_batches(file_names):
+    """Group ADF's file list into micro-batches by count and total size; the sizes take one source listing"""
+    sizes = {}
+    if BATCH_MAX_BYTES and file_names:
+        sizes = {file_info.name: file_info.size for file_info in dbutils.fs.ls(get_storage_path("source"))}
+    # A file missing from the listing still gets planned - its run reports it (or skips it via the ledger)
+    batches = plan_batches([(name, sizes.get(name, 0)) for name in file_names], BATCH_MAX_FILES, BATCH_MAX_BYTES)
+    
+    print(f" Planned {len(batches)} micro-batches for {len(file_names)} files "
+          f"(up to {BATCH_MAX_FILES or 'any number of'} files" + (f", {BATCH_MAX_BYTES / (1024 * 1024):g} MB" if BATCH_MAX_BYTES else "") + " each)")
+    for index, batch in enumerate(batches, 1):
+        batch_mb = sum(sizes.get(name, 0) for name in batch) / (1024 * 1024)
+        print(f"Batch {index}: {len(batch)} files" + (f", {batch_mb:.1f} MB" if BATCH_MAX_BYTES else ""))
+    
+    return {"batches": batches, "files": len(file_names)}
+
+# COMMAND ----------
+
+# Warm listener - one long-running session processes files as they land, so drop-to-parsed latency is a listing
+# interval plus the parse instead of a pipeline trigger plus cluster attach. Layouts, the storage protocol, the
+# ledger and the storage pool are set up once; arrivals wait in a bounded pending queue for the worker threads
+LISTENER_VISIBILITY_SECONDS = 30 * 60  # A received queue message stays hidden this long while its file is processed
+
+def is_mro_file(name):
+    return strip_compression_suffix(name).lower().endswith('.mro')
+
+def list_source_files():
+    """(name, size, modification time) of everything in the source container - one listing per poll"""
+    return [(f.name, f.size, f.modificationTime / 1000) for f in dbutils.fs.ls(get_storage_path("source"))]
+
+class StorageQueueArrivals:
+    """Azure Storage Queue behind QueueSource - Event Grid delivers the source container's BlobCreated events
+    to it. dtcc_parser.LocalQueue is its local stand-in"""
+    
+    def __init__(self, queue_name):
+        try:
+            from azure.storage.queue import QueueClient
+        except ImportError:
+            raise ImportError("listener_source=queue needs the azure-storage-queue package on the cluster") from None
+        self.client = QueueClient.from_connection_string(CONNECTION_STRING, queue_name)
+    
+    def receive(self, max_messages=1, timeout=None):
+        # QueueMessage.id carries the SDK message, whose pop receipt delete/release need
+        messages = [QueueMessage(message, message.content, message.inserted_on.timestamp())
+                    for message in self.client.receive_messages(max_messages=max_messages,
+                                                                visibility_timeout=LISTENER_VISIBILITY_SECONDS)]
+        if not messages and timeout:
+            time.sleep(timeout)  # Storage Queue has no long polling
+        return messages
+    
+    def delete(self, message):
+        self.client.delete_message(message.id)
+    
+    def release(self, message):
+        self.client.update_message(message.id, visibility_timeout=0)
+
+def process_arrival(file_name):
+    """One landed file, under the date it is processed on; outputs get their own folder as workers run concurrently"""
+    processing_date = datetime.now().strftime("%Y-%m-%d")
+    return process_single_mro_file(file_name, processing_date, file_output_subfolder(file_name, processing_date))
+
+def report_listener_metrics(snapshot):
+    """Print the listener's counters and publish them to logs/_listener/metrics.json for dashboards"""
+    latency = snapshot['latency_seconds'] or {}
+    print(f" LISTENER: {snapshot['success']} processed, {snapshot['skipped']} skipped, {snapshot['failed']} failed | "
+          f"queue {snapshot['queue_depth']}/{LISTENER_QUEUE_DEPTH} (max {snapshot['max_queue_depth']}), "
+          f"{snapshot['in_flight']} in flight | {snapshot['files_per_minute']:.1f} files/min, {snapshot['mb_per_second']:.2f} MB/s | "
+          f"latency p50 {latency.get('p50', 0):.1f}s, p95 {latency.get('p95', 0):.1f}s")
+    document = {"source": LISTENER_SOURCE, "workers": LISTENER_WORKERS, "queue_capacity": LISTENER_QUEUE_DEPTH,
+                "updated_at": datetime.now().isoformat(), **snapshot}
+    written = STORAGE_IO.put(get_storage_path("logs", "_listener/metrics.json"), json.dumps(document, indent=2),
+                             folder=get_storage_path("logs", "_listener"))
+    written.add_done_callback(partial(report_storage_write, None, "    Could not publish listener metrics"))
+
+def warm_up_listener():
+    """Pay the one-time costs before the first file lands rather than on its latency"""
+    resolve_storage_protocol()
+    processing_ledger()
+    if not STREAMING_CSV:
+        import pandas  # The DataFrame writers' import
+    if PARSING_ENGINE == "spark":
+        from pyspark.sql import functions
+    print(f" Warm: {len(COMPILED_LAYOUTS)} compiled layouts ({LAYOUT_CONFIG_HASH or 'built-in'}), {PROTOCOL} storage, "
+          f"{IO_CONCURRENCY} storage I/O threads")
+
+def run_listener():
+    """Process source files as they land until cancelled or listener_max_minutes; returns the final metrics"""
+    
+    print(f" LISTEN MODE")
+    if LISTENER_SOURCE == "queue":
+        print(f" Arrivals: BlobCreated events on queue {LISTENER_QUEUE}")
+    else:
+        print(f" Arrivals: source container listing every {LISTENER_POLL_SECONDS:g}s")
+    print(f" Workers: {LISTENER_WORKERS}, pending arrivals: up to {LISTENER_QUEUE_DEPTH}")
+    print("=" * 60)
+    
+    warm_up_listener()
+    if LISTENER_SOURCE == "queue":
+        source = QueueSource(StorageQueueArrivals(LISTENER_QUEUE), LISTENER_POLL_SECONDS, is_mro_file)
+    else:
+        source = PollingSource(list_source_files, LISTENER_POLL_SECONDS, is_mro_file)
+    listener = FileListener(source, process_arrival, LISTENER_WORKERS, LISTENER_QUEUE_DEPTH, LISTENER_METRICS_SECONDS,
+                            report_listener_metrics)
+    try:
+        return listener.run(LISTENER_MAX_SECONDS)
+    except KeyboardInterrupt:
+        # Cancelling the cell stops listening; files already being processed were finished first
+        print(f"\n Listener cancelled")
+        return listener.metrics.snapshot()
+
+# COMMAND ----------
+
 # MODIFIED: Batch processing function (for manual runs)
+def batch_part_subfolder(file_name):
+    """parsed/ subfolder holding one batch file's own CSV outputs"""
+    return f"parts/{PROCESSING_DATE}/{os.path.splitext(strip_compression_suffix(file_name))[0]}"
+
+def process_batch_file(file_info):
+    """Parse, save, log and archive one batch file; returns its result entry"""
+    file_name = file_info.name
+    file_path = file_info.path
+    file_start = datetime.now()
+    file_start_cpu = time.thread_time()
+    metrics = StageMetrics(file_name)
+    metrics.merge(STORAGE_PROBE_METRICS.stages)
+    
+    entry, content_hash = find_processed_entry(file_name, file_path, file_info.size, metrics, file_info.modificationTime)
+    if entry is not None:
+        skip_processed_file(file_name, entry, file_path)
+        # The earlier run's outputs still belong in this batch's consolidated CSVs
+        return {'name': file_name, 'skipped': True, 'previously_processed_at': entry['processed_at'],
+                'output_format': entry.get('output_format'), 'output_subfolder': entry.get('output_subfolder'),
+                'saved_files': entry.get('outputs') or []}
+    metrics.count("bytes_read", file_info.size)
+    
+    # Each file writes its own part outputs so concurrent files never overwrite each other
+    output_subfolder = batch_part_subfolder(file_name)
+    prepare_storage_folders(output_subfolder=output_subfolder)
+    archive = SourceArchive(file_path, file_name, metrics=metrics)
+    digest = ContentDigest() if content_hash is None and not archive.compressed else None
+    parsed_dataframes, saved_files, parsing_time = parse_and_save(file_path, file_name, PROCESSING_DATE, output_subfolder, metrics,
+                                                                  archive.start, digest)
+    
+    if not parsed_dataframes:
+        print(f"    No data was parsed from {file_name}")
+        return None
+    
+    # Log processing summary and move to processed folder - concurrently, once the outputs are written
+    log_written = log_processing_summary(file_name, parsed_dataframes, parsing_time, saved_files, unknown_layouts=metrics.unknown_layouts)
+    with metrics.stage("archive"):
+        archived_to, archive_hash = archive.finish()
+    if log_written is not None:
+        log_written.exception()  # Waits; a failed write was already reported
+    metrics.add("post_parse_io", time.perf_counter() - archive.parsed_at)
+    content_hash = content_hash or archive_hash or (digest.value if digest is not None else None)
+    record_processed_file(file_name, file_path, file_info.size, content_hash, saved_files, archived_to, metrics,
+                          output_subfolder, file_info.modificationTime)
+    
+    total_records = parsed_record_count(saved_files)
+    processing_time = (datetime.now() - file_start).total_seconds()
+    metrics.add("total", processing_time, time.thread_time() - file_start_cpu)
+    write_processing_metrics(file_name, metrics)
+    
+    print(f"\n Successfully processed {file_name}")
+    print(f"Total records: {total_records:,}")
+    print(f"{OUTPUT_FORMAT.upper()} outputs created: {len(saved_files)}")
+    
+    return {
+        'name': file_name,
+        'size_bytes': file_info.size,
+        'parsing_time': parsing_time,
+        'processing_time': processing_time,
+        'saved_files': saved_files,
+        'output_subfolder': output_subfolder,
+        'total_records': total_records,
+        'metrics': metrics.to_dict()
+    }
+
+def consolidate_csv_parts(file_results):
+    """Concatenate every file's part CSV into one CSV per record type in the parsed container root.
+    file_results are this batch's processed files and the ledger-skipped ones, whose earlier parts are reused.
+    """
+    print(f"\n Consolidating CSV parts from {len(file_results)} files...")
+    
+    parts_by_type = {}
+    for file_result in file_results:
+        if file_result.get('skipped') and (file_result['output_format'] != "csv" or not file_result['output_subfolder']):
+            print(f"  {file_result['name']}: no CSV parts recorded in the ledger - not in the consolidated CSVs")
+            continue
+        part_base = csv_output_base_path(file_result['output_subfolder'])
+        for saved_file in file_result['saved_files']:
+            if saved_file['config_name'] == 'contracts':
+                continue  # Per-file nested outputs are read together as one dataset, not unioned into a CSV
+            parts_by_type.setdefault(saved_file['config_name'], []).append(
+                (f"{part_base}/{saved_file['file_name']}", saved_file['count']))
+    
+    base_path = csv_output_base_path()
+    consolidated_files = []
+    for config_name, parts in parts_by_type.items():
+        try:
+            # Parts stream through the driver block by block (decoded and re-encoded when compressed), so memory
+            # stays flat however large the batch; headers are reconciled like unionByName(allowMissingColumns=True)
+            csv_file_path = with_compression_suffix(f"{base_path}/{config_name}.csv", CSV_COMPRESSION)
+            output = open_compressed(open_output_stream(csv_file_path), CSV_COMPRESSION)
+            try:
+                concatenate_csv_parts([path for path, _ in parts], output,
+                                      lambda path: open_source(open_input_stream, path), CSV_BUFFER_SIZE)
+            finally:
+                output.close()
+            
+            record_count = sum(count for _, count in parts)
+            print(f"{os.path.basename(csv_file_path)}: {record_count:,} records from {len(parts)} parts")
+            consolidated_files.append({'config_name': config_name, 'count': record_count, 'parts': len(parts)})
+        except Exception as e:
+            print(f"Error consolidating {config_name}: {e}")
+    
+    return consolidated_files
+
 def process_mro_files_batch():
     """Batch processing function - processes all files in source container"""
     
@@ -742,11 +1860,11 @@ def process_mro_files_batch():
     start_time = datetime.now()
     
     # Discover MRO files
-    source_path = f"{PROTOCOL}://source@{STORAGE_ACCOUNT_NAME}.{ENDPOINT}/"
+    source_path = get_storage_path("source")
     
     try:
         files = dbutils.fs.ls(source_path)
-        mro_files = [f for f in files if f.name.lower().endswith('.mro')]
+        mro_files = [f for f in files if strip_compression_suffix(f.name).lower().endswith('.mro')]
         
         if not mro_files:
             print("No MRO files found in source container")
@@ -757,57 +1875,43 @@ def process_mro_files_batch():
             size_mb = file_info.size / (1024 * 1024)
             print(f"{file_info.name}: {size_mb:.1f} MB")
         
-        # Process each file
+        # Process files concurrently - Spark jobs and storage I/O from different files overlap. These are threads,
+        # so the driver engine's pure-Python parsing still runs one file at a time under the GIL; engine=parallel
+        # (worker processes) or engine=spark is what parallelizes the parse itself
         successful_files = []
+        skipped_files = []
         failed_files = []
+        consolidation_sources = []  # Processed and skipped files in listing order
         
-        for file_info in mro_files:
-            file_name = file_info.name
-            file_path = file_info.path
+        parallelism = min(BATCH_PARALLELISM, len(mro_files))
+        print(f"\n Processing up to {parallelism} files concurrently")
+        
+        with ThreadPoolExecutor(max_workers=parallelism) as pool:
+            futures = [(file_info, pool.submit(process_batch_file, file_info)) for file_info in mro_files]
             
-            try:
-                print("\n" + "="*60)
-                
-                # Parse the file
-                parsing_start = datetime.now()
-                parsed_dataframes, unknown_df = parse_mro_file_enhanced(file_path, file_name)
-                parsing_time = (datetime.now() - parsing_start).total_seconds()
-                
-                if not parsed_dataframes:
-                    print("    No data was parsed")
-                    continue
-                
-                # Save to CSV without subfolder (batch mode)
-                saved_files = save_to_csv_enhanced(parsed_dataframes, unknown_df)
-                
-                # Log processing summary
-                log_processing_summary(file_name, parsed_dataframes, parsing_time, saved_files)
-                
-                # Move to processed folder
-                move_file_to_processed(file_path, file_name)
-                
-                # Track success
-                total_records = sum([info['count'] for info in saved_files])
-                successful_files.append({
-                    'name': file_name,
-                    'processing_time': parsing_time,
-                    'saved_files': saved_files,
-                    'total_records': total_records
-                })
-                
-                print(f"\n Successfully processed {file_name}")
-                print(f"Total records: {total_records:,}")
-                print(f"CSV files created: {len(saved_files)}")
-                
-            except Exception as e:
-                error_message = f"Processing failed: {str(e)}"
-                print(f"  Failed to process {file_name}: {error_message}")
-                
-                failed_files.append({
-                    'name': file_name,
-                    'error': error_message
-                })
-                continue
+            for file_info, future in futures:
+                try:
+                    file_result = future.result()
+                    if file_result and file_result.get('skipped'):
+                        skipped_files.append(file_result)
+                    elif file_result:
+                        successful_files.append(file_result)
+                    if file_result:
+                        consolidation_sources.append(file_result)
+                    
+                except Exception as e:
+                    error_message = f"Processing failed: {str(e)}"
+                    print(f"  Failed to process {file_info.name}: {error_message}")
+                    
+                    failed_files.append({
+                        'name': file_info.name,
+                        'error': error_message
+                    })
+        
+        # Merge per-file parts into one CSV per record type (tables are already one per record type)
+        consolidated_files = []
+        if OUTPUT_FORMAT == "csv" and CONSOLIDATE_OUTPUTS and successful_files:
+            consolidated_files = consolidate_csv_parts(consolidation_sources)
         
         # Final summary
         total_time = (datetime.now() - start_time).total_seconds()
@@ -817,16 +1921,27 @@ def process_mro_files_batch():
         print("="*60)
         print(f"Total Processing Time: {total_time:.2f} seconds")
         print(f"Successfully Processed: {len(successful_files)} files")
+        print(f"Skipped (already in ledger): {len(skipped_files)} files")
         print(f"Failed: {len(failed_files)} files")
         
         if successful_files:
             print(f"\n  SUCCESSFUL FILES:")
             all_csv_files = {}
             total_records_all = 0
+            total_bytes_all = 0
+            total_file_seconds = 0
             
             for file_info in successful_files:
                 total_records_all += file_info['total_records']
-                print(f"{file_info['name']}: {file_info['total_records']:,} records")
+                total_bytes_all += file_info['size_bytes']
+                total_file_seconds += file_info['processing_time']
+                
+                size_mb = file_info['size_bytes'] / (1024 * 1024)
+                seconds = file_info['processing_time']
+                mb_per_second = size_mb / seconds if seconds > 0 else 0
+                records_per_second = file_info['total_records'] / seconds if seconds > 0 else 0
+                print(f"{file_info['name']}: {file_info['total_records']:,} records in {seconds:.2f}s "
+                      f"({mb_per_second:.2f} MB/s, {records_per_second:,.0f} records/s)")
                 
                 # Collect unique CSV files created
                 for saved_file in file_info['saved_files']:
@@ -839,9 +1954,21 @@ def process_mro_files_batch():
                         }
                     all_csv_files[config_name]['total_count'] += saved_file['count']
             
+            aggregate_mb = total_bytes_all / (1024 * 1024)
             print(f"\n TOTAL RECORDS PROCESSED: {total_records_all:,}")
+            print(f" AGGREGATE THROUGHPUT: {aggregate_mb / total_time if total_time > 0 else 0:.2f} MB/s, "
+                  f"{total_records_all / total_time if total_time > 0 else 0:,.0f} records/s "
+                  f"({total_file_seconds / total_time if total_time > 0 else 0:.1f}x overlap of per-file wall time)")
+            if PARSING_ENGINE == "driver" and parallelism > 1:
+                print(f" Note: driver-engine parses share one core under the GIL - the overlap is storage I/O and Spark "
+                      f"work; use engine=parallel to parse on several cores")
             
-            print(f"\n CSV FILES CREATED (in parsed container):")
+            if OUTPUT_FORMAT != "csv":
+                print(f"\n {OUTPUT_FORMAT.upper()} TABLES WRITTEN (in parsed container, partitioned by file):")
+            elif consolidated_files:
+                print(f"\n CSV FILES CREATED (in parsed container, parts under parts/{PROCESSING_DATE}/):")
+            else:
+                print(f"\n CSV PARTS CREATED (in parsed container under parts/{PROCESSING_DATE}/<file>/):")
             for config_name, info in all_csv_files.items():
                 print(f"{info['file_name']}: {info['total_count']:,} records ({info['display_name']})")
         
@@ -859,10 +1986,26 @@ def process_mro_files_batch():
 # COMMAND ----------
 
 # MAIN EXECUTION LOGIC - NEW: Route based on processing mode
+ADF_RESULT = None  # Returned to ADF as the notebook's runOutput by the last cell
 try:
-    if PROCESSING_MODE == "single":
+    if PROCESSING_MODE == "plan":
+        ADF_RESULT = plan_input_batches(INPUT_FILES)
+        
+    elif PROCESSING_MODE == "listen":
+        # Runs until cancelled or listener_max_minutes; the final metrics become the job's output
+        ADF_RESULT = run_listener()
+        
+    elif PROCESSING_MODE == "micro_batch":
+        ADF_RESULT = process_input_files(INPUT_FILES, PROCESSING_DATE)
+        
+        print(f"\n ADF RESULT:")
+        print(f"Status: {ADF_RESULT['status']}")
+        if ADF_RESULT['failed_files']:
+            print(f"Failed files: {', '.join(ADF_RESULT['failed_files'])}")
+        
+    elif PROCESSING_MODE == "single":
         # ADF triggered processing - single file
-        result = process_single_mro_file(TARGET_FILE, PROCESSING_DATE)
+        result = ADF_RESULT = process_single_mro_file(TARGET_FILE, PROCESSING_DATE)
         
         # Output result for ADF monitoring
         print(f"\n ADF RESULT:")
@@ -871,6 +2014,8 @@ try:
             print(f"Records processed: {result['total_records']:,}")
             print(f"CSV files created: {result['csv_files_created']}")
             print(f"Processing time: {result['processing_time']:.2f}s")
+        elif result['status'] == 'skipped':
+            print(f"Already processed on {result['previously_processed_at']} - outputs left unchanged")
         else:
             print(f"Error: {result['error']}")
             
@@ -884,27 +2029,57 @@ except Exception as e:
     traceback.print_exc()
     
     # For ADF, re-raise the exception so it shows as failed
-    if PROCESSING_MODE == "single":
+    if PROCESSING_MODE != "batch":
         raise e
 
 # COMMAND ----------
 
 # Verify results - MODIFIED to check appropriate location
-print("\n  VERIFYING CSV FILES:")
-print("=" * 60)
+def verify_table_outputs():
+    """List the record-type tables holding a partition for this processing date"""
+    print(f" Checking {OUTPUT_FORMAT} tables: parsed/<config_name>/PROCESSINGDATE={PROCESSING_DATE}/")
+    for file in dbutils.fs.ls(get_storage_path("parsed")):
+        config_name = file.name.rstrip('/')
+        if config_name in RECORD_CONFIGS or config_name == "unknown_layouts":
+            try:
+                size_mb = _storage_size(f"{file.path.rstrip('/')}/PROCESSINGDATE={PROCESSING_DATE}") / (1024 * 1024)
+                print(f"{config_name}/: {size_mb:.2f} MB for {PROCESSING_DATE}")
+            except Exception:
+                print(f"{config_name}/: no partition for {PROCESSING_DATE}")
 
-try:
-    if PROCESSING_MODE == "single":
+def verify_csv_outputs():
+    """List the CSV files written for this run"""
+    if PROCESSING_MODE == "micro_batch":
+        # One folder per file of the batch - skipped or failed files may have none
+        print(f"Checking: parsed/{PROCESSING_DATE}/<file>/")
+        for file_name in INPUT_FILES:
+            folder_path = get_storage_path("parsed", f"{file_output_subfolder(file_name, PROCESSING_DATE)}/")
+            if not storage_path_exists(folder_path):
+                print(f"{file_name}: no CSV folder")
+                continue
+            csv_files = [f for f in dbutils.fs.ls(folder_path) if strip_compression_suffix(f.name).endswith('.csv')]
+            print(f"{file_name}: {len(csv_files)} CSV files, {sum(f.size for f in csv_files) / (1024 * 1024):.2f} MB")
+        return
+    elif PROCESSING_MODE == "single":
         # Check date-organized subfolder
-        parsed_path = f"{PROTOCOL}://parsed@{STORAGE_ACCOUNT_NAME}.{ENDPOINT}/{PROCESSING_DATE}/"
+        parsed_path = get_storage_path("parsed", f"{PROCESSING_DATE}/")
         print(f" Checking: parsed/{PROCESSING_DATE}/")
-    else:
+    elif CONSOLIDATE_OUTPUTS:
         # Check root of parsed container
-        parsed_path = f"{PROTOCOL}://parsed@{STORAGE_ACCOUNT_NAME}.{ENDPOINT}/"
+        parsed_path = get_storage_path("parsed")
         print(f"Checking: parsed/ (root)")
+    else:
+        # Unconsolidated batch - one part folder per source file
+        parts_path = get_storage_path("parsed", f"parts/{PROCESSING_DATE}/")
+        part_folders = dbutils.fs.ls(parts_path)
+        print(f"Checking: parsed/parts/{PROCESSING_DATE}/")
+        for folder in part_folders:
+            part_files = [f for f in dbutils.fs.ls(folder.path) if strip_compression_suffix(f.name).endswith('.csv')]
+            print(f"{folder.name} {len(part_files)} CSV parts")
+        return
     
     files = dbutils.fs.ls(parsed_path)
-    csv_files = [f for f in files if f.name.endswith('.csv')]
+    csv_files = [f for f in files if strip_compression_suffix(f.name).endswith('.csv')]
     
     if csv_files:
         print(f"  Found {len(csv_files)} CSV files:")
@@ -928,6 +2103,19 @@ try:
         
     else:
         print("No CSV files found")
+
+print(f"\n  VERIFYING {OUTPUT_FORMAT.upper()} OUTPUTS:")
+print("=" * 60)
+
+try:
+    if PROCESSING_MODE == "plan":
+        print("Plan run - nothing was written")
+    elif PROCESSING_MODE == "listen":
+        print("Listener run - each file's outputs are under parsed/<date>/<file>/")
+    elif OUTPUT_FORMAT == "csv":
+        verify_csv_outputs()
+    else:
+        verify_table_outputs()
         
 except Exception as e:
     print(f"Error verifying results: {e}")
@@ -942,12 +2130,28 @@ if PROCESSING_MODE == "single":
     print(f" File: {TARGET_FILE}")
     print(f"Date: {PROCESSING_DATE}")
     print(f" Output: parsed/{PROCESSING_DATE}/")
+elif PROCESSING_MODE == "micro_batch":
+    print(f" Files: {', '.join(INPUT_FILES)}")
+    print(f"Date: {PROCESSING_DATE}")
+    print(f" Output: parsed/{PROCESSING_DATE}/<file>/")
+elif PROCESSING_MODE == "listen":
+    print(f"Source: files landing in the source container ({LISTENER_SOURCE})")
+    print(f"Output: parsed/<date>/<file>/")
+elif PROCESSING_MODE == "plan":
+    print(f" Files: {len(INPUT_FILES)} in {len(ADF_RESULT['batches']) if ADF_RESULT else 0} micro-batches")
 else:
-    print(f"Source: All .mro files in source container")
-    print(f"Output: parsed/ (root)")
+    print(f"Source: All .mro (and .mro.gz/.mro.zst) files in source container")
+    print(f"Output: parsed/parts/{PROCESSING_DATE}/<file>/" + (" + consolidated parsed/ (root)" if CONSOLIDATE_OUTPUTS else ""))
 
 print(f"\n CONFIG NAME → CSV FILE MAPPING:")
 print("=" * 50)
 
-for config_name, config in RECORD_CONFIGS.items():
-    print(f"{config_name}.csv → {config['display_name']}")
+for config_name in COMPILED_LAYOUTS:
+    print(f"{with_compression_suffix(f'{config_name}.csv', CSV_COMPRESSION)} → {RECORD_CONFIGS[config_name]['display_name']}")
+
+# COMMAND ----------
+
+# Hand the result to ADF as runOutput (single file status, per-file micro-batch statuses or the batch plan).
+# dbutils.notebook.exit ends the run, so it stays in the last cell and outside any try block
+if ADF_RESULT is not None:
+    dbutils.notebook.exit(json.dumps(ADF_RESULT, default=str))
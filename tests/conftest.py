@@ -0,0 +1,41 @@
+"""Shared synthetic inputs - malformed lines, CRLF endings and contracts before the file's first contra"""
+
+from datetime import date, datetime
+
+import pytest
+
+from dtcc_parser.layouts import get_layouts
+from dtcc_parser.synthetic import generate_mro_lines
+
+FILE_NAME = "DTCC_TEST.D250801.mro"
+LOAD_TIME = datetime(2025, 8, 1, 6, 30)
+FILE_DROP_DATE = date(2025, 8, 1)
+
+def synthetic_lines(groups=6, contracts_per_contra=8, malformed_ratio=0.05, seed=7):
+    """Generated lines with contracts (and their detail records) right after the first and a middle header.
+
+    Those before the file's first contra are not enriched; those after the middle header take the previous
+    group's contra, which a parallel chunk starting at that header has to carry over.
+    """
+    lines = list(generate_mro_lines(groups=groups, contracts_per_contra=contracts_per_contra,
+                                    malformed_ratio=malformed_ratio, seed=seed))
+    # Everything after the header and contra of a one-contra file: contracts no contra precedes
+    orphans = list(generate_mro_lines(groups=1, contras_per_group=1, contracts_per_contra=3, seed=seed + 1))[2:]
+    headers = [index for index, line in enumerate(lines) if line[1:3] == "10"]
+    middle = headers[len(headers) // 2]
+    return lines[:1] + orphans + lines[1:middle + 1] + orphans + lines[middle + 1:]
+
+@pytest.fixture(scope="session")
+def layouts():
+    return get_layouts()
+
+@pytest.fixture(scope="session")
+def mro_lines():
+    return synthetic_lines()
+
+@pytest.fixture(scope="session")
+def mro_file(tmp_path_factory, mro_lines):
+    """The synthetic lines as a CRLF file"""
+    path = tmp_path_factory.mktemp("source") / FILE_NAME
+    path.write_bytes("".join(line + "\r\n" for line in mro_lines).encode("utf-8"))
+    return str(path)
@@ -0,0 +1,75 @@
+"""A checkpointed parse interrupted and rerun must write the same CSVs as an uninterrupted one"""
+
+import filecmp
+import os
+
+import pytest
+
+from dtcc_parser.checkpoint import CheckpointStore, CheckpointedCsvSink, LineSegments, parse_with_checkpoints
+
+from conftest import FILE_DROP_DATE, FILE_NAME, LOAD_TIME
+
+SEGMENT_BYTES = 4096
+
+class Interrupted(Exception):
+    pass
+
+def run_checkpointed(mro_file, layouts, output_dir, interrupt_at_save=None):
+    """Parse into output_dir; interrupt_at_save fails that many checkpoint saves in, then the run is repeated"""
+    store = CheckpointStore(os.path.join(output_dir, "_checkpoint"))
+    source = {"file_name": FILE_NAME, "size": os.path.getsize(mro_file), "modification_time": 1}
+    load_times = []
+
+    def make_sink(load_time):
+        load_times.append(load_time)
+        # A fixed load time keeps the LOADDATE columns of separate runs comparable
+        return CheckpointedCsvSink(FILE_NAME, LOAD_TIME, FILE_DROP_DATE, output_dir, store.directory, 1024, layouts)
+
+    if interrupt_at_save is not None:
+        save = store.save
+        saves = []
+
+        def failing_save(checkpoint):
+            saves.append(checkpoint)
+            if len(saves) == interrupt_at_save:
+                raise Interrupted()
+            save(checkpoint)
+
+        store.save = failing_save
+        with pytest.raises(Interrupted):
+            parse_with_checkpoints(mro_file, source, store, make_sink, segment_bytes=SEGMENT_BYTES)
+        store.save = save
+
+    sink, state = parse_with_checkpoints(mro_file, source, store, make_sink, segment_bytes=SEGMENT_BYTES)
+    sink.finish()
+    store.clear()
+    return state, load_times
+
+@pytest.mark.parametrize("interrupt_at_save", [1, 2, 5])
+def test_resumed_run_matches_uninterrupted(layouts, mro_file, tmp_path, interrupt_at_save):
+    expected_dir, resumed_dir = str(tmp_path / "expected"), str(tmp_path / "resumed")
+    expected_state, _ = run_checkpointed(mro_file, layouts, expected_dir)
+    resumed_state, load_times = run_checkpointed(mro_file, layouts, resumed_dir, interrupt_at_save)
+
+    assert resumed_state == expected_state
+    # The rerun takes its load time from the checkpoint, unless it failed before the first one
+    if interrupt_at_save > 1:
+        assert load_times[0] == load_times[-1]
+    csv_names = sorted(os.listdir(expected_dir))
+    assert sorted(os.listdir(resumed_dir)) == csv_names
+    match, mismatch, errors = filecmp.cmpfiles(expected_dir, resumed_dir, csv_names, shallow=False)
+    assert (mismatch, errors) == ([], [])
+
+def test_segments_end_on_header_lines(mro_file):
+    """Every segment after the first starts on a submitting header line, and offsets add up to the file"""
+    with open(mro_file, "rb") as stream:
+        segments = LineSegments(stream, segment_bytes=SEGMENT_BYTES, buffer_size=1024)
+        line_count = 0
+        for index, lines in enumerate(segments):
+            lines = list(lines)
+            assert index == 0 or lines[0][1:3] == "10"
+            assert not any(line.endswith("\r") for line in lines)
+            line_count += len(lines)
+    assert index > 1
+    assert segments.offset == os.path.getsize(mro_file)
+    assert line_count == sum(1 for line in open(mro_file, "rb") if line.strip())
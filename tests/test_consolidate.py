@@ -0,0 +1,39 @@
+"""Concatenated part CSVs must read back as the union of the parts, whatever their columns and compression"""
+
+import io
+
+import pandas as pd
+import pytest
+
+from dtcc_parser.compression import open_compressed, open_source, with_compression_suffix
+from dtcc_parser.csv_writer import concatenate_csv_parts
+
+def local_input(path, offset=0):
+    stream = open(path, "rb")
+    stream.seek(offset)
+    return stream
+
+@pytest.mark.parametrize("compression", [None, "gzip"])
+def test_parts_union_by_name(tmp_path, compression):
+    parts = [
+        pd.DataFrame({"A": ["001", "002"], "B": ["x", ""]}),
+        # Contract parts only carry CONTRA_ columns once a contra record was seen
+        pd.DataFrame({"A": ["003"], "B": ["y, z"], "CONTRA_C": ["0"]}),
+        pd.DataFrame({"A": ["004"], "B": ['"q"']}),
+        pd.DataFrame({"B": ["w"], "A": ["005"]})
+    ]
+    paths = []
+    for index, frame in enumerate(parts):
+        path = with_compression_suffix(str(tmp_path / f"part{index}.csv"), compression)
+        output = open_compressed(open(path, "wb"), compression)
+        output.write(frame.to_csv(index=False).encode("utf-8"))
+        output.close()
+        paths.append(path)
+
+    output = io.BytesIO()
+    columns = concatenate_csv_parts(paths, output, lambda path: open_source(local_input, path), buffer_size=8)
+    assert columns == ["A", "B", "CONTRA_C"]
+
+    expected = pd.concat(parts, ignore_index=True)[columns]
+    actual = pd.read_csv(io.BytesIO(output.getvalue()), dtype=str, keep_default_na=False)
+    pd.testing.assert_frame_equal(actual, expected.fillna(""))
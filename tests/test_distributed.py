@@ -0,0 +1,88 @@
+"""The Spark engine must produce the driver parser's rows, row for row (skipped where pyspark is not installed)"""
+
+from collections import Counter
+
+import pandas as pd
+import pytest
+
+pyspark = pytest.importorskip("pyspark")
+
+from dtcc_parser.distributed import parse_file_distributed
+from dtcc_parser.parser import iter_file_lines, parse_mro_lines
+from dtcc_parser.sinks import ColumnarRecordSink
+
+from conftest import FILE_NAME, LOAD_TIME
+
+@pytest.fixture(scope="module")
+def spark():
+    from pyspark.sql import SparkSession
+    session = (SparkSession.builder.master("local[2]").appName("dtcc_parser-tests")
+        .config("spark.sql.shuffle.partitions", "4").config("spark.sql.session.timeZone", "UTC")
+        # ANSI mode raises on impossible dates wherever a plain to_date would be evaluated
+        .config("spark.sql.ansi.enabled", "true").getOrCreate())
+    yield session
+    session.stop()
+
+def as_text(value):
+    if pd.isna(value):
+        return None
+    # toPandas() turns a long column with nulls into floats
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+def comparable(frame):
+    """Rows in file order with every value as text, so Spark and pandas dtypes compare equal"""
+    frame = frame.sort_values("FILEROWNUMBER").reset_index(drop=True)
+    return frame.apply(lambda column: column.map(as_text))
+
+def with_invalid_values(lines, layouts):
+    """Every other contra gets an unparseable count and every other dates record an impossible date"""
+    seen = Counter()
+    for line in lines:
+        record_type = layouts.classifier.classify(line)
+        seen[record_type] += 1
+        if record_type == "contra_record" and seen[record_type] % 2:
+            line = line[:11] + "12A".rjust(10) + line[21:]
+        elif record_type == "contract_dates_record" and seen[record_type] % 2:
+            line = line[:35] + "20240230" + line[43:]
+        yield line
+
+@pytest.fixture(scope="module")
+def invalid_file(tmp_path_factory, layouts, mro_lines):
+    path = tmp_path_factory.mktemp("invalid") / FILE_NAME
+    path.write_text("".join(line + "\n" for line in with_invalid_values(mro_lines, layouts)))
+    return str(path)
+
+def assert_distributed_matches_driver(spark, layouts, mro_file, typed):
+    driver = ColumnarRecordSink(FILE_NAME, LOAD_TIME, None, layouts, typed=typed)
+    parse_mro_lines(iter_file_lines(mro_file), driver)
+    releases = []
+    # bucket_rows small enough that header and contra state is carried across buckets
+    spark_dataframes, unknown_df, unknown, invalid_values = parse_file_distributed(
+        spark, mro_file, FILE_NAME, layouts, typed, load_time=LOAD_TIME, on_release=releases.append, bucket_rows=97)
+
+    try:
+        assert list(spark_dataframes) == list(driver.counts())
+        assert unknown.to_dict() == driver.unknown.to_dict()
+        assert unknown_df is None
+        for record_type, spark_df in spark_dataframes.items():
+            expected = driver.to_pandas(record_type).drop(columns="FILEDROPDAY")
+            actual = spark_df.toPandas().drop(columns="FILEDROPDAY")
+            assert list(actual.columns) == list(expected.columns), record_type
+            pd.testing.assert_frame_equal(comparable(actual), comparable(expected), obj=record_type)
+        # The driver tallies invalid typed values as to_pandas converts each record type
+        assert invalid_values == driver.invalid_values
+    finally:
+        for release in releases:
+            release()
+    return invalid_values
+
+@pytest.mark.parametrize("typed", [False, True])
+def test_distributed_matches_driver(spark, layouts, mro_file, typed):
+    assert_distributed_matches_driver(spark, layouts, mro_file, typed)
+
+def test_distributed_counts_invalid_values(spark, layouts, invalid_file):
+    invalid_values = assert_distributed_matches_driver(spark, layouts, invalid_file, typed=True)
+    assert {"contra_record.ASSOCIATEDFIRMSUBMITTEDCONTRACTCOUNT", "contract_record.CONTRA_ASSOCIATEDFIRMSUBMITTEDCONTRACTCOUNT",
+            "contract_dates_record.CONTRACTDATE1"} <= set(invalid_values)
@@ -0,0 +1,60 @@
+"""configs/config.yaml must describe exactly the built-in layouts, and compiled extractors must slice as the reference does"""
+
+import os
+
+import pytest
+
+from dtcc_parser.layouts import CompiledLayout, get_layouts
+from dtcc_parser.parser import parse_line_to_record
+
+CONFIG_PATH = os.path.join(os.path.dirname(__file__), os.pardir, "configs", "config.yaml")
+
+def test_yaml_config_matches_builtin_layouts():
+    builtin, configured = get_layouts(), get_layouts(CONFIG_PATH)
+    assert configured.key != builtin.key  # Really loaded from the YAML
+
+    # Same record types in the same order - the order decides classification and output order
+    assert list(configured.record_configs) == list(builtin.record_configs)
+    for record_type, expected in builtin.record_configs.items():
+        actual = configured.record_configs[record_type]
+        assert actual["display_name"] == expected["display_name"], record_type
+        # (column, start, end[, type]) entries - names, spans and types, in order
+        assert actual["layout"] == expected["layout"], record_type
+        assert getattr(actual["matcher"], "record_key", None) == getattr(expected["matcher"], "record_key", None), record_type
+        assert configured.compiled[record_type].field_types == builtin.compiled[record_type].field_types, record_type
+
+    assert list(configured.classifier.full_keys.items()) == list(builtin.classifier.full_keys.items())
+    assert list(configured.classifier.header_keys.items()) == list(builtin.classifier.header_keys.items())
+    assert configured.contra_field_types == builtin.contra_field_types
+
+def edge_case_lines(line):
+    """Short, long and non-ASCII variants of one line"""
+    yield ""
+    yield line[:3]
+    for cut in range(5, len(line), 37):
+        yield line[:cut]            # Ends inside or between fields
+    yield line
+    yield line + " TRAILING DATA" * 20
+    # Multi-byte and Unicode whitespace characters, which str.strip removes like spaces
+    yield "".join("\u00e9" if index % 7 == 0 else "\u4e2d" if index % 11 == 0 else "\u3000" if index % 13 == 0 else char
+                  for index, char in enumerate(line))
+    yield ("\u00a0" + line[1:])[: len(line) // 2]
+
+@pytest.mark.parametrize("lines_from", ["records", "single_field"])
+def test_compiled_layout_matches_parse_line_to_record(layouts, mro_lines, lines_from):
+    samples = {}
+    for line in mro_lines:
+        record_type = layouts.classifier.classify(line)
+        if record_type in layouts.compiled:
+            samples.setdefault(record_type, line)
+    assert set(samples) == set(layouts.compiled)
+
+    for record_type, line in samples.items():
+        layout = layouts.record_configs[record_type]["layout"]
+        if lines_from == "single_field":
+            layout = layout[-1:]  # A one-field layout takes the single-slice path
+        compiled = CompiledLayout(layout)
+        for variant in edge_case_lines(line):
+            expected = parse_line_to_record(variant, layout)
+            assert compiled.record(variant) == expected, (record_type, variant)
+            assert compiled.values(variant) == list(expected.values()), (record_type, variant)
@@ -0,0 +1,45 @@
+"""The ledger's content hash taken while parsing must equal a separate hash of the file"""
+
+import gzip
+
+import pytest
+
+from dtcc_parser.ledger import ContentDigest, ProcessingLedger, file_sha256
+from dtcc_parser.parser import iter_compressed_lines, iter_local_lines, iter_mmap_lines
+
+@pytest.mark.parametrize("read", ["mmap", "stream", "gzip"])
+def test_digest_while_reading_matches_file_hash(mro_file, tmp_path, read):
+    path = mro_file
+    if read == "gzip":
+        path = str(tmp_path / "source.mro.gz")
+        with open(mro_file, "rb") as source, gzip.open(path, "wb") as output:
+            output.write(source.read())
+
+    digest = ContentDigest()
+    if read == "mmap":
+        lines = iter_mmap_lines(path, 1000, digest)
+    elif read == "stream":
+        lines = iter_local_lines(path, 1000, digest)
+    else:
+        lines = iter_compressed_lines(digest.wrap(open(path, "rb")), "gzip", 1000)
+    first = next(lines)
+    assert first and digest.value is None  # Not read to the end yet
+    for _ in lines:
+        pass
+    assert digest.value == file_sha256(path)
+
+def test_same_version_matches_without_hashing(tmp_path):
+    ledger = ProcessingLedger(str(tmp_path))
+    ledger.record("DTCC_A.D250801.mro", 10, "sha256:a", source_modified=1000)
+    hashes = []
+
+    def content_hash():
+        hashes.append(1)
+        return "sha256:a"
+
+    assert ledger.find("DTCC_A.D250801.mro", 10, content_hash, 1000)["content_hash"] == "sha256:a"
+    assert hashes == []
+    # A re-drop is a new modification time - same content is only known by hashing it
+    assert ledger.find("DTCC_A.D250801.mro", 10, content_hash, 2000) is not None
+    assert hashes == [1]
+    assert ledger.find("DTCC_A.D250801.mro", 11, content_hash, 1000) is None
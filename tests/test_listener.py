@@ -0,0 +1,93 @@
+"""Queue decoding, backpressure and shutdown of the warm listener"""
+
+import base64
+import json
+import threading
+import time
+
+import pytest
+
+from dtcc_parser.listener import FileListener, LocalQueue, QueueSource, parse_blob_event
+
+EVENT = {
+    "eventType": "Microsoft.Storage.BlobCreated",
+    "subject": "/blobServices/default/containers/source/blobs/DTCC_A.D250801.mro",
+    "eventTime": "2025-08-01T06:30:12.5Z",
+    "data": {"contentLength": 1234}
+}
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+@pytest.mark.parametrize("body, expected", [
+    ("DTCC_A.D250801.mro\n", ("DTCC_A.D250801.mro", None, None)),
+    (b"DTCC_A.D250801.mro\r\n", ("DTCC_A.D250801.mro", None, None)),
+    (json.dumps(EVENT), ("DTCC_A.D250801.mro", 1234, 1754029812.5)),
+    (base64.b64encode(json.dumps([EVENT]).encode()), ("DTCC_A.D250801.mro", 1234, 1754029812.5)),
+    (json.dumps({**EVENT, "eventType": "Microsoft.Storage.BlobDeleted"}), (None, None, None)),
+    # Valid base64 that is not an event is a file name like any other
+    ("QUJD", ("QUJD", None, None)),
+    ("", (None, None, None))
+])
+def test_parse_blob_event(body, expected):
+    assert parse_blob_event(body) == expected
+
+@pytest.mark.parametrize("body", ['{"eventType": ', b"\xff\xfe", base64.b64encode(b'{"subject": '), "[1]", '{"data": "x"}'])
+def test_undecodable_events_raise_value_error(body):
+    with pytest.raises(ValueError):
+        parse_blob_event(body)
+
+def test_poison_messages_are_deleted_without_stopping_the_listener():
+    arrivals = LocalQueue()
+    for body in ['{"eventType": ', b"\xff", "notes.txt", "DTCC_A.D250801.mro", json.dumps(EVENT).replace("_A.", "_B.")]:
+        arrivals.send(body)
+    processed = []
+
+    def process(name):
+        processed.append(name)
+        if len(processed) == 2:
+            listener.stop()
+
+    listener = FileListener(QueueSource(arrivals, 0.01, lambda name: name.endswith(".mro")), process, workers=1)
+    snapshot = listener.run(max_seconds=5)
+    assert processed == ["DTCC_A.D250801.mro", "DTCC_B.D250801.mro"]
+    assert snapshot["success"] == 2
+    assert len(arrivals) == 0 and not arrivals.hidden
+
+def test_backpressure_and_release_on_stop():
+    arrivals = LocalQueue()
+    names = [f"DTCC_{index}.D250801.mro" for index in range(6)]
+    for name in names:
+        arrivals.send(name)
+    started, release_worker = threading.Event(), threading.Event()
+    processed = []
+
+    def process(name):
+        processed.append(name)
+        started.set()
+        release_worker.wait(5)
+
+    listener = FileListener(QueueSource(arrivals, 0.01), process, workers=1, max_pending=2)
+    result = []
+    thread = threading.Thread(target=lambda: result.append(listener.run(max_seconds=10)))
+    thread.start()
+    try:
+        started.wait(5)
+        # One file in the worker and two pending; the rest stay in the queue until a slot frees up
+        wait_until(lambda: listener.pending.qsize() == 2)
+        time.sleep(0.1)
+        assert len(arrivals) == 3
+        assert listener.metrics.snapshot()["received"] == 3
+        listener.stop()
+    finally:
+        release_worker.set()
+        thread.join(10)
+
+    assert processed == names[:1]
+    # The pending files go back to the queue for the next session
+    assert sorted(message.body for message in arrivals.visible) == names[1:]
+    assert not arrivals.hidden
+    assert result[0]["success"] == 1
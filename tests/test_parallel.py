@@ -0,0 +1,53 @@
+"""Parallel parsing must produce the same columns as a serial parse"""
+
+import os
+
+import pandas as pd
+import pytest
+
+from dtcc_parser.layouts import get_layouts
+from dtcc_parser.parser import iter_file_lines, parse_lines_parallel, parse_mro_lines
+from dtcc_parser.sinks import ColumnarRecordSink
+
+from conftest import FILE_DROP_DATE, FILE_NAME, LOAD_TIME
+
+def new_sink(layouts):
+    return ColumnarRecordSink(FILE_NAME, LOAD_TIME, FILE_DROP_DATE, layouts, unknown_detail=True)
+
+CONFIG_PATH = os.path.join(os.path.dirname(__file__), os.pardir, "configs", "config.yaml")
+
+def assert_parallel_matches_serial(layouts, mro_file, chunk_lines):
+    serial = new_sink(layouts)
+    serial_state = parse_mro_lines(iter_file_lines(mro_file), serial)
+    parallel = new_sink(layouts)
+    line_count, chunk_count = parse_lines_parallel(iter_file_lines(mro_file), parallel, workers=2, chunk_lines=chunk_lines)
+
+    assert line_count == serial_state["file_row_number"]
+    assert chunk_count >= 1
+    assert parallel.counts() == serial.counts()
+    assert parallel.unknown.to_dict() == serial.unknown.to_dict()
+    assert parallel.unknown_rows == serial.unknown_rows
+    for record_type in serial.counts():
+        pd.testing.assert_frame_equal(parallel.to_pandas(record_type), serial.to_pandas(record_type))
+
+@pytest.mark.parametrize("chunk_lines", [1, 50, 100000])
+def test_parallel_matches_serial(layouts, mro_file, chunk_lines):
+    assert_parallel_matches_serial(layouts, mro_file, chunk_lines)
+
+def test_workers_rebuild_selected_yaml_layouts(mro_file):
+    """Workers are fresh processes - they rebuild a YAML config's selection from its path, not from this process"""
+    layouts = get_layouts(CONFIG_PATH).select(["contract_record", "contra_record"], {"contract_record": ["CONTRACTNUMBER"]})
+    assert_parallel_matches_serial(layouts, mro_file, 50)
+
+def test_serial_parse_of_synthetic_file(layouts, mro_file, mro_lines):
+    """CRLF is stripped, malformed lines are counted and the contracts before the first contra stay unenriched"""
+    sink = new_sink(layouts)
+    state = parse_mro_lines(iter_file_lines(mro_file), sink)
+
+    assert state["file_row_number"] == len([line for line in mro_lines if line.strip()])
+    assert sink.unknown_count > 0
+    contracts = sink.to_pandas("contract_record")
+    assert not contracts.apply(lambda column: column.astype(str).str.contains("\r")).any().any()
+    enrichment = contracts.filter(like="CONTRA_")
+    assert enrichment.iloc[0].isna().all()
+    assert enrichment.iloc[-1].notna().all()
@@ -0,0 +1,61 @@
+"""Typed columns must equal the untyped strings converted by the Spark engine's rules (_typed_column)"""
+
+from datetime import datetime
+from decimal import Decimal
+
+import pandas as pd
+import pytest
+
+from dtcc_parser.parser import parse_mro_lines
+from dtcc_parser.sinks import ColumnarRecordSink, typed_arrow_column
+
+from conftest import FILE_DROP_DATE, FILE_NAME, LOAD_TIME
+
+def spark_rule(value, field_type):
+    """One value as the Spark engine types it - anything that does not match the pattern is null"""
+    kind, scale, width = field_type
+    if kind == "date":
+        if len(value) != 8 or not value.isdigit() or not value.strip("0"):
+            return None
+        try:
+            return datetime.strptime(value, "%Y%m%d").date()
+        except ValueError:
+            return None
+    digits = value[1:] if value[:1] in "+-" else value
+    if not digits or not digits.isdigit():
+        return None
+    return int(value) if kind == "int" else Decimal(value).scaleb(-scale)
+
+@pytest.mark.parametrize("field_type, values", [
+    (("date", None, 8), ["20240131", "2024013", "20240230", "00000000", "", "2024-1-1", " 20240131"]),
+    (("int", None, 6), ["000123", "-5", "+7", "12A", "", "0"]),
+    (("decimal", 2, 10), ["0000012345", "-100", "1.5", "", "99999999"])
+])
+def test_edge_values(field_type, values):
+    converted, invalid_count = typed_arrow_column(values, field_type)
+    expected = [spark_rule(value, field_type) for value in values]
+    assert converted.to_pylist() == expected
+    blank = (lambda value: not value.strip("0")) if field_type[0] == "date" else (lambda value: value == "")
+    assert invalid_count == sum(1 for value, typed in zip(values, expected) if typed is None and not blank(value))
+
+def test_typed_sink_matches_untyped(layouts, mro_lines):
+    untyped = ColumnarRecordSink(FILE_NAME, LOAD_TIME, FILE_DROP_DATE, layouts)
+    typed = ColumnarRecordSink(FILE_NAME, LOAD_TIME, FILE_DROP_DATE, layouts, typed=True)
+    parse_mro_lines(mro_lines, untyped)
+    parse_mro_lines(mro_lines, typed)
+
+    converted_columns = 0
+    for record_type in untyped.counts():
+        strings, values = untyped.to_pandas(record_type), typed.to_pandas(record_type)
+        field_types = typed.field_types(record_type)
+        assert list(values.columns) == list(strings.columns)
+        for column in strings.columns:
+            if column not in field_types:
+                pd.testing.assert_series_equal(values[column], strings[column])
+                continue
+            # Contract rows before the first contra have no CONTRA_ values at all
+            expected = [None if pd.isna(value) else spark_rule(value, field_types[column]) for value in strings[column]]
+            actual = [None if pd.isna(value) else value for value in values[column]]
+            assert actual == expected, f"{record_type}.{column}"
+            converted_columns += 1
+    assert converted_columns > 0
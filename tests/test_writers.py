@@ -0,0 +1,36 @@
+"""The streaming CSV writer must write exactly the CSVs the DataFrame-built frame writer writes"""
+
+import filecmp
+import os
+
+import pytest
+
+from dtcc_parser.cli import write_frames
+from dtcc_parser.csv_writer import StreamingCsvSink
+from dtcc_parser.parser import iter_file_lines, parse_mro_lines
+from dtcc_parser.sinks import ColumnarRecordSink
+
+from conftest import FILE_DROP_DATE, FILE_NAME, LOAD_TIME
+
+@pytest.mark.parametrize("buffer_bytes", [256, None])
+def test_streaming_csvs_match_frame_writer(layouts, mro_file, tmp_path, buffer_bytes):
+    frame_dir, streaming_dir = str(tmp_path / "frame"), str(tmp_path / "streaming")
+    frame_sink = ColumnarRecordSink(FILE_NAME, LOAD_TIME, FILE_DROP_DATE, layouts, unknown_detail=True)
+    parse_mro_lines(iter_file_lines(mro_file), frame_sink)
+    frame_counts = frame_sink.counts()  # Writing releases each record type's buffers
+    frame_files = write_frames(frame_sink, frame_dir)
+
+    # A small buffer flushes mid-file and spools the contracts seen before the first contra
+    streaming_sink = StreamingCsvSink(FILE_NAME, LOAD_TIME, FILE_DROP_DATE, streaming_dir, buffer_bytes, layouts,
+                                      unknown_detail=True)
+    parse_mro_lines(iter_file_lines(mro_file), streaming_sink)
+    streaming_files = streaming_sink.finish()
+
+    assert [(entry["config_name"], entry["count"]) for entry in streaming_files] == \
+        [(entry["config_name"], entry["count"]) for entry in frame_files]
+    assert streaming_sink.counts() == frame_counts
+    csv_names = sorted(entry["file_name"] for entry in frame_files)
+    assert "unknown_layouts.csv" in csv_names
+    assert sorted(os.listdir(streaming_dir)) == csv_names
+    match, mismatch, errors = filecmp.cmpfiles(frame_dir, streaming_dir, csv_names, shallow=False)
+    assert (mismatch, errors) == ([], [])